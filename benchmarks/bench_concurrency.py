@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+自适应并发限制基准测试
+
+本地模拟 ASR 服务（mock_asr_server.py）同时只能处理 capacity 个转录，超出时立即返回 503。
+同一进程内以多个线程并发调用 audio_to_text，比较：
+
+- fixed:    关闭自适应并发限制，所有线程的请求直接打到服务上，被拒绝的请求按退避策略重试
+- adaptive: 开启自适应并发限制（ASR_LIMIT_*），上限随 503 减小、随正常响应增加
+
+报告成功/失败的调用数、服务返回的 503 数、每秒成功的调用数、调用耗时的 p50 / p95，
+以及 adaptive 结束时的并发上限和调整次数。
+
+用法：
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --threads 64 --capacity 8 --calls 400 --latency 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(ROOT))
+
+from mock_asr_server import MockASRServer  # noqa: E402
+
+
+def _write_wav(path: Path, seconds: float) -> None:
+    """写入 16kHz 单声道 16 位 WAV，内容为 200Hz 正弦波（不会被判定为无语音）"""
+    frames = int(seconds * 16000)
+    samples = bytearray()
+    for i in range(frames):
+        samples += int(8000 * math.sin(2 * math.pi * 200 * i / 16000)).to_bytes(2, "little", signed=True)
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(bytes(samples))
+
+
+def _run(asr, server: MockASRServer, threads: int, calls: int) -> dict:
+    """以 threads 个线程共调用 calls 次，返回统计"""
+    def call(_) -> tuple[bool, float]:
+        start = time.perf_counter()
+        result = asr.audio_to_text(lang="zh")
+        return "error" not in result, time.perf_counter() - start
+
+    rejected = server.rejected
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(call, range(calls)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for _, latency in outcomes)
+    return {
+        "ok": sum(ok for ok, _ in outcomes),
+        "failed": sum(not ok for ok, _ in outcomes),
+        "rejected": server.rejected - rejected,
+        "goodput": sum(ok for ok, _ in outcomes) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32, help="并发调用的线程数")
+    parser.add_argument("--capacity", type=int, default=4, help="模拟服务同时处理的转录数上限")
+    parser.add_argument("--calls", type=int, default=200, help="每种方式的调用总数")
+    parser.add_argument("--latency", type=float, default=0.1, help="模拟服务每个请求的延迟（秒）")
+    parser.add_argument("--retries", type=int, default=4, help="每次上传的最大请求数（ASR_RETRY_MAX_ATTEMPTS）")
+    args = parser.parse_args()
+
+    server = MockASRServer(latency=args.latency, capacity=args.capacity).start()
+    root = Path(tempfile.mkdtemp(prefix="asr-concurrency-"))
+    os.environ.update({
+        "ASR_API_URL": server.url,
+        "ASR_CACHE_ENABLED": "0",
+        "ASR_COALESCE_ENABLED": "0",
+        "ASR_METRICS_LOG": "0",
+        "ASR_RETRY_MAX_ATTEMPTS": str(args.retries),
+        "ASR_RETRY_BACKOFF_BASE": "0.05",
+        "ASR_HTTP_POOL_SIZE": str(args.threads),
+        "ASR_LIMIT_INITIAL": str(args.threads),
+    })
+    from src import main as asr
+
+    try:
+        inputs = root / "data" / "inputs" / "input"
+        inputs.mkdir(parents=True)
+        _write_wav(inputs / "speech.wav", 2)
+        os.chdir(root)
+
+        asr._LIMITER = None
+        fixed = _run(asr, server, args.threads, args.calls)
+        asr._LIMITER = asr._new_limiter()
+        adaptive = _run(asr, server, args.threads, args.calls)
+
+        print(f"{args.threads} threads, {args.calls} calls, backend capacity {args.capacity}, "
+              f"latency {args.latency * 1000:.0f} ms, {args.retries} attempts per upload\n")
+        print(f"{'mode':<9} {'ok':>5} {'failed':>7} {'503s':>6} {'ok/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, row in (("fixed", fixed), ("adaptive", adaptive)):
+            print(f"{name:<9} {row['ok']:>5} {row['failed']:>7} {row['rejected']:>6} {row['goodput']:>8.1f} "
+                  f"{row['p50']:>8.0f} {row['p95']:>8.0f}")
+        print(f"\nadaptive limit: {args.threads} -> {asr._LIMITER.limit} ({asr._LIMITER.seq} adjustments)")
+    finally:
+        server.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
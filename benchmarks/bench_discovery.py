@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+输入目录扫描基准测试
+
+在临时目录中生成大量目录项（默认 10000 个，其中一部分是音频文件），比较：
+
+- iterdir:      旧实现，Path.iterdir() + is_file()（每项一次 stat）+ 扩展名过滤，总是遍历整个目录
+- scandir-all:  当前实现的批量模式，os.scandir 惰性扫描并按文件头识别所有音频文件
+- scandir-first: 当前实现的单文件模式，找到第一个音频文件即停止
+
+每种方式重复多次，取中位数。
+
+用法：
+    python benchmarks/bench_discovery.py
+    python benchmarks/bench_discovery.py --entries 50000 --audio-every 100
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.utils.discovery import iter_audio_files  # noqa: E402
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+OLD_EXTENSIONS = {".wav", ".mp3", ".WAV", ".MP3"}
+
+
+def _populate(directory: Path, entries: int, audio_every: int) -> int:
+    """生成目录项：每 audio_every 项一个 WAV，其余为文本文件，另有少量子目录；返回音频文件数"""
+    audio = 0
+    for i in range(entries):
+        if i % audio_every == audio_every - 1:
+            (directory / f"audio_{i:06d}.wav").write_bytes(WAV_HEADER)
+            audio += 1
+        elif i % 1000 == 999:
+            (directory / f"dir_{i:06d}").mkdir()
+        else:
+            (directory / f"notes_{i:06d}.txt").write_bytes(b"not audio")
+    return audio
+
+
+def _iterdir(directory: Path) -> list[Path]:
+    return [f for f in directory.iterdir() if f.is_file() and f.suffix in OLD_EXTENSIONS]
+
+
+def _scandir_all(directory: Path) -> list[Path]:
+    return list(iter_audio_files(directory))
+
+
+def _scandir_first(directory: Path) -> list[Path]:
+    return list(islice(iter_audio_files(directory), 1))
+
+
+def _measure(fn, directory: Path, repeat: int) -> tuple[float, int]:
+    """返回 (中位数耗时毫秒, 结果数)"""
+    timings = []
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(fn(directory))
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000, help="目录项数量")
+    parser.add_argument("--audio-every", type=int, default=50, help="每多少个目录项放一个音频文件")
+    parser.add_argument("--repeat", type=int, default=7, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    workspace = Path(tempfile.mkdtemp(prefix="asr-bench-"))
+    try:
+        print(f"Generating {args.entries} entries ...")
+        audio = _populate(workspace, args.entries, args.audio_every)
+        print(f"{audio} audio files\n")
+
+        print(f"{'mode':<14} {'found':>6} {'median ms':>10}")
+        for name, fn in (("iterdir", _iterdir), ("scandir-all", _scandir_all), ("scandir-first", _scandir_first)):
+            ms, found = _measure(fn, workspace, args.repeat)
+            print(f"{name:<14} {found:>6} {ms:>10.2f}")
+    finally:
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
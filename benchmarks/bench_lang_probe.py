@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+语言预检测基准测试
+
+启动本地模拟 ASR 服务（mock_asr_server.py），模拟后端在 lang=auto 时对整段音频做语言识别的
+额外开销（--auto-latency-per-second），在不同音频时长下比较单次调用耗时的中位数：
+
+- auto:  lang=auto 直接转录，每段音频都付出语言识别开销
+- probe: 开启 ASR_LANG_PROBE_SECONDS，先用开头的短片段检测语言，再以固定语言转录（缓存未命中）
+- fixed: 直接指定语言，相当于预检测结果命中缓存
+
+缓存和单飞合并均关闭，每次调用都会真正发送请求。结论取决于模拟的语言识别开销：
+开销为 0 时 probe 只会多一次往返，开销越大、音频越长，预检测越划算。
+
+用法：
+    python benchmarks/bench_lang_probe.py
+    python benchmarks/bench_lang_probe.py --seconds 10 60 300 --auto-latency-per-second 0.01 --probe-seconds 5
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(ROOT))
+
+from bench_load import _write_wav  # noqa: E402
+from mock_asr_server import MockASRServer  # noqa: E402
+
+
+def _median_ms(asr, lang: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = asr.audio_to_text(lang=lang)
+            timings.append((time.perf_counter() - start) * 1000)
+        if "error" in result:
+            sys.exit(f"lang={lang}: {result['error']}")
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60, 180], help="音频时长（秒，可多个）")
+    parser.add_argument("--probe-seconds", type=float, default=5.0, help="ASR_LANG_PROBE_SECONDS")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务每个请求的固定延迟（秒）")
+    parser.add_argument("--latency-per-second", type=float, default=0.002, help="每秒音频的转录延迟（秒）")
+    parser.add_argument("--auto-latency-per-second", type=float, default=0.004,
+                        help="lang=auto 时每秒音频的语言识别延迟（秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    server = MockASRServer(
+        latency=args.latency, latency_per_second=args.latency_per_second,
+        auto_latency_per_second=args.auto_latency_per_second, language="zh",
+    ).start()
+    root = Path(tempfile.mkdtemp(prefix="asr-probe-"))
+    os.environ.update({
+        "ASR_API_URL": server.url,
+        "ASR_CACHE_ENABLED": "0",
+        "ASR_COALESCE_ENABLED": "0",
+        "ASR_METRICS_LOG": "0",
+    })
+    from src import main as asr
+
+    try:
+        print(f"mock: latency={args.latency}s per_second={args.latency_per_second}s "
+              f"auto_per_second={args.auto_latency_per_second}s probe={args.probe_seconds:g}s")
+        print(f"{'audio s':>8} {'auto ms':>9} {'probe ms':>9} {'fixed ms':>9} {'probe/auto':>11}")
+        for seconds in args.seconds:
+            workspace = root / f"{seconds:g}s"
+            inputs = workspace / "data" / "inputs" / "input"
+            inputs.mkdir(parents=True)
+            _write_wav(inputs / "probe.wav", seconds)
+            os.chdir(workspace)
+            asr.ASR_LANG_PROBE_SECONDS = 0
+            auto = _median_ms(asr, "auto", args.repeat)
+            fixed = _median_ms(asr, "zh", args.repeat)
+            asr.ASR_LANG_PROBE_SECONDS = args.probe_seconds
+            probe = _median_ms(asr, "auto", args.repeat)
+            print(f"{seconds:>8g} {auto:>9.1f} {probe:>9.1f} {fixed:>9.1f} {probe / auto:>11.2f}")
+    finally:
+        server.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
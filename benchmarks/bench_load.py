@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+负载基准测试
+
+启动本地模拟 ASR 服务（mock_asr_server.py），在不同并发数和音频时长下反复调用
+audio_to_text，报告每种组合的：
+
+- 吞吐（调用数/秒）和错误数
+- 单次调用耗时的 p50 / p95 / p99
+- 峰值 RSS
+
+每种组合在独立子进程中运行（峰值 RSS 互不影响），子进程中以线程并发调用；
+缓存和单飞合并均关闭，每次调用都会真正发送请求，连接池大小设为并发数。
+
+用法：
+    python benchmarks/bench_load.py
+    python benchmarks/bench_load.py --concurrency 1 8 32 --seconds 5 120 --calls 200 --latency 0.2
+    python benchmarks/bench_load.py --error-rate 0.05 --retries 3
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_asr_server import MockASRServer  # noqa: E402
+
+
+def _write_wav(path: Path, seconds: float) -> None:
+    """写入指定时长的 16kHz 单声道 16 位 WAV（低幅度噪声，避免被当作静音）"""
+    frames = int(seconds * 16000)
+    block = bytes((i * 7919) & 0x0F for i in range(32000))
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        remaining = frames * 2
+        while remaining:
+            n = min(remaining, len(block))
+            writer.writeframes(block[:n])
+            remaining -= n
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def _child(url: str, workspace: Path, concurrency: int, calls: int, retries: int) -> None:
+    """在子进程中以 concurrency 个线程共调用 calls 次，输出一行 JSON 结果"""
+    os.environ.update({
+        "ASR_API_URL": url,
+        "ASR_CACHE_ENABLED": "0",
+        "ASR_COALESCE_ENABLED": "0",
+        "ASR_METRICS_LOG": "0",
+        # 合成的测试音频不一定被判定为语音，关闭检测保证每次调用都上传
+        "ASR_NOSPEECH_ENABLED": "0",
+        "ASR_RETRY_MAX_ATTEMPTS": str(retries),
+        "ASR_HTTP_POOL_SIZE": str(max(concurrency, 1)),
+    })
+    sys.path.insert(0, str(ROOT))
+    os.chdir(workspace)
+
+    from src.main import audio_to_text
+
+    audio_to_text()  # 预热：导入、建立连接
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def call(_):
+        start = time.perf_counter()
+        result = audio_to_text()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if "error" in result:
+                code = result["error"]["code"]
+                errors[code] = errors.get(code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(calls)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    print(json.dumps({
+        "calls": calls,
+        "errors": errors,
+        "throughput": round(calls / wall, 2),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="并发数（可多个）")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 30, 120], help="音频时长（秒，可多个）")
+    parser.add_argument("--calls", type=int, default=100, help="每种组合的调用次数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务的响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回 503 的比例")
+    parser.add_argument("--text-chars", type=int, default=64, help="模拟服务响应中 text 的字符数")
+    parser.add_argument("--retries", type=int, default=1, help="ASR_RETRY_MAX_ATTEMPTS")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.url, args.workspace, args.concurrency[0], args.calls, args.retries)
+        return
+
+    server = MockASRServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, text_chars=args.text_chars
+    ).start()
+    root = Path(tempfile.mkdtemp(prefix="asr-load-"))
+    try:
+        print(f"mock: latency={args.latency}s jitter={args.jitter}s error_rate={args.error_rate} "
+              f"calls={args.calls}")
+        print(f"{'audio s':>8} {'conc':>5} {'calls/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'peak RSS MB':>12} {'errors':>8}")
+        for seconds in args.seconds:
+            workspace = root / f"{seconds:g}s"
+            inputs = workspace / "data" / "inputs" / "input"
+            inputs.mkdir(parents=True)
+            _write_wav(inputs / "load.wav", seconds)
+            for concurrency in args.concurrency:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", "--url", server.url, "--workspace", str(workspace),
+                     "--concurrency", str(concurrency), "--calls", str(args.calls), "--retries", str(args.retries)],
+                    check=True, capture_output=True, text=True,
+                ).stdout.strip().splitlines()[-1]
+                r = json.loads(output)
+                errors = sum(r["errors"].values())
+                print(f"{seconds:>8g} {concurrency:>5} {r['throughput']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+                      f"{r['p99_ms']:>8} {r['peak_rss_mb']:>12} {errors:>8}")
+    finally:
+        server.stop()
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
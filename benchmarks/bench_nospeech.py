@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+无语音检测基准测试
+
+生成一段只有低电平底噪的 WAV 和一段开头即有语音的 WAV，比较：
+
+- scan:   iter_speech_frames 扫描整个无语音文件（最坏情况，需要读完全部音频）
+- early:  有语音的文件在检测到足够语音后停止（通常只读开头一块）
+- upload: 关闭检测时把无语音文件上传到本地模拟 ASR 服务（mock_asr_server.py）的耗时
+
+每种方式重复多次，取中位数。
+
+用法：
+    python benchmarks/bench_nospeech.py
+    python benchmarks/bench_nospeech.py --minutes 60 --latency-per-second 0.01
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(ROOT))
+
+from mock_asr_server import MockASRServer  # noqa: E402
+
+
+def _write_wav(path: Path, minutes: float, speech: bool) -> None:
+    """写入 16kHz 单声道 16 位 WAV：约 -60 dBFS 的底噪，speech 时开头 2 秒为 200Hz 正弦波"""
+    rng = np.random.default_rng(0)
+    remaining = int(minutes * 60 * 16000)
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        first = True
+        while remaining:
+            n = min(remaining, 16000 * 60)
+            block = rng.standard_normal(n) * 30
+            if speech and first:
+                t = np.arange(32000) / 16000
+                block[:32000] += 0.3 * 32767 * np.sin(2 * np.pi * 200 * t)
+            writer.writeframes(block.astype(np.int16).tobytes())
+            remaining -= n
+            first = False
+
+
+def _median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10, help="音频时长（分钟）")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务每个请求的固定延迟（秒）")
+    parser.add_argument("--latency-per-second", type=float, default=0.002, help="模拟服务每秒音频的推理延迟（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    server = MockASRServer(latency=args.latency, latency_per_second=args.latency_per_second).start()
+    root = Path(tempfile.mkdtemp(prefix="asr-nospeech-"))
+    os.environ.update({
+        "ASR_API_URL": server.url,
+        "ASR_CACHE_ENABLED": "0",
+        "ASR_COALESCE_ENABLED": "0",
+        "ASR_METRICS_LOG": "0",
+        # 整体上传，避免切片并发影响 upload 的耗时
+        "ASR_CHUNK_MIN_DURATION": str(args.minutes * 60 + 1),
+    })
+    from src import main as asr
+    from src.utils.audio import read_wav_info
+
+    try:
+        inputs = root / "data" / "inputs" / "input"
+        inputs.mkdir(parents=True)
+        silent, speech = inputs / "silent.wav", root / "speech.wav"
+        _write_wav(silent, args.minutes, speech=False)
+        _write_wav(speech, args.minutes, speech=True)
+        silent_info, speech_info = read_wav_info(silent), read_wav_info(speech)
+        os.chdir(root)
+
+        scan = _median_ms(lambda: asr._speech_seconds(silent, silent_info), args.repeat)
+        early = _median_ms(lambda: asr._speech_seconds(speech, speech_info), args.repeat)
+        asr.ASR_NOSPEECH_ENABLED = False
+        upload = _median_ms(asr.audio_to_text, args.repeat)
+        asr.ASR_NOSPEECH_ENABLED = True
+        if asr.audio_to_text()["language"] != "nospeech":
+            sys.exit("silent.wav was not detected as nospeech")
+
+        audio_seconds = args.minutes * 60
+        print(f"{args.minutes:g} min of 16kHz mono audio ({silent.stat().st_size / 1e6:.1f} MB)\n")
+        print(f"{'mode':<7} {'median ms':>10} {'x realtime':>11}")
+        for name, ms in (("scan", scan), ("early", early), ("upload", upload)):
+            print(f"{name:<7} {ms:>10.1f} {audio_seconds / (ms / 1000):>11.0f}")
+    finally:
+        server.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
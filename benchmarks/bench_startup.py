@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试
+
+每次调用预制件都会启动新的解释器，短音频的总耗时中导入占了不小的比例。
+本脚本在独立子进程中重复测量：
+
+- wall-clock: 启动解释器并执行导入语句的总耗时（取中位数）
+  - python:    空解释器，作为基线
+  - src.main:  当前的导入路径（HTTP 栈延迟导入）
+  - eager:     导入 src.main 后立即导入 requests，相当于旧的模块级导入
+- importtime: python -X importtime 报告的累计耗时最多的模块
+
+用法：
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 21 --top 15
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "python": "pass",
+    "src.main": "import src.main",
+    "eager": "import src.main, requests",
+}
+
+
+def _wall_clock_ms(code: str, repeat: int) -> float:
+    """返回多次启动的耗时中位数（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _import_times(code: str) -> list[tuple[str, int, int]]:
+    """
+    解析 -X importtime 的输出
+
+    Returns:
+        [(模块名, 自身耗时微秒, 累计耗时微秒)]
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # 表头
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=11, help="每个场景的启动次数")
+    parser.add_argument("--top", type=int, default=10, help="列出累计导入耗时最多的模块数")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<10} {'median ms':>10}")
+    for name, code in SCENARIOS.items():
+        print(f"{name:<10} {_wall_clock_ms(code, args.repeat):>10.1f}")
+
+    rows = _import_times(SCENARIOS["src.main"])
+    loaded = {name for name, _, _ in rows}
+    print(f"\nrequests imported at startup: {'requests' in loaded}")
+    print(f"\n{'module':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"{name:<40} {self_us / 1000:>8.1f} {cumulative_us / 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
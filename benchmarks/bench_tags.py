@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+raw_text 标记解析基准测试
+
+生成一份由大量片段拼接成的 SenseVoice 风格 raw_text（默认 50000 段，约相当于
+数十小时的转录），比较：
+
+- adhoc:      下游常见的写法，先按语言标记切段，每段再分别用正则查找语言、情感、事件，
+              最后用 re.sub 去掉所有标记
+- parse_tags: src/utils/tags.py 的预编译单遍扫描
+
+每种方式重复多次，取中位数，并核对两者的解析结果一致。
+
+用法：
+    python benchmarks/bench_tags.py
+    python benchmarks/bench_tags.py --segments 200000 --repeat 3
+"""
+
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.utils.tags import EMOTIONS, EVENTS, LANGUAGES, parse_tags  # noqa: E402
+
+TEXTS = ["你好，欢迎使用语音识别服务。", "The quick brown fox jumps over the lazy dog.", "今日はいい天気ですね。",
+         "多謝晒，聽日見。", "감사합니다."]
+
+
+def _generate(segments: int) -> str:
+    rng = random.Random(0)
+    languages, emotions, events = sorted(LANGUAGES - {"nospeech"}), sorted(EMOTIONS), sorted(EVENTS)
+    return "".join(
+        f"<|{rng.choice(languages)}|><|{rng.choice(emotions)}|><|{rng.choice(events)}|><|woitn|>{rng.choice(TEXTS)}"
+        for _ in range(segments)
+    )
+
+
+def _adhoc(raw_text: str) -> list[dict]:
+    languages = "|".join(LANGUAGES)
+    segments = []
+    for part in re.split(rf"(?=<\|(?:{languages})\|>)", raw_text):
+        if not part:
+            continue
+        language = re.search(rf"<\|({languages})\|>", part)
+        emotion = re.search(rf"<\|({'|'.join(EMOTIONS)})\|>", part)
+        event = re.search(rf"<\|({'|'.join(EVENTS)})\|>", part)
+        segments.append({
+            "language": language.group(1) if language else None,
+            "emotion": emotion.group(1) if emotion else None,
+            "event": event.group(1) if event else None,
+            "text": re.sub(r"<\|[^|]*\|>", "", part).strip(),
+        })
+    return segments
+
+
+def _measure(fn, raw_text: str, repeat: int) -> tuple[float, list[dict]]:
+    """返回 (中位数耗时毫秒, 解析结果)"""
+    timings = []
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(raw_text)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=50000, help="raw_text 中的片段数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    raw_text = _generate(args.segments)
+    size_mb = len(raw_text.encode("utf-8")) / 1e6
+    print(f"{args.segments} segments, {size_mb:.1f} MB raw_text\n")
+
+    print(f"{'mode':<11} {'median ms':>10} {'MB/s':>8} {'segments/s':>12}")
+    results = {}
+    for name, fn in (("adhoc", _adhoc), ("parse_tags", parse_tags)):
+        ms, results[name] = _measure(fn, raw_text, args.repeat)
+        print(f"{name:<11} {ms:>10.1f} {size_mb / (ms / 1000):>8.1f} {args.segments / (ms / 1000):>12.0f}")
+
+    if results["adhoc"] != results["parse_tags"]:
+        sys.exit("results differ")
+
+
+if __name__ == "__main__":
+    main()
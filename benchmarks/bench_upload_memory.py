@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+上传峰值内存基准测试
+
+生成一个大 WAV 文件（默认 500 MB），分别用两种方式上传到本地接收服务，
+并在独立子进程中测量峰值 RSS：
+
+- multipart: 旧实现，requests.post(files=...)，请求体在内存中整体编码
+- streamed:  audio_to_text 当前的上传路径，请求体按块从磁盘读取
+
+用法：
+    python benchmarks/bench_upload_memory.py
+    python benchmarks/bench_upload_memory.py --size-mb 200
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+WRITE_BLOCK = 8 * 1024 * 1024
+
+
+class _SinkHandler(BaseHTTPRequestHandler):
+    """读取并丢弃请求体，返回 ASR 格式的固定结果"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 1 << 20)))
+        body = b'{"result": [{"key": "big", "text": "ok", "clean_text": "ok", "raw_text": "<|en|>ok"}]}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _write_wav(path: Path, size_mb: int) -> None:
+    """按块写入指定大小的 16kHz 单声道 16 位 WAV（写入过程本身不占用大量内存）"""
+    frames = size_mb * 1024 * 1024 // 2
+    block = os.urandom(WRITE_BLOCK)
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        remaining = frames * 2
+        while remaining:
+            n = min(remaining, WRITE_BLOCK)
+            writer.writeframes(block[:n])
+            remaining -= n
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(mode: str, url: str, workspace: Path) -> None:
+    """在子进程中执行一次上传，输出一行 JSON 结果"""
+    os.environ["ASR_API_URL"] = url
+    os.environ["ASR_CACHE_ENABLED"] = "0"
+    os.environ["ASR_CHUNK_MIN_DURATION"] = "1e12"
+    # 随机噪声会被判定为无语音而不上传，这里只测量上传本身
+    os.environ["ASR_NOSPEECH_ENABLED"] = "0"
+    sys.path.insert(0, str(ROOT))
+    os.chdir(workspace)
+
+    import requests
+    from src.main import audio_to_text
+
+    audio_file = workspace / "data" / "inputs" / "input" / "big.wav"
+    baseline = _peak_rss_mb()
+    start = time.perf_counter()
+
+    if mode == "multipart":
+        with open(audio_file, "rb") as f:
+            response = requests.post(url, files=[("files", (audio_file.name, f, "audio/wav"))],
+                                     data={"lang": "auto"}, timeout=600)
+        ok = response.status_code == 200
+    else:
+        ok = "error" not in audio_to_text()
+
+    print(json.dumps({
+        "mode": mode,
+        "ok": ok,
+        "seconds": round(time.perf_counter() - start, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=500, help="WAV 文件大小（MB）")
+    parser.add_argument("--child", choices=["multipart", "streamed"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.url, args.workspace)
+        return
+
+    workspace = Path(tempfile.mkdtemp(prefix="asr-bench-"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/asr"
+
+    try:
+        inputs = workspace / "data" / "inputs" / "input"
+        inputs.mkdir(parents=True)
+        print(f"Generating {args.size_mb} MB WAV ...")
+        _write_wav(inputs / "big.wav", args.size_mb)
+
+        print(f"{'mode':<10} {'ok':<5} {'seconds':>8} {'baseline MB':>12} {'peak RSS MB':>12} {'delta MB':>9}")
+        for mode in ("multipart", "streamed"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--url", url, "--workspace", str(workspace)],
+                check=True, capture_output=True, text=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(output)
+            delta = r["peak_rss_mb"] - r["baseline_rss_mb"]
+            print(f"{r['mode']:<10} {str(r['ok']):<5} {r['seconds']:>8} {r['baseline_rss_mb']:>12} "
+                  f"{r['peak_rss_mb']:>12} {delta:>9.1f}")
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workspace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+本地模拟 ASR 服务
+
+模仿真实服务的 POST 接口和 {"result": [{"key", "text", "raw_text", "clean_text"}]} 响应，
+用于离线测量吞吐和并发行为：
+
+- latency / jitter: 每个请求在读完请求体后等待 latency ± jitter 秒再响应
+- latency_per_second / auto_latency_per_second: 按上传音频的时长（由 WAV 文件头估算）
+                    追加的延迟，后者只在 lang=auto 时追加，用于模拟后端对整段音频做语言识别的开销
+- language:         lang=auto 时"识别"出的语言，写入 raw_text 的语言标记
+- error_rate:       按比例返回 error_status（默认 503），随机数由 seed 决定，结果可复现
+- capacity:         同时处理的转录数上限，超出时立即返回 503（0 表示不限），模拟容量有限的 ASR 集群
+- text_chars:       响应中 text 的字符数，用于模拟长音频的大响应体
+- resumable:        是否支持分片续传协议（src/utils/resumable.py），不支持时 /uploads 返回 404；
+                    分片保存在内存中，只用于测试
+- drop_after:       分片续传时，确认 drop_after 个分片后，下一个分片请求读完请求体即断开连接（不确认，只发生一次），
+                    模拟上传途中断线
+- corrupt_parts:    分片续传时，前 corrupt_parts 个分片请求按校验不符返回 422
+
+既可在基准测试和测试中作为库使用（MockASRServer），也可以单独运行：
+    python benchmarks/mock_asr_server.py --port 50000 --latency 0.2 --error-rate 0.05
+    ASR_API_URL=http://127.0.0.1:50000/api/v1/asr python -c "from src.main import audio_to_text; ..."
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+READ_BLOCK = 1 << 20
+_FILENAME = re.compile(rb'filename="([^"]*)"')
+_LANG = re.compile(rb'name="lang"\r\n\r\n([^\r]*)')
+_UPLOAD = re.compile(r"/uploads(?:/(?P<id>[0-9a-f]+)(?:/parts/(?P<part>\d+)|/(?P<complete>complete))?)?$")
+
+
+def _audio_seconds(head: bytes, received: int) -> float:
+    """由请求体开头的 WAV 文件头（fmt 块的 byte_rate）估算上传音频的时长，不是 WAV 时为 0"""
+    index = head.find(b"WAVEfmt ")
+    if index < 0 or len(head) < index + 20:
+        return 0.0
+    byte_rate = struct.unpack_from("<I", head, index + 16)[0]
+    return received / byte_rate if byte_rate else 0.0
+
+
+class MockASRServer:
+    """
+    模拟 ASR 服务（后台线程运行）
+
+    Attributes:
+        url: 接口地址（start() 之后可用）
+        requests: 已处理的请求数
+        errors: 已返回的错误响应数
+        rejected: 因超出 capacity 返回 503 的请求数
+        peak_active: 同时处理的转录数的最大值
+        bytes_received: 已读取的请求体字节数
+        parts_received: 已确认的分片数（分片续传）
+        uploads: 分片续传会话 {upload_id: {"filename", "size", "part_size", "sha256", "parts": {序号: 字节}}}
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        text_chars: int = 16,
+        latency_per_second: float = 0.0,
+        auto_latency_per_second: float = 0.0,
+        language: str = "zh",
+        resumable: bool = False,
+        drop_after: int | None = None,
+        corrupt_parts: int = 0,
+        capacity: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.text_chars = text_chars
+        self.latency_per_second = latency_per_second
+        self.auto_latency_per_second = auto_latency_per_second
+        self.language = language
+        self.resumable = resumable
+        self.drop_after = drop_after
+        self.corrupt_parts = corrupt_parts
+        self.capacity = capacity
+        self.rejected = 0
+        self.peak_active = 0
+        self._active = 0
+        self.parts_received = 0
+        self.uploads: dict[str, dict] = {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_received = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._address = (host, port)
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/asr"
+
+    def start(self) -> "MockASRServer":
+        self._server = ThreadingHTTPServer(self._address, self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-asr", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockASRServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _decide(self, received: int, audio_seconds: float = 0.0, lang: str = "auto") -> tuple[float, bool]:
+        """记录一个请求，返回 (等待秒数, 是否返回错误)"""
+        per_second = self.latency_per_second + (self.auto_latency_per_second if lang == "auto" else 0.0)
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += received
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            delay += per_second * audio_seconds
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def _payload(self, key: str, lang: str = "auto") -> bytes:
+        text = ("你好世界" * (self.text_chars // 4 + 1))[: self.text_chars]
+        tag = self.language if lang == "auto" else lang
+        return json.dumps(
+            {"result": [{"key": key, "text": text, "raw_text": f"<|{tag}|><|NEUTRAL|><|Speech|>{text}",
+                         "clean_text": text}]},
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+    def _transcribe(self, received: int, head: bytes, key: str, lang: str) -> tuple[int, bytes]:
+        """模拟一次转录：等待模拟的延迟，返回 (状态码, 响应体)"""
+        delay, failed = self._decide(received, _audio_seconds(head, received), lang)
+        with self._lock:
+            if self.capacity and self._active >= self.capacity:
+                self.rejected += 1
+                return 503, json.dumps({"detail": "mock at capacity"}).encode()
+            self._active += 1
+            self.peak_active = max(self.peak_active, self._active)
+        try:
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self._active -= 1
+        if failed:
+            return self.error_status, json.dumps({"detail": "mock overloaded"}).encode()
+        return 200, self._payload(key, lang)
+
+    def _upload(self, method: str, match: re.Match, body: bytes, headers) -> tuple[int, dict | bytes | None]:
+        """
+        分片续传协议的各个接口
+
+        Returns:
+            (状态码, JSON 响应对象 / 转录响应体)；状态码为 0 表示直接断开连接
+        """
+        upload_id, part, complete = match.group("id"), match.group("part"), match.group("complete")
+        with self._lock:
+            session = self.uploads.get(upload_id) if upload_id else None
+        if upload_id and session is None:
+            return 404, {"detail": "unknown upload"}
+
+        if method == "POST" and upload_id is None:
+            request = json.loads(body)
+            upload_id = uuid.uuid4().hex
+            with self._lock:
+                self.uploads[upload_id] = {**request, "parts": {}}
+            return 201, {"upload_id": upload_id}
+        if method == "GET" and part is None and not complete:
+            with self._lock:
+                return 200, {"parts": sorted(session["parts"])}
+        if method == "PUT" and part is not None:
+            with self._lock:
+                if self.drop_after is not None and self.parts_received >= self.drop_after:
+                    self.drop_after = None
+                    return 0, None
+                corrupt = self.corrupt_parts > 0
+                self.corrupt_parts -= corrupt
+            if corrupt or hashlib.sha256(body).hexdigest() != headers.get("X-Content-SHA256"):
+                return 422, {"detail": "checksum mismatch"}
+            with self._lock:
+                session["parts"][int(part)] = body
+                self.parts_received += 1
+            return 200, {"part": int(part)}
+        if method == "POST" and complete:
+            request = json.loads(body)
+            data = b"".join(session["parts"].get(i, b"") for i in range(len(session["parts"])))
+            if len(data) != session["size"] or hashlib.sha256(data).hexdigest() != session["sha256"]:
+                return 422, {"detail": "incomplete or corrupted upload"}
+            with self._lock:
+                del self.uploads[upload_id]
+            key = session["filename"].rsplit(".", 1)[0]
+            status, payload = self._transcribe(len(data), data[:4096], key, request.get("lang", "auto"))
+            return status, payload
+        return 405, {"detail": "method not allowed"}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _read_body(self, keep: int | None = None) -> tuple[int, bytes]:
+                """读取请求体，返回 (字节数, 开头 keep 个字节；keep 为 None 时为全部)"""
+                remaining = int(self.headers.get("Content-Length", 0))
+                kept = []
+                size = 0
+                received = 0
+                while remaining:
+                    block = self.rfile.read(min(remaining, READ_BLOCK))
+                    if not block:
+                        break
+                    if keep is None or size < keep:
+                        block_kept = block if keep is None else block[: keep - size]
+                        kept.append(block_kept)
+                        size += len(block_kept)
+                    received += len(block)
+                    remaining -= len(block)
+                return received, b"".join(kept)
+
+            def _respond(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _route_upload(self, method: str) -> bool:
+                match = _UPLOAD.search(self.path)
+                if match is None:
+                    return False
+                _, body = self._read_body()
+                status, payload = mock._upload(method, match, body, self.headers) if mock.resumable else (404, {})
+                if status == 0:
+                    self.close_connection = True
+                    return True
+                self._respond(status, payload if isinstance(payload, bytes) else json.dumps(payload).encode())
+                return True
+
+            def do_GET(self):
+                if not self._route_upload("GET"):
+                    self._respond(404, b"{}")
+
+            def do_PUT(self):
+                if not self._route_upload("PUT"):
+                    self._respond(404, b"{}")
+
+            def do_POST(self):
+                if self._route_upload("POST"):
+                    return
+                received, head = self._read_body(keep=4096)
+                match = _LANG.search(head)
+                lang = match.group(1).decode("utf-8", "replace") if match else "auto"
+                match = _FILENAME.search(head)
+                key = match.group(1).decode("utf-8", "replace").rsplit(".", 1)[0] if match else "audio"
+                self._respond(*mock._transcribe(received, head, key, lang))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误响应的比例（0-1）")
+    parser.add_argument("--error-status", type=int, default=503, help="错误响应的状态码")
+    parser.add_argument("--text-chars", type=int, default=16, help="响应中 text 的字符数")
+    parser.add_argument("--latency-per-second", type=float, default=0.0, help="每秒音频追加的延迟（秒）")
+    parser.add_argument("--auto-latency-per-second", type=float, default=0.0,
+                        help="lang=auto 时每秒音频再追加的延迟（秒），模拟语言识别的开销")
+    parser.add_argument("--language", default="zh", help="lang=auto 时返回的语言标记")
+    parser.add_argument("--resumable", action="store_true", help="支持分片续传协议")
+    parser.add_argument("--capacity", type=int, default=0, help="同时处理的转录数上限，超出时返回 503（0 表示不限）")
+    args = parser.parse_args()
+
+    server = MockASRServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status,
+        text_chars=args.text_chars, latency_per_second=args.latency_per_second,
+        auto_latency_per_second=args.auto_latency_per_second, language=args.language, resumable=args.resumable,
+        capacity=args.capacity, host=args.host, port=args.port, seed=None,
+    ).start()
+    print(f"Mock ASR server listening on {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,11 @@ ASR 预制件模块导出
 这个文件定义了 ASR 预制件对外暴露的函数列表。
 """
 
-from .main import audio_to_text
+from .main import audio_to_text, audio_to_text_async, audio_to_text_batch, audio_to_text_stream
 
 __all__ = [
     "audio_to_text",
+    "audio_to_text_async",
+    "audio_to_text_batch",
+    "audio_to_text_stream",
 ]
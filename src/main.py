@@ -6,7 +6,10 @@
 
 📁 文件路径约定：
 - 输入文件：data/inputs/<音频文件>
-- 一次只处理一个音频文件
+- audio_to_text 一次只处理一个音频文件
+- audio_to_text_batch 并发处理目录中的所有音频文件
+- audio_to_text_stream 以流式事件逐段返回转录结果
+- audio_to_text_async 是 audio_to_text 的 asyncio 版本，供运行事件循环的网关直接 await
 
 🎤 支持的音频格式：
 - WAV（推荐 16KHz 采样率）
@@ -22,9 +25,45 @@
 - nospeech: 无语音
 """
 
+import asyncio
+import functools
+import inspect
+import io
+import json
 import os
-import requests
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
+from itertools import islice
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator
+
+from .utils.async_http import AsyncHTTPPool, AsyncResponse, HTTPConnectionError, HTTPTimeout
+from .utils.audio import (
+    AudioSegment, WavInfo, iter_speech_frames, normalize_wav, plan_chunks, read_wav_info, split_wav
+)
+from .utils.balancer import EndpointBalancer
+from .utils.cache import TranscriptionCache, cache_key, hash_file
+from .utils.discovery import iter_audio_files
+from .utils.flac import encode_flac
+from .utils.http_pool import HTTPPool, load_requests
+from .utils.limiter import AdaptiveLimiter
+from .utils.metrics import CallMetrics
+from .utils.prometheus import Registry, serve, write_textfile
+from .utils.resumable import ResumableNotSupported, ResumableUploader, hash_stream
+from .utils.singleflight import SingleFlight
+from .utils.subtitles import OUTPUT_FORMATS, TranscriptWriter
+from .utils.tags import parse_tags
+from .utils.timestamps import from_backend, from_span, merge
+from .utils.upload import MultipartStream
+
+if TYPE_CHECKING:
+    import requests
 
 
 # 固定路径常量
@@ -32,11 +71,1859 @@ from pathlib import Path
 DATA_INPUTS = Path("data/inputs/input")
 DATA_OUTPUTS = Path("data/outputs")
 
-# ASR 服务配置
-ASR_API_URL = os.environ.get("ASR_API_URL", "http://192.168.1.218:50000/api/v1/asr")
+# ASR 服务配置：多个后端地址用逗号分隔，请求在它们之间负载均衡并自动故障转移
+ASR_API_URL = os.environ.get("ASR_API_URL", "http://192.168.1.218:50000/api/v1/asr")
+ASR_API_URLS = [url.strip() for url in ASR_API_URL.split(",") if url.strip()]
+
+# 多后端负载均衡：选择策略（least_outstanding / ewma）和熔断参数
+ASR_LB_STRATEGY = os.environ.get("ASR_LB_STRATEGY", "least_outstanding")
+ASR_CIRCUIT_FAILURES = int(os.environ.get("ASR_CIRCUIT_FAILURES", "3"))
+ASR_CIRCUIT_RESET_SECONDS = float(os.environ.get("ASR_CIRCUIT_RESET_SECONDS", "30"))
+
+# 重试：暂时性故障（可重试的状态码、连接失败、超时）按指数退避加全抖动重试，
+# 一次上传的所有尝试共享一个总截止时间（秒），每次请求的超时取剩余时间
+ASR_RETRY_MAX_ATTEMPTS = int(os.environ.get("ASR_RETRY_MAX_ATTEMPTS", "3"))
+ASR_RETRY_BACKOFF_BASE = float(os.environ.get("ASR_RETRY_BACKOFF_BASE", "0.5"))
+ASR_RETRY_BACKOFF_MAX = float(os.environ.get("ASR_RETRY_BACKOFF_MAX", "8"))
+ASR_REQUEST_DEADLINE = float(os.environ.get("ASR_REQUEST_DEADLINE", "300"))
+# 视为暂时性故障的状态码；其余非 200 状态码是确定性错误，直接返回不重试
+_RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+# HTTP 连接池配置：同一进程内的所有调用和线程共享 keep-alive 连接
+ASR_HTTP_POOL_SIZE = int(os.environ.get("ASR_HTTP_POOL_SIZE", "16"))
+ASR_HTTP_IDLE_TIMEOUT = float(os.environ.get("ASR_HTTP_IDLE_TIMEOUT", "30"))
+# audio_to_text_async 同时使用的最大连接数，超出的请求在事件循环中排队
+ASR_ASYNC_MAX_CONNECTIONS = int(os.environ.get("ASR_ASYNC_MAX_CONNECTIONS", "100"))
+
+# 自适应并发限制：本进程发往 ASR 服务的在途请求数按 AIMD 调整，429/503、超时或耗时超过基线的
+# ASR_LIMIT_LATENCY_TOLERANCE 倍时减半，并发用满且请求正常时逐步加 1（ASR_LIMIT_ENABLED=0 关闭）
+ASR_LIMIT_ENABLED = os.environ.get("ASR_LIMIT_ENABLED", "1") != "0"
+ASR_LIMIT_INITIAL = int(os.environ.get("ASR_LIMIT_INITIAL", "16"))
+ASR_LIMIT_MIN = int(os.environ.get("ASR_LIMIT_MIN", "1"))
+ASR_LIMIT_MAX = int(os.environ.get("ASR_LIMIT_MAX", "100"))
+ASR_LIMIT_LATENCY_TOLERANCE = float(os.environ.get("ASR_LIMIT_LATENCY_TOLERANCE", "2.0"))
+# 比较耗时前按请求体大小归一化为每这么多字节的耗时（只在请求体大小相差不到一倍的请求之间比较）
+LIMIT_LATENCY_UNIT_BYTES = 1024 * 1024
+# 视为过载、需要降低并发的状态码
+_OVERLOAD_STATUS = frozenset({429, 503})
+
+# 转录结果缓存：以音频内容哈希 + lang + 后端地址为键，命中时不访问 ASR 服务
+ASR_CACHE_ENABLED = os.environ.get("ASR_CACHE_ENABLED", "1") != "0"
+ASR_CACHE_DIR = Path(os.environ.get("ASR_CACHE_DIR", str(Path.home() / ".cache" / "asr-prefab")))
+ASR_CACHE_MAX_BYTES = int(os.environ.get("ASR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+ASR_CACHE_TTL = float(os.environ.get("ASR_CACHE_TTL", str(7 * 24 * 3600)))
+
+# 请求合并：内容和参数相同的并发调用只向 ASR 服务发送一次请求。同一进程内的线程
+# 直接共享结果；同一节点的其他进程通过 ASR_LOCK_DIR 中的文件锁等待，再从缓存读取结果
+ASR_COALESCE_ENABLED = os.environ.get("ASR_COALESCE_ENABLED", "1") != "0"
+ASR_LOCK_DIR = Path(os.environ.get("ASR_LOCK_DIR", "data/.locks"))
+
+# 上传前音频规范化的目标格式（ASR 模型推荐的 16kHz 单声道 16 位 PCM）
+NORMALIZE_SAMPLE_RATE = 16000
+
+# 压缩上传：ASR 服务支持的上传编码（逗号分隔，留空表示只接受原始 WAV）。
+# 服务以 400/415/422 拒绝压缩后的数据时自动改用原始字节重传，并在本进程内不再使用该编码
+ASR_UPLOAD_CODECS = {
+    codec.strip().lower() for codec in os.environ.get("ASR_UPLOAD_CODECS", "flac").split(",") if codec.strip()
+}
+_CODEC_REJECTED_STATUS = {400, 415, 422}
+# 压缩结果小于该大小时留在内存中，否则溢出到临时文件
+_UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024
+
+# 分片续传：不小于 ASR_RESUMABLE_MIN_BYTES 的上传数据按 ASR_RESUMABLE_PART_BYTES 分片上传，
+# 连接断开后（本次调用的重试或下一次调用）从服务已确认的分片继续；服务不支持时回退到整体上传（0 关闭）
+ASR_RESUMABLE_MIN_BYTES = int(os.environ.get("ASR_RESUMABLE_MIN_BYTES", str(64 * 1024 * 1024)))
+ASR_RESUMABLE_PART_BYTES = int(os.environ.get("ASR_RESUMABLE_PART_BYTES", str(8 * 1024 * 1024)))
+ASR_UPLOAD_STATE_DIR = Path(os.environ.get("ASR_UPLOAD_STATE_DIR", "data/.uploads"))
+
+# 支持的语言（音频格式按文件头识别，见 utils/discovery.py）
+VALID_LANGUAGES = ["auto", "zh", "en", "yue", "ja", "ko", "nospeech"]
+
+# 批量模式的并发上限（避免压垮 ASR 服务）
+BATCH_MAX_WORKERS = 16
+
+# 客户端切片：时长超过 ASR_CHUNK_MIN_DURATION 的 WAV 在静音处切分为
+# 不超过 ASR_CHUNK_SECONDS 的片段，并发转录后按顺序拼接
+ASR_CHUNK_MIN_DURATION = float(os.environ.get("ASR_CHUNK_MIN_DURATION", "60"))
+ASR_CHUNK_SECONDS = float(os.environ.get("ASR_CHUNK_SECONDS", "30"))
+ASR_SEGMENT_WORKERS = int(os.environ.get("ASR_SEGMENT_WORKERS", "4"))
+
+# 语言预检测：lang="auto" 且 WAV 长于该秒数时，先只上传开头这么长的片段识别语言，
+# 其余音频再以识别出的语言转录，与预检测片段的结果拼接；识别结果按内容缓存（0 关闭）。
+# 预检测只发送一轮请求，截止时间为 ASR_LANG_PROBE_DEADLINE 秒，失败时按 auto 转录整段音频
+ASR_LANG_PROBE_SECONDS = float(os.environ.get("ASR_LANG_PROBE_SECONDS", "0"))
+ASR_LANG_PROBE_DEADLINE = float(os.environ.get("ASR_LANG_PROBE_DEADLINE", "30"))
+
+# 无语音检测：WAV 中能量不低于 ASR_NOSPEECH_ENERGY_DB、过零率不高于 ASR_NOSPEECH_MAX_ZCR 的帧
+# 累计不足 ASR_NOSPEECH_MIN_SPEECH_SECONDS 秒时，不请求 ASR 服务，直接返回 nospeech 结果（ASR_NOSPEECH_ENABLED=0 关闭）
+ASR_NOSPEECH_ENABLED = os.environ.get("ASR_NOSPEECH_ENABLED", "1") != "0"
+ASR_NOSPEECH_ENERGY_DB = float(os.environ.get("ASR_NOSPEECH_ENERGY_DB", "-45"))
+ASR_NOSPEECH_MAX_ZCR = float(os.environ.get("ASR_NOSPEECH_MAX_ZCR", "0.35"))
+ASR_NOSPEECH_MIN_SPEECH_SECONDS = float(os.environ.get("ASR_NOSPEECH_MIN_SPEECH_SECONDS", "0.3"))
+NOSPEECH_FRAME_SECONDS = 0.03
+
+# 流式模式：WAV 总是切片，片段越短首段文字返回越快
+ASR_STREAM_SEGMENT_SECONDS = float(os.environ.get("ASR_STREAM_SEGMENT_SECONDS", "30"))
+
+# 分阶段耗时：audio_to_text 的结果在 metadata.metrics 中返回，并输出一行 JSON 日志（0 关闭日志）
+ASR_METRICS_LOG = os.environ.get("ASR_METRICS_LOG", "1") != "0"
+
+# Prometheus 指标（本进程内累计）：ASR_METRICS_PORT 不为空时在本地端口提供 GET /metrics；
+# ASR_METRICS_FILE 不为空时每次调用结束后写入文本格式文件（路径中的 {pid} 替换为进程号）
+ASR_METRICS_HOST = os.environ.get("ASR_METRICS_HOST", "127.0.0.1")
+ASR_METRICS_PORT = os.environ.get("ASR_METRICS_PORT", "")
+ASR_METRICS_FILE = os.environ.get("ASR_METRICS_FILE", "")
+
+_HTTP_POOL = HTTPPool(pool_size=ASR_HTTP_POOL_SIZE, idle_timeout=ASR_HTTP_IDLE_TIMEOUT)
+_ASYNC_HTTP_POOL = AsyncHTTPPool(max_connections=ASR_ASYNC_MAX_CONNECTIONS, idle_timeout=ASR_HTTP_IDLE_TIMEOUT)
+_BALANCER = EndpointBalancer(
+    ASR_API_URLS,
+    strategy=ASR_LB_STRATEGY,
+    failure_threshold=ASR_CIRCUIT_FAILURES,
+    reset_timeout=ASR_CIRCUIT_RESET_SECONDS,
+)
+# 视为后端故障、需要换一个后端重发的异常（同步客户端的异常类型见 _failover_errors）
+_ASYNC_FAILOVER_ERRORS = (HTTPConnectionError, HTTPTimeout)
+_PROMETHEUS = Registry()
+_PROM_REQUESTS = _PROMETHEUS.counter(
+    "asr_requests_total", "预制件函数调用次数，status 为 ok 或错误代码", ("function", "lang", "status")
+)
+_PROM_LATENCY = _PROMETHEUS.histogram("asr_request_duration_seconds", "预制件函数调用耗时（秒）", ("function", "lang"))
+_PROM_INFLIGHT = _PROMETHEUS.gauge("asr_inflight_requests", "正在进行的预制件函数调用数", ("function",))
+_PROM_BACKEND_REQUESTS = _PROMETHEUS.counter(
+    "asr_backend_requests_total", "发往 ASR 服务的 HTTP 请求数，status 为状态码，没有响应时为 error", ("endpoint", "status")
+)
+_PROM_BACKEND_LATENCY = _PROMETHEUS.histogram(
+    "asr_backend_request_duration_seconds", "发往 ASR 服务的单个 HTTP 请求耗时（秒）", ("endpoint",)
+)
+_PROM_UPLOAD_BYTES = _PROMETHEUS.counter("asr_upload_bytes_total", "发往 ASR 服务的请求体字节数", ("endpoint",))
+_PROM_CACHE_LOOKUPS = _PROMETHEUS.counter("asr_cache_lookups_total", "转录缓存查询次数，result 为 hit 或 miss", ("result",))
+_PROM_NOSPEECH_SECONDS = _PROMETHEUS.counter(
+    "asr_nospeech_skipped_seconds_total", "检测为无语音、未发送到 ASR 服务的音频时长（秒）"
+)
+_PROM_CONCURRENCY_LIMIT = _PROMETHEUS.gauge("asr_concurrency_limit", "自适应并发限制当前允许的在途请求数")
+_PROM_CONCURRENCY_CHANGES = _PROMETHEUS.counter(
+    "asr_concurrency_limit_changes_total", "自适应并发限制的调整次数，reason 为 increase、latency 或过载原因", ("reason",)
+)
+_PROM_SERVER = None
+_PROM_SERVER_LOCK = threading.Lock()
+
+_CACHE = (
+    TranscriptionCache(ASR_CACHE_DIR, max_bytes=ASR_CACHE_MAX_BYTES, ttl=ASR_CACHE_TTL)
+    if ASR_CACHE_ENABLED else None
+)
+_SINGLE_FLIGHT = SingleFlight(ASR_LOCK_DIR) if ASR_COALESCE_ENABLED else None
+# 本进程内被 ASR 服务拒绝过的上传编码
+_REJECTED_CODECS: set[str] = set()
+# 本进程内确认不支持分片续传的后端
+_RESUMABLE_UNSUPPORTED: set[str] = set()
+
+
+def _on_limit_change(change: dict) -> None:
+    """记录自适应并发限制的一次调整"""
+    print(f"[ASR] Concurrency limit {change['previous']} -> {change['limit']} ({change['reason']})")
+    _PROM_CONCURRENCY_LIMIT.set(change["limit"])
+    _PROM_CONCURRENCY_CHANGES.inc(reason=change["reason"])
+
+
+def _new_limiter() -> AdaptiveLimiter:
+    """按 ASR_LIMIT_* 配置创建自适应并发限制器，并同步 asr_concurrency_limit 指标"""
+    limiter = AdaptiveLimiter(
+        ASR_LIMIT_INITIAL,
+        min_limit=ASR_LIMIT_MIN,
+        max_limit=ASR_LIMIT_MAX,
+        tolerance=ASR_LIMIT_LATENCY_TOLERANCE,
+        on_change=_on_limit_change,
+    )
+    _PROM_CONCURRENCY_LIMIT.set(limiter.limit)
+    return limiter
+
+
+_LIMITER = _new_limiter() if ASR_LIMIT_ENABLED else None
+
+
+class _DeadlineExceeded(Exception):
+    """一次上传的总截止时间已到，不再发送新的请求"""
+
+
+@dataclass(frozen=True)
+class _RetryPolicy:
+    """
+    重试策略
+
+    Attributes:
+        max_attempts: 一次上传最多尝试的轮数（每轮在可用后端之间故障转移）
+        backoff_base: 第一次重试前退避上限（秒），之后每次翻倍
+        backoff_max: 退避上限的最大值（秒）
+        deadline: 一次上传所有尝试的总截止时间（秒）
+    """
+
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    deadline: float = 300.0
+
+    def backoff(self, retry: int) -> float:
+        """第 retry 次重试前的等待秒数：在 [0, min(backoff_max, backoff_base * 2^(retry-1))] 中均匀抽取"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+
+_RETRY_POLICY = _RetryPolicy(
+    max_attempts=max(1, ASR_RETRY_MAX_ATTEMPTS),
+    backoff_base=ASR_RETRY_BACKOFF_BASE,
+    backoff_max=ASR_RETRY_BACKOFF_MAX,
+    deadline=ASR_REQUEST_DEADLINE,
+)
+
+
+class _RetryBudget:
+    """
+    一次上传（包括压缩数据被拒后的重传）的重试状态
+
+    Attributes:
+        deadline: 截止时刻（time.monotonic() 时间）
+        attempts: 已发送的 HTTP 请求数（包括故障转移）
+        retries: 已进行的退避重试次数
+    """
+
+    def __init__(self, policy: _RetryPolicy):
+        self.policy = policy
+        self.deadline = time.monotonic() + policy.deadline
+        self.attempts = 0
+        self.retries = 0
+
+    def remaining(self) -> float:
+        """距截止时间的剩余秒数"""
+        return self.deadline - time.monotonic()
+
+    def next_delay(self, response=None) -> float | None:
+        """
+        计算下一次重试前的等待时间，并计入一次重试
+
+        服务通过 Retry-After 头给出等待秒数时，至少等待该时长。
+
+        Returns:
+            等待秒数；重试次数用尽，或等待后已超过截止时间时返回 None
+        """
+        if self.retries + 1 >= self.policy.max_attempts:
+            return None
+        delay = self.policy.backoff(self.retries + 1)
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if delay >= self.remaining():
+            return None
+        self.retries += 1
+        return delay
+
+    def report(self) -> dict:
+        return {"attempts": self.attempts, "retries": self.retries}
+
+
+def _retry_after(response) -> float | None:
+    """读取 429/503 响应的 Retry-After 头（秒数形式），没有或无法解析时返回 None"""
+    if response is None or response.status_code not in (429, 503):
+        return None
+    try:
+        return max(0.0, float(response.headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class _TranscribeOptions:
+    """
+    一次转录调用的参数，在扫描、预处理、缓存和上传各阶段之间传递
+
+    Attributes:
+        lang: 已校验的语言参数
+        normalize_audio: 上传前是否将 WAV 规范化为 16kHz 单声道 16 位 PCM
+        compress_upload: 上传前是否将 WAV 无损压缩为 FLAC（服务支持时）
+        metrics: 记录各阶段耗时的对象，为 None 时不记录
+        sink: 长音频的片段按顺序转录完成后立即写入的输出文件，为 None 时不写入
+        content_hash: 输入文件的内容哈希（计算缓存键时得出），未计算时为 None
+    """
+
+    lang: str
+    normalize_audio: bool = False
+    compress_upload: bool = False
+    metrics: CallMetrics | None = field(default=None, compare=False)
+    sink: TranscriptWriter | None = field(default=None, compare=False)
+    content_hash: str | None = field(default=None, compare=False)
+
+    @property
+    def cache_variant(self) -> str:
+        """影响转录结果的客户端处理方式，作为缓存键的一部分"""
+        return "normalized-16k-mono" if self.normalize_audio else ""
+
+
+def _stage(options: _TranscribeOptions, stage: str):
+    """记录一个阶段的耗时；本次调用不收集指标时什么也不做"""
+    return options.metrics.span(stage) if options.metrics is not None else nullcontext()
+
+
+def _error_result(message: str, code: str) -> dict:
+    """构造统一格式的错误返回值"""
+    return {
+        "error": {
+            "message": message,
+            "code": code
+        }
+    }
+
+
+def _validate_language(lang: str) -> dict | None:
+    """校验语言参数，不合法时返回错误字典"""
+    if lang not in VALID_LANGUAGES:
+        return _error_result(
+            f"不支持的语言: {lang}。支持的语言: {', '.join(VALID_LANGUAGES)}",
+            "INVALID_LANGUAGE"
+        )
+    return None
+
+
+def _with_metadata(result: dict, **sections) -> dict:
+    """将附加信息合并到结果的 metadata 字段中"""
+    result.setdefault("metadata", {}).update(sections)
+    return result
+
+
+def _log_pool_stats(pool=None) -> None:
+    """输出连接池复用统计、自适应并发上限和各后端的负载均衡统计"""
+    stats = (pool or _HTTP_POOL).stats()
+    print(
+        f"[ASR] HTTP pool: {stats['requests']} requests, "
+        f"{stats['reused_connections']} reused, {stats['new_connections']} new, "
+        f"{stats['idle_evictions']} idle evictions (reuse ratio {stats['reuse_ratio']:.0%})"
+    )
+    if _LIMITER is not None:
+        print(f"[ASR] Concurrency limit: {_LIMITER.limit} ({_LIMITER.in_flight} in flight, "
+              f"{_LIMITER.seq} adjustments)")
+    endpoints = _BALANCER.stats()
+    if len(endpoints) > 1:
+        for url, endpoint in endpoints.items():
+            print(
+                f"[ASR] Endpoint {url}: {endpoint['state']}, {endpoint['requests']} requests, "
+                f"{endpoint['failures']} failures, EWMA latency {endpoint['ewma_latency_ms']} ms"
+            )
+
+
+def _report_metrics(result: dict, audio_file: Path, lang: str, metrics: CallMetrics) -> dict:
+    """
+    汇总一次调用的分阶段耗时：成功结果写入 metadata.metrics，并输出一行 JSON 日志
+
+    JSON 日志对失败的调用同样输出（status 为错误代码），便于排查慢请求和超时。
+    """
+    report = metrics.report()
+    if ASR_METRICS_LOG:
+        status = result["error"]["code"] if "error" in result else "ok"
+        print(json.dumps(
+            {"event": "asr_metrics", "filename": audio_file.name, "lang": lang, "status": status, **report},
+            ensure_ascii=False,
+        ))
+    if "error" in result:
+        return result
+    return _with_metadata(result, metrics=report)
+
+
+def _parse_output_formats(output_formats: str) -> list[str] | dict:
+    """解析逗号分隔的输出格式，返回去重后的格式列表或 INVALID_PARAMETER 错误"""
+    formats = []
+    for fmt in str(output_formats or "").split(","):
+        fmt = fmt.strip().lower()
+        if not fmt or fmt in formats:
+            continue
+        if fmt not in OUTPUT_FORMATS:
+            return _error_result(
+                f"不支持的输出格式: {fmt}，支持的格式: {', '.join(OUTPUT_FORMATS)}", "INVALID_PARAMETER"
+            )
+        formats.append(fmt)
+    return formats
+
+
+def _write_outputs(result: dict, sink: TranscriptWriter) -> dict:
+    """
+    完成输出文件，返回只含摘要的结果
+
+    长音频的片段在转录过程中已经写入；缓存命中、合并的请求和整体上传的结果
+    在这里一次写入。失败时删除已写入的部分。
+    """
+    if "error" in result:
+        sink.abort()
+        return result
+    try:
+        if sink.pieces == 0:
+            sink.write(result.get("text", ""), result.get("timestamps"))
+        outputs = sink.close()
+    except OSError as e:
+        sink.abort()
+        return _error_result(f"写入输出文件失败: {str(e)}", "FILE_ERROR")
+    print(f"[ASR] Wrote {sink.cues} segments to {', '.join(output['path'] for output in outputs)}")
+
+    summary = {
+        "filename": result["filename"],
+        "language": result["language"],
+        "outputs": outputs,
+        "segments": sink.cues,
+        "characters": len(result.get("text", "")),
+    }
+    metadata = {name: value for name, value in result.get("metadata", {}).items() if name != "segments"}
+    return _with_metadata(summary, **metadata) if metadata else summary
+
+
+def _start_exporter() -> None:
+    """配置了 ASR_METRICS_PORT 时，在第一次调用时启动 /metrics 服务（端口被占用时只提示一次）"""
+    global _PROM_SERVER
+    if not ASR_METRICS_PORT or _PROM_SERVER is not None:
+        return
+    with _PROM_SERVER_LOCK:
+        if _PROM_SERVER is not None:
+            return
+        try:
+            _PROM_SERVER = serve(_PROMETHEUS, ASR_METRICS_HOST, int(ASR_METRICS_PORT))
+            print(f"[ASR] Metrics exporter listening on http://{ASR_METRICS_HOST}:{ASR_METRICS_PORT}/metrics")
+        except (OSError, ValueError) as e:
+            print(f"[ASR] Failed to start metrics exporter: {e}")
+            _PROM_SERVER = False
+
+
+def _export_textfile() -> None:
+    """配置了 ASR_METRICS_FILE 时写入文本格式的指标文件"""
+    if not ASR_METRICS_FILE:
+        return
+    try:
+        write_textfile(_PROMETHEUS, ASR_METRICS_FILE.replace("{pid}", str(os.getpid())))
+    except OSError as e:
+        print(f"[ASR] Failed to write metrics file: {e}")
+
+
+@contextmanager
+def _observed_call(function: str, lang: str):
+    """
+    统计一次公开函数调用：在途数、按语言和状态的调用次数、按语言的耗时直方图
+
+    Yields:
+        outcome 字典，调用方把 "status" 设为 ok 或错误代码；未设置时记为 UNEXPECTED_ERROR
+    """
+    _start_exporter()
+    # 语言标签只取合法值，避免任意输入产生无限多的时间序列
+    lang = lang if lang in VALID_LANGUAGES else "invalid"
+    _PROM_INFLIGHT.inc(function=function)
+    started = time.monotonic()
+    outcome = {"status": "UNEXPECTED_ERROR"}
+    try:
+        yield outcome
+    finally:
+        _PROM_INFLIGHT.dec(function=function)
+        _PROM_REQUESTS.inc(function=function, lang=lang, status=outcome["status"])
+        _PROM_LATENCY.observe(time.monotonic() - started, function=function, lang=lang)
+        _export_textfile()
+
+
+def _call_status(result: Any) -> str:
+    return result["error"]["code"] if isinstance(result, dict) and "error" in result else "ok"
+
+
+def _observed(fn: Callable) -> Callable:
+    """为公开函数（普通函数、协程函数或生成器函数）加上 _observed_call 统计"""
+    signature = inspect.signature(fn)
+
+    def lang_of(args: tuple, kwargs: dict) -> str:
+        try:
+            return signature.bind(*args, **kwargs).arguments.get("lang", "auto")
+        except TypeError:
+            return "invalid"
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _observed_call(fn.__name__, lang_of(args, kwargs)) as outcome:
+                result = await fn(*args, **kwargs)
+                outcome["status"] = _call_status(result)
+                return result
+    elif inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _observed_call(fn.__name__, lang_of(args, kwargs)) as outcome:
+                outcome["status"] = "ok"
+                for event in fn(*args, **kwargs):
+                    if event.get("type") == "error":
+                        outcome["status"] = event.get("error_code", "UNEXPECTED_ERROR")
+                    yield event
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _observed_call(fn.__name__, lang_of(args, kwargs)) as outcome:
+                result = fn(*args, **kwargs)
+                outcome["status"] = _call_status(result)
+                return result
+    return wrapper
+
+
+def _find_audio_files(first_only: bool = False) -> list[Path] | dict:
+    """
+    惰性扫描输入目录，按文件头识别音频文件
+
+    Args:
+        first_only: 为 True 时找到第一个音频文件即停止扫描（单文件模式）
+
+    Returns:
+        音频文件路径列表（按目录项顺序）；目录不存在或没有音频文件时返回错误字典
+    """
+    try:
+        found = iter_audio_files(DATA_INPUTS)
+        audio_files = list(islice(found, 1)) if first_only else list(found)
+    except (FileNotFoundError, NotADirectoryError):
+        return _error_result("输入目录不存在", "NO_INPUT_DIR")
+
+    if not audio_files:
+        return _error_result("未找到音频文件（支持 .wav 和 .mp3 格式）", "NO_AUDIO_FILES")
+
+    return audio_files
+
+
+def _compress_payload(filename: str, file_handle: BinaryIO) -> tuple[str, BinaryIO | None, dict]:
+    """
+    将 WAV 上传数据无损压缩为 FLAC
+
+    Returns:
+        (上传文件名, 压缩后的文件对象, 上传报告)；不压缩时文件对象为 None，
+        报告的 reason 字段说明原因
+    """
+    original_bytes = file_handle.seek(0, os.SEEK_END)
+    report = {"codec": "wav", "original_bytes": original_bytes, "wire_bytes": original_bytes}
+    if "flac" not in ASR_UPLOAD_CODECS or "flac" in _REJECTED_CODECS:
+        return filename, None, {**report, "reason": "ASR 服务不支持 FLAC 上传"}
+
+    info = read_wav_info(file_handle)
+    if info is None or info.sample_width not in (1, 2):
+        return filename, None, {**report, "reason": "仅支持 8/16 位 PCM WAV"}
+
+    started = time.perf_counter()
+    compressed = tempfile.SpooledTemporaryFile(max_size=_UPLOAD_SPOOL_BYTES)
+    try:
+        wire_bytes = encode_flac(file_handle, info, compressed)
+    except (OSError, ValueError) as e:
+        compressed.close()
+        return filename, None, {**report, "reason": f"FLAC 编码失败: {e}"}
+    encode_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    if wire_bytes >= original_bytes:
+        compressed.close()
+        return filename, None, {**report, "encode_ms": encode_ms, "reason": "压缩后没有变小"}
+
+    compressed.seek(0)
+    return f"{Path(filename).stem}.flac", compressed, {
+        **report, "codec": "flac", "wire_bytes": wire_bytes, "encode_ms": encode_ms
+    }
+
+
+def _reject_codec(upload: dict, status_code: int) -> dict:
+    """ASR 服务拒绝压缩上传：本进程内停用该编码，并把上传报告改为原始 WAV"""
+    print(f"[ASR] Backend rejected {upload['codec'].upper()} upload (HTTP {status_code}), resending original WAV")
+    _REJECTED_CODECS.add(upload["codec"])
+    return {
+        **upload, "codec": "wav", "wire_bytes": upload["original_bytes"],
+        "reason": f"ASR 服务拒绝 {upload['codec'].upper()} 上传: HTTP {status_code}",
+    }
+
+
+def _log_upload(filename: str, upload: dict | None) -> None:
+    """输出一次上传实际使用的编码和节省的字节数"""
+    if upload is not None:
+        saved = upload["original_bytes"] - upload["wire_bytes"]
+        print(
+            f"[ASR] Upload {filename}: {upload['codec']} {upload['wire_bytes']} bytes "
+            f"({saved} of {upload['original_bytes']} saved)"
+        )
+
+
+def _format_response(response, filename: str, lang: str, **metadata) -> dict:
+    """
+    将 ASR 服务的响应转换为结果字典（同步和异步客户端的响应都适用）
+
+    metadata 中值不为 None 的项合并到成功结果的 metadata 字段中。
+
+    Raises:
+        ValueError: 响应体不是合法的 JSON
+    """
+    # 检查响应状态
+    if response.status_code != 200:
+        return _error_result(
+            f"ASR 服务返回错误: HTTP {response.status_code} - {response.text}",
+            "ASR_API_ERROR"
+        )
+
+    # 解析响应
+    result_data = response.json()
+
+    # ASR 服务返回格式: {"result": [{"key": "filename", "text": "...", ...}]}
+    if isinstance(result_data, dict) and "result" in result_data and result_data["result"]:
+        first_result = result_data["result"][0]
+        raw_text = first_result.get("raw_text", "")
+        tags = parse_tags(raw_text) if raw_text else []
+        # 后端没有返回 clean_text 时由 raw_text 去掉标记得出
+        clean_text = first_result.get("clean_text") or _join_texts(segment["text"] for segment in tags)
+        result = {
+            "text": clean_text or first_result.get("text", ""),
+            "filename": filename,
+            "language": lang,
+            "raw_text": raw_text,
+            "clean_text": clean_text
+        }
+        if tags:
+            result["tags"] = tags
+        timestamps = from_backend(first_result, result["text"])
+        if timestamps is not None:
+            result["timestamps"] = timestamps
+    else:
+        # 如果格式不符合预期，返回原始数据
+        result = {
+            "text": str(result_data),
+            "filename": filename,
+            "language": lang
+        }
+    sections = {name: value for name, value in metadata.items() if value is not None}
+    return _with_metadata(result, **sections) if sections else result
+
+
+def _failover_errors() -> tuple[type[Exception], ...]:
+    """同步客户端视为后端故障的异常（requests 延迟导入，不能在模块级引用）"""
+    requests = load_requests()
+    return (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def _request_error(error: Exception) -> dict:
+    """将上传过程中的异常映射为统一的错误代码（同步和异步客户端共用）"""
+    requests = load_requests()
+    if isinstance(error, (requests.exceptions.Timeout, HTTPTimeout, _DeadlineExceeded)):
+        return _error_result(f"ASR 服务请求超时（{_RETRY_POLICY.deadline:g} 秒）", "TIMEOUT")
+    if isinstance(error, (requests.exceptions.ConnectionError, HTTPConnectionError)):
+        return _error_result(f"无法连接到 ASR 服务: {', '.join(ASR_API_URLS)}", "CONNECTION_ERROR")
+    if isinstance(error, requests.exceptions.RequestException):
+        return _error_result(f"请求 ASR 服务时发生错误: {str(error)}", "REQUEST_ERROR")
+    if isinstance(error, ValueError):
+        return _error_result(f"解析 ASR 响应失败: {str(error)}", "PARSE_ERROR")
+    return _error_result(f"打开或处理音频文件失败: {str(error)}", "FILE_ERROR")
+
+
+def _log_retry(budget: _RetryBudget, reason: str, delay: float) -> None:
+    print(f"[ASR] Transient failure ({reason}), retry {budget.retries}/{budget.policy.max_attempts - 1} "
+          f"in {delay:.2f}s ({budget.remaining():.0f}s left before deadline)")
+
+
+def _record_request(
+    metrics: CallMetrics | None, url: str, sent_at: float, body_done_at: float | None, bytes_sent: int, response
+) -> None:
+    """记录一次 HTTP 请求：本次调用的分阶段耗时（metrics 不为 None 时）和 Prometheus 指标"""
+    if metrics is not None:
+        metrics.record_request(sent_at, body_done_at, bytes_sent, response)
+    status = str(response.status_code) if response is not None else "error"
+    _PROM_BACKEND_REQUESTS.inc(endpoint=url, status=status)
+    _PROM_BACKEND_LATENCY.observe(time.monotonic() - sent_at, endpoint=url)
+    _PROM_UPLOAD_BYTES.inc(bytes_sent, endpoint=url)
+
+
+def _overload_reason(response, error: BaseException | None) -> str | None:
+    """请求结果是否表示 ASR 服务过载：429/503 响应或请求超时"""
+    if response is not None:
+        return f"HTTP {response.status_code}" if response.status_code in _OVERLOAD_STATUS else None
+    if isinstance(error, (load_requests().exceptions.Timeout, HTTPTimeout)):
+        return "timeout"
+    return None
+
+
+def _release_slot(token: int, outcome: dict) -> None:
+    """
+    归还并发名额：过载信号使限制器降低上限
+
+    只有 2xx 响应的耗时作为样本：按请求体大小的量级（2 的幂）分组，归一化为每 LIMIT_LATENCY_UNIT_BYTES
+    的耗时，只与同组的基线比较，小请求和错误响应不会拉低大请求的基线。
+    """
+    response = outcome.get("response")
+    latency = group = None
+    if response is not None:
+        latency = time.monotonic() - outcome["started"]
+        if 200 <= response.status_code < 300:
+            size = max(1, outcome["bytes"])
+            group = size.bit_length()
+            latency = latency * LIMIT_LATENCY_UNIT_BYTES / size
+    _LIMITER.release(token, latency, outcome.get("overload"), group)
+
+
+@contextmanager
+def _concurrency_slot(timeout: float) -> Iterator[dict]:
+    """
+    在自适应并发限制下发送一轮请求：等待一个在途名额，请求结束后按结果调整上限
+
+    名额在向负载均衡器要后端之前取得，排队时间不计入后端的在途请求数和耗时；
+    yield 的字典交给 _slot_request 记录名额内（包括故障转移）发出的每个请求。
+
+    Raises:
+        _DeadlineExceeded: 截止时间之前没有等到名额
+    """
+    outcome = {}
+    if _LIMITER is None:
+        yield outcome
+        return
+    try:
+        token = _LIMITER.acquire(timeout)
+    except TimeoutError:
+        raise _DeadlineExceeded() from None
+    try:
+        yield outcome
+    finally:
+        _release_slot(token, outcome)
+
+
+@asynccontextmanager
+async def _concurrency_slot_async(timeout: float):
+    """_concurrency_slot 的异步版本，等待名额不阻塞事件循环"""
+    outcome = {}
+    if _LIMITER is None:
+        yield outcome
+        return
+    try:
+        token = await asyncio.wait_for(_LIMITER.acquire_async(), timeout)
+    except asyncio.TimeoutError:
+        raise _DeadlineExceeded() from None
+    try:
+        yield outcome
+    finally:
+        _release_slot(token, outcome)
+
+
+@contextmanager
+def _slot_request(slot: dict) -> Iterator[None]:
+    """
+    在并发名额内发送一个请求：记录发出时间，调用方填入 response（响应）和 bytes（请求体字节数）
+
+    故障转移时名额内的任一请求过载（429/503 或超时），归还名额时都按过载处理。
+    """
+    slot.update(started=time.monotonic(), response=None, bytes=0)
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        reason = _overload_reason(slot["response"], error)
+        if reason is not None:
+            slot.setdefault("overload", reason)
+
+
+def _concurrency_report(since: int | None) -> dict | None:
+    """metadata.concurrency：当前上限、在途请求数和本次调用期间的上限变化（未开启时为 None）"""
+    if _LIMITER is None or since is None:
+        return None
+    return _LIMITER.report(since)
+
+
+def _wants_resumable(file_handle: BinaryIO) -> bool:
+    """上传数据足够大、且还有后端可能支持分片续传时使用分片续传"""
+    if ASR_RESUMABLE_MIN_BYTES <= 0 or file_handle.seek(0, os.SEEK_END) < ASR_RESUMABLE_MIN_BYTES:
+        return False
+    return any(url not in _RESUMABLE_UNSUPPORTED for url in ASR_API_URLS)
+
+
+def _upload_digest(file_handle: BinaryIO, content_hash: str | None) -> tuple[str, int] | None:
+    """
+    分片续传需要的 (SHA-256, 字节数)，不使用分片续传时为 None
+
+    调用方已知内容哈希（未经规范化和压缩的输入文件）时直接使用，不再从头读取一遍计算。
+    """
+    if not _wants_resumable(file_handle):
+        return None
+    if content_hash is not None:
+        return content_hash, file_handle.seek(0, os.SEEK_END)
+    return hash_stream(file_handle)
+
+
+def _upload_resumable(
+    url: str,
+    upload_name: str,
+    file_handle: BinaryIO,
+    digest: tuple[str, int],
+    lang: str,
+    timeout: Callable[[], float],
+    metrics: CallMetrics | None,
+):
+    """
+    以分片续传协议把一份音频数据上传到一个后端
+
+    Returns:
+        (响应, metadata.backend.resumable 报告)
+
+    Raises:
+        ResumableNotSupported: 该后端不支持分片续传
+    """
+    def record(sent_at: float, bytes_sent: int, response, final: bool) -> None:
+        # 分片请求的耗时都算作上传；提交请求的请求体很小，耗时算作推理
+        _record_request(metrics, url, sent_at, sent_at if final else None, bytes_sent, response)
+
+    uploader = ResumableUploader(_HTTP_POOL.request, ASR_UPLOAD_STATE_DIR, ASR_RESUMABLE_PART_BYTES)
+    sha256, size = digest
+    response, report = uploader.upload(url, upload_name, file_handle, sha256, size, {"lang": lang}, timeout, record)
+    if report.get("parts_resumed"):
+        print(f"[ASR] Resumed upload of {upload_name} at part {report['parts_resumed']}/{report['parts']}")
+    return response, report
+
+
+def _post_audio(
+    upload_name: str,
+    file_handle: BinaryIO,
+    lang: str,
+    content_type: str,
+    budget: _RetryBudget,
+    metrics: CallMetrics | None = None,
+    content_hash: str | None = None,
+) -> tuple["requests.Response", dict]:
+    """
+    以流式 multipart 请求体上传一份音频数据（复用连接池中的 keep-alive 连接）
+
+    由负载均衡器选择后端；后端连接失败、超时或返回 502/503/504 时，
+    从头重新读取同一份数据发往另一个后端。所有后端都失败，或返回其他
+    可重试状态码时，按退避策略等待后重试，直到重试次数或截止时间用尽。
+
+    不小于 ASR_RESUMABLE_MIN_BYTES 的数据先尝试分片续传：连接断开后的重试从服务已确认的
+    分片继续，而不是从第 0 字节重传；后端不支持时回退到整体 multipart 上传。content_hash 为
+    file_handle 内容的 SHA-256（已知时），分片续传不必再读取整个文件计算。
+
+    每一轮请求（包括其中的故障转移）都在自适应并发限制（_LIMITER）下发送：没有空闲名额时
+    在选择后端之前等待，请求结束后以其耗时和状态码调整上限。
+
+    每次请求的上传和等待响应耗时、字节数记录在 metrics 中（不为 None 时）。
+
+    Returns:
+        (最后一次的响应, {"endpoint": 处理请求的后端, "attempts": 请求数, "retries": 重试次数,
+         "resumable": 分片续传报告（使用分片续传时）})
+
+    Raises:
+        _DeadlineExceeded: 截止时间已到
+        requests.exceptions.RequestException: 重试用尽后最后一次请求的异常
+    """
+    def timeout() -> float:
+        remaining = budget.remaining()
+        if remaining <= 0:
+            raise _DeadlineExceeded()
+        return remaining
+
+    def send(url: str, slot: dict) -> "requests.Response":
+        with _slot_request(slot):
+            return post(url, slot)
+
+    def post(url: str, slot: dict) -> "requests.Response":
+        remaining = timeout()
+        budget.attempts += 1
+        resumable_report.clear()
+        if digest is not None and url not in _RESUMABLE_UNSUPPORTED:
+            try:
+                response, report = _upload_resumable(url, upload_name, file_handle, digest, lang, timeout, metrics)
+                resumable_report.update(report)
+                slot.update(response=response, bytes=report.get("bytes_sent", 0))
+                return response
+            except ResumableNotSupported as e:
+                _RESUMABLE_UNSUPPORTED.add(url)
+                print(f"[ASR] {url} does not support resumable uploads ({e}), falling back to a single POST")
+        file_handle.seek(0)
+        body = MultipartStream({"lang": lang}, "files", upload_name, file_handle, content_type)
+        sent_at, response = time.monotonic(), None
+        try:
+            response = _HTTP_POOL.post(
+                url,
+                data=body,
+                headers={"Content-Type": body.content_type},
+                timeout=remaining  # 剩余的截止时间（默认总共 5 分钟，处理较长音频）
+            )
+            return response
+        finally:
+            slot.update(response=response, bytes=body.tell())
+            _record_request(metrics, url, sent_at, body.completed_at, body.tell(), response)
+
+    digest = _upload_digest(file_handle, content_hash)
+    resumable_report = {}
+    failover_errors = _failover_errors()
+    while True:
+        try:
+            with _concurrency_slot(timeout()) as slot:
+                response, backend = _BALANCER.call(lambda url: send(url, slot), failover_errors)
+        except failover_errors as e:
+            delay = budget.next_delay()
+            if delay is None:
+                raise
+            reason = type(e).__name__
+        else:
+            if response.status_code not in _RETRYABLE_STATUS or (delay := budget.next_delay(response)) is None:
+                report = {"endpoint": backend["endpoint"], **budget.report()}
+                if resumable_report:
+                    report["resumable"] = dict(resumable_report)
+                return response, report
+            reason = f"HTTP {response.status_code}"
+        _log_retry(budget, reason, delay)
+        time.sleep(delay)
+
+
+def _record_attempts(result: dict, budget: _RetryBudget) -> dict:
+    """请求已经发出后失败时，在错误信息中记录请求数和重试次数"""
+    if "error" in result and budget.attempts:
+        result["error"].update(budget.report())
+    return result
+
+
+def _transcribe_payload(
+    filename: str,
+    open_payload: Callable[[], BinaryIO],
+    options: _TranscribeOptions,
+    policy: _RetryPolicy | None = None,
+    content_hash: str | None = None,
+) -> dict:
+    """
+    将一份音频数据上传到 ASR 服务并格式化结果
+
+    开启 compress_upload 时先把 WAV 压缩为 FLAC 再上传；ASR 服务拒绝压缩
+    数据时自动以原始字节重传。压缩前后的字节数和编码耗时记录在结果的
+    metadata.upload 中。暂时性故障按 _RETRY_POLICY 重试，请求数和重试
+    次数记录在 metadata.backend（失败时记录在 error）中；自适应并发限制的当前上限和本次调用
+    期间的调整记录在 metadata.concurrency 中。
+
+    Args:
+        filename: 上传时使用的文件名（也会写入结果的 filename 字段）
+        open_payload: 返回可读二进制文件对象的可调用对象，在 try 块内调用，
+            以便打开文件失败时也能返回 FILE_ERROR
+        options: 本次转录的参数
+        policy: 重试策略，默认为 _RETRY_POLICY
+        content_hash: open_payload 返回内容的 SHA-256（已知时），以原始字节上传大文件时不再重新计算
+
+    Returns:
+        与 audio_to_text 相同格式的结果字典（成功结果或错误信息）
+    """
+    lang = options.lang
+    file_handle = None
+    compressed = None
+    budget = _RetryBudget(policy or _RETRY_POLICY)
+    limit_seq = _LIMITER.seq if _LIMITER is not None else None
+    try:
+        # 1. 准备文件上传：multipart 请求体按块从文件读取，带预先计算的 Content-Length
+        file_handle = open_payload()
+        upload = None
+        if options.compress_upload:
+            with _stage(options, "encode"):
+                upload_name, compressed, upload = _compress_payload(filename, file_handle)
+
+        # 2. 调用 ASR API，压缩数据被拒绝时回退到原始字节
+        metrics = options.metrics
+        if compressed is not None:
+            response, backend = _post_audio(upload_name, compressed, lang, "audio/flac", budget, metrics)
+            if response.status_code in _CODEC_REJECTED_STATUS:
+                upload = _reject_codec(upload, response.status_code)
+                response, backend = _post_audio(filename, file_handle, lang, "audio/wav", budget, metrics, content_hash)
+        else:
+            response, backend = _post_audio(filename, file_handle, lang, "audio/wav", budget, metrics, content_hash)
+        _log_upload(filename, upload)
+
+        # 3. 格式化返回结果
+        with _stage(options, "parse"):
+            result = _format_response(
+                response, filename, lang, upload=upload, backend=backend, concurrency=_concurrency_report(limit_seq)
+            )
+
+    except Exception as e:
+        result = _request_error(e)
+
+    finally:
+        # 确保关闭文件
+        if file_handle:
+            file_handle.close()
+        if compressed is not None:
+            compressed.close()
+
+    return _record_attempts(result, budget)
+
+
+async def _post_audio_async(
+    upload_name: str,
+    file_handle: BinaryIO,
+    lang: str,
+    content_type: str,
+    budget: _RetryBudget,
+    metrics: CallMetrics | None = None,
+    content_hash: str | None = None,
+) -> tuple[AsyncResponse, dict]:
+    """
+    _post_audio 的异步版本，请求体的磁盘读取在线程中执行，退避等待不阻塞事件循环
+
+    需要分片续传的大文件交给线程中的同步版本上传（分片请求逐个发送，不占用事件循环）。
+    """
+    if await asyncio.to_thread(_wants_resumable, file_handle):
+        return await asyncio.to_thread(
+            _post_audio, upload_name, file_handle, lang, content_type, budget, metrics, content_hash
+        )
+
+    def timeout() -> float:
+        remaining = budget.remaining()
+        if remaining <= 0:
+            raise _DeadlineExceeded()
+        return remaining
+
+    async def send(url: str, slot: dict) -> AsyncResponse:
+        with _slot_request(slot):
+            return await post(url, slot)
+
+    async def post(url: str, slot: dict) -> AsyncResponse:
+        remaining = timeout()
+        budget.attempts += 1
+        # MultipartStream 从文件当前位置开始读取，故障转移和重试时必须先回到开头
+        file_handle.seek(0)
+        body = MultipartStream({"lang": lang}, "files", upload_name, file_handle, content_type)
+        sent_at, response = time.monotonic(), None
+        try:
+            response = await _ASYNC_HTTP_POOL.post(
+                url,
+                data=body,
+                headers={"Content-Type": body.content_type},
+                timeout=remaining
+            )
+            return response
+        finally:
+            slot.update(response=response, bytes=body.tell())
+            _record_request(metrics, url, sent_at, body.completed_at, body.tell(), response)
+
+    while True:
+        try:
+            async with _concurrency_slot_async(timeout()) as slot:
+                response, backend = await _BALANCER.call_async(lambda url: send(url, slot), _ASYNC_FAILOVER_ERRORS)
+        except _ASYNC_FAILOVER_ERRORS as e:
+            delay = budget.next_delay()
+            if delay is None:
+                raise
+            reason = type(e).__name__
+        else:
+            if response.status_code not in _RETRYABLE_STATUS or (delay := budget.next_delay(response)) is None:
+                return response, {"endpoint": backend["endpoint"], **budget.report()}
+            reason = f"HTTP {response.status_code}"
+        _log_retry(budget, reason, delay)
+        await asyncio.sleep(delay)
+
+
+async def _transcribe_payload_async(
+    filename: str,
+    open_payload: Callable[[], BinaryIO],
+    options: _TranscribeOptions,
+    policy: _RetryPolicy | None = None,
+    content_hash: str | None = None,
+) -> dict:
+    """_transcribe_payload 的异步版本，压缩、回退、重试和错误代码与同步版本相同"""
+    lang = options.lang
+    file_handle = None
+    compressed = None
+    budget = _RetryBudget(policy or _RETRY_POLICY)
+    limit_seq = _LIMITER.seq if _LIMITER is not None else None
+    try:
+        file_handle = await asyncio.to_thread(open_payload)
+        upload = None
+        if options.compress_upload:
+            with _stage(options, "encode"):
+                upload_name, compressed, upload = await asyncio.to_thread(_compress_payload, filename, file_handle)
+
+        metrics = options.metrics
+        if compressed is not None:
+            response, backend = await _post_audio_async(upload_name, compressed, lang, "audio/flac", budget, metrics)
+            if response.status_code in _CODEC_REJECTED_STATUS:
+                upload = _reject_codec(upload, response.status_code)
+                response, backend = await _post_audio_async(
+                    filename, file_handle, lang, "audio/wav", budget, metrics, content_hash
+                )
+        else:
+            response, backend = await _post_audio_async(
+                filename, file_handle, lang, "audio/wav", budget, metrics, content_hash
+            )
+        _log_upload(filename, upload)
+
+        with _stage(options, "parse"):
+            result = _format_response(
+                response, filename, lang, upload=upload, backend=backend, concurrency=_concurrency_report(limit_seq)
+            )
+
+    except Exception as e:
+        result = _request_error(e)
+
+    finally:
+        if file_handle:
+            file_handle.close()
+        if compressed is not None:
+            compressed.close()
+
+    return _record_attempts(result, budget)
+
+
+def _file_cache_key(content_hash: str, options: _TranscribeOptions) -> str:
+    """由文件内容哈希、语言参数、后端地址和客户端处理方式组成缓存键"""
+    return cache_key(content_hash, options.lang, ASR_API_URL, options.cache_variant)
+
+
+def _cached_result(audio_file: Path, key: str) -> dict | None:
+    """查询缓存，命中时返回带 metadata.cache 的结果"""
+    cached = _CACHE.get(key)
+    _PROM_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+    if cached is None:
+        return None
+    print(f"[ASR] Cache hit: {audio_file.name}")
+    return _with_metadata({**cached, "filename": audio_file.name}, cache={"hit": True, **_CACHE.stats()})
+
+
+def _store_result(key: str, result: dict) -> dict:
+    """缓存成功的结果，并附上 metadata.cache"""
+    if "error" in result or _CACHE is None:
+        return result
+    try:
+        # metadata 描述的是本次调用的过程，不写入缓存
+        _CACHE.put(key, {k: v for k, v in result.items() if k != "metadata"})
+    except OSError as e:
+        print(f"[ASR] Failed to write cache: {e}")
+    return _with_metadata(result, cache={"hit": False, **_CACHE.stats()})
+
+
+def _lookup_cached(audio_file: Path, key: str) -> dict | None:
+    return _cached_result(audio_file, key) if _CACHE is not None else None
+
+
+def _coalesce_options(audio_file: Path, key: str) -> dict:
+    """
+    跨进程合并的参数：其他进程的结果只能通过缓存共享，未启用缓存时只在进程内合并；
+    等待其他进程的时间不超过一次上传的总截止时间
+    """
+    if _CACHE is None:
+        return {}
+    return {"lookup": lambda: _lookup_cached(audio_file, key), "timeout": _RETRY_POLICY.deadline}
+
+
+def _coalesced_result(audio_file: Path, result: dict, source: str | None) -> dict:
+    """
+    整理合并后的结果：共享来的结果改用本文件的文件名，并在 metadata.coalesced
+    中记录结果来自同进程的其他线程（thread）还是其他进程（process）
+    """
+    if source is None or "error" in result:
+        return result
+    print(f"[ASR] Coalesced {audio_file.name} with an in-flight request ({source})")
+    return _with_metadata({**result, "filename": audio_file.name}, coalesced={"shared_with": source})
+
+
+def _transcribe_file(audio_file: Path, options: _TranscribeOptions) -> dict:
+    """
+    转录单个音频文件，优先使用缓存
+
+    以文件内容哈希、语言参数和后端地址为键查询缓存，命中时直接返回缓存的
+    结果，不访问 ASR 服务；未命中时转录并缓存成功的结果。启用缓存时，
+    结果的 metadata.cache 中包含本次是否命中和本进程的命中/未命中计数。
+
+    同一个键的并发调用（同进程的多个线程，或同节点的多个进程）只转录一次，
+    其余调用共享该结果。
+
+    Args:
+        audio_file: 音频文件路径
+        options: 本次转录的参数
+
+    Returns:
+        与 audio_to_text 相同格式的结果字典（成功结果或错误信息）
+    """
+    print(f"[ASR] Processing file: {audio_file.name}")
+
+    if _CACHE is None and _SINGLE_FLIGHT is None:
+        return _transcribe_audio(audio_file, options)
+
+    try:
+        with _stage(options, "hash"):
+            content_hash = hash_file(audio_file)
+    except OSError as e:
+        return _error_result(f"打开或处理音频文件失败: {str(e)}", "FILE_ERROR")
+
+    key = _file_cache_key(content_hash, options)
+    with _stage(options, "cache"):
+        cached = _lookup_cached(audio_file, key)
+    if cached is not None:
+        return cached
+    options = replace(options, content_hash=content_hash)
+
+    def transcribe() -> dict:
+        return _store_result(key, _transcribe_audio(audio_file, options))
+
+    if _SINGLE_FLIGHT is None:
+        return transcribe()
+    result, source = _SINGLE_FLIGHT.do(key, transcribe, **_coalesce_options(audio_file, key))
+    return _coalesced_result(audio_file, result, source)
+
+
+async def _transcribe_file_async(audio_file: Path, options: _TranscribeOptions) -> dict:
+    """_transcribe_file 的异步版本，哈希计算和缓存读写在线程中执行"""
+    print(f"[ASR] Processing file: {audio_file.name}")
+
+    if _CACHE is None and _SINGLE_FLIGHT is None:
+        return await _transcribe_audio_async(audio_file, options)
+
+    try:
+        with _stage(options, "hash"):
+            content_hash = await asyncio.to_thread(hash_file, audio_file)
+    except OSError as e:
+        return _error_result(f"打开或处理音频文件失败: {str(e)}", "FILE_ERROR")
+
+    key = _file_cache_key(content_hash, options)
+    with _stage(options, "cache"):
+        cached = await asyncio.to_thread(_lookup_cached, audio_file, key)
+    if cached is not None:
+        return cached
+    options = replace(options, content_hash=content_hash)
+
+    async def transcribe() -> dict:
+        result = await _transcribe_audio_async(audio_file, options)
+        return await asyncio.to_thread(_store_result, key, result)
+
+    if _SINGLE_FLIGHT is None:
+        return await transcribe()
+    result, source = await _SINGLE_FLIGHT.do_async(key, transcribe, **_coalesce_options(audio_file, key))
+    return _coalesced_result(audio_file, result, source)
+
+
+@contextmanager
+def _prepared_audio(audio_file: Path, options: _TranscribeOptions):
+    """
+    上传前的音频预处理阶段
+
+    开启 normalize_audio 时，将 WAV 下混、重采样为 16kHz 单声道 16 位 PCM
+    并写入临时文件，退出上下文时删除。MP3 等格式和已经符合目标格式的 WAV
+    保持原样。
+
+    Yields:
+        (实际上传的文件路径, 该文件的 WavInfo 或 None, 规范化报告或 None)
+    """
+    with _stage(options, "prepare"):
+        info = read_wav_info(audio_file)
+    if options.metrics is not None and info is not None:
+        options.metrics.audio_seconds = info.duration
+    if not options.normalize_audio:
+        yield audio_file, info, None
+        return
+
+    if info is None:
+        yield audio_file, None, {"applied": False, "reason": "仅支持 PCM WAV，原样上传"}
+        return
+
+    if info.sample_rate == NORMALIZE_SAMPLE_RATE and info.channels == 1 and info.sample_width == 2:
+        yield audio_file, info, {"applied": False, "reason": "已经是 16kHz 单声道 16 位 PCM"}
+        return
+
+    handle = tempfile.NamedTemporaryFile(prefix="asr-normalized-", suffix=".wav", delete=False)
+    normalized = Path(handle.name)
+    try:
+        with handle, _stage(options, "prepare"):
+            normalized_bytes = normalize_wav(audio_file, info, handle, NORMALIZE_SAMPLE_RATE)
+        original_bytes = audio_file.stat().st_size
+        report = {
+            "applied": True,
+            "original_format": f"{info.sample_rate}Hz/{info.channels}ch/{info.sample_width * 8}bit",
+            "original_bytes": original_bytes,
+            "normalized_bytes": normalized_bytes,
+            "bytes_saved": original_bytes - normalized_bytes,
+        }
+        print(
+            f"[ASR] Normalized {audio_file.name} to 16kHz mono: "
+            f"{original_bytes} -> {normalized_bytes} bytes ({report['bytes_saved']} saved)"
+        )
+        yield normalized, read_wav_info(normalized), report
+    finally:
+        normalized.unlink(missing_ok=True)
+
+
+def _transcribe_audio(audio_file: Path, options: _TranscribeOptions) -> dict:
+    """
+    对单个音频文件执行预处理、上传并格式化结果
+
+    Args:
+        audio_file: 音频文件路径
+        options: 本次转录的参数
+
+    Returns:
+        与 audio_to_text 相同格式的结果字典（成功结果或错误信息）
+    """
+    try:
+        with _prepared_audio(audio_file, options) as (path, info, report):
+            probe = None
+            result = _detect_nospeech(audio_file.name, path, info, options)
+            if result is None:
+                options, probe, head = _probe_language(audio_file.name, path, info, options)
+                content_hash = options.content_hash if path == audio_file else None
+                result = _transcribe_prepared(audio_file.name, path, info, options, head, content_hash)
+    except (OSError, ValueError) as e:
+        return _error_result(f"打开或处理音频文件失败: {str(e)}", "FILE_ERROR")
+
+    if report is not None and "error" not in result:
+        _with_metadata(result, normalization=report)
+    if probe is not None and "error" not in result:
+        _with_metadata(result, language_probe=probe)
+    return result
+
+
+def _speech_seconds(path: Path, info: WavInfo) -> float:
+    """
+    检测到的语音时长（秒）
+
+    累计达到 ASR_NOSPEECH_MIN_SPEECH_SECONDS 后立即停止，有语音的文件通常只需读开头一块。
+    """
+    frames = 0
+    needed = ASR_NOSPEECH_MIN_SPEECH_SECONDS / NOSPEECH_FRAME_SECONDS
+    blocks = iter_speech_frames(path, info, ASR_NOSPEECH_ENERGY_DB, ASR_NOSPEECH_MAX_ZCR, NOSPEECH_FRAME_SECONDS)
+    for flags in blocks:
+        frames += int(flags.sum())
+        if frames >= needed:
+            blocks.close()
+            break
+    return frames * NOSPEECH_FRAME_SECONDS
+
+
+def _detect_nospeech(filename: str, path: Path, info: WavInfo | None, options: _TranscribeOptions) -> dict | None:
+    """
+    上传前的本地无语音检测
+
+    WAV 中检测到的语音不足 ASR_NOSPEECH_MIN_SPEECH_SECONDS 秒时，不请求 ASR 服务，
+    直接返回 language 为 nospeech 的空结果，metadata.speech 中记录跳过的音频时长。
+
+    Returns:
+        无语音时的结果字典；有语音、不是 WAV 或未启用检测时为 None
+    """
+    if not ASR_NOSPEECH_ENABLED or info is None or info.n_frames == 0:
+        return None
+    with _stage(options, "vad"):
+        speech_seconds = _speech_seconds(path, info)
+    if speech_seconds >= ASR_NOSPEECH_MIN_SPEECH_SECONDS:
+        return None
+
+    print(
+        f"[ASR] No speech detected in {filename} ({speech_seconds:.2f}s above {ASR_NOSPEECH_ENERGY_DB:g} dBFS "
+        f"in {info.duration:.1f}s), skipping upload"
+    )
+    _PROM_NOSPEECH_SECONDS.inc(info.duration)
+    result = {"text": "", "filename": filename, "language": "nospeech", "raw_text": "", "clean_text": ""}
+    return _with_metadata(result, speech={
+        "detected": False,
+        "speech_seconds": round(speech_seconds, 3),
+        "skipped_seconds": round(info.duration, 3),
+    })
+
+
+def _should_probe(info: WavInfo | None, options: _TranscribeOptions) -> bool:
+    """只对自动检测语言、且长于预检测片段的 WAV 做语言预检测"""
+    return (
+        ASR_LANG_PROBE_SECONDS > 0 and options.lang == "auto"
+        and info is not None and info.duration > ASR_LANG_PROBE_SECONDS
+    )
+
+
+def _probe_cache_key(options: _TranscribeOptions) -> str | None:
+    """语言预检测结果的缓存键：只取决于内容和后端，不同语言参数和预处理方式共用（未启用缓存时为 None）"""
+    if _CACHE is None or options.content_hash is None:
+        return None
+    return cache_key(options.content_hash, "language-probe", ASR_API_URL, f"{ASR_LANG_PROBE_SECONDS:g}s")
+
+
+def _probe_clip(path: Path, info: WavInfo) -> AudioSegment:
+    """音频开头 ASR_LANG_PROBE_SECONDS 秒的片段"""
+    frames = min(info.n_frames, int(ASR_LANG_PROBE_SECONDS * info.sample_rate))
+    segments = split_wav(path, info, [(0, frames)])
+    try:
+        return next(segments)
+    finally:
+        segments.close()
+
+
+def _detected_language(result: dict) -> str | None:
+    """从预检测片段的转录结果（raw_text 的标记）中取出第一个有效的语言"""
+    if "error" in result:
+        return None
+    for tag in result.get("tags", []):
+        if tag["language"] in VALID_LANGUAGES and tag["language"] not in ("auto", "nospeech"):
+            return tag["language"]
+    return None
+
+
+def _probe_policy() -> _RetryPolicy:
+    """预检测的重试策略：只发送一轮请求（仍在后端之间故障转移），截止时间为 ASR_LANG_PROBE_DEADLINE"""
+    return replace(_RETRY_POLICY, max_attempts=1, deadline=min(ASR_LANG_PROBE_DEADLINE, _RETRY_POLICY.deadline))
+
+
+def _apply_probe(
+    filename: str, options: _TranscribeOptions, detected: str | None, report: dict
+) -> tuple[_TranscribeOptions, dict]:
+    """识别出语言时以它作为本次转录的语言，否则仍按 auto 转录"""
+    if detected is None:
+        print(f"[ASR] Language probe for {filename} found no language, falling back to auto")
+        return options, report
+    print(f"[ASR] Language probe for {filename}: {detected}{' (cached)' if report['cached'] else ''}")
+    return replace(options, lang=detected), report
+
+
+def _probe_head(clip: AudioSegment, result: dict, detected: str | None) -> tuple[dict, dict] | None:
+    """识别出语言时，预检测片段的 (片段位置, 转录结果) 作为整段转录的开头，不再重复上传"""
+    return (_segment_span(clip), result) if detected is not None else None
+
+
+def _probe_language(
+    filename: str, path: Path, info: WavInfo | None, options: _TranscribeOptions
+) -> tuple[_TranscribeOptions, dict | None, tuple[dict, dict] | None]:
+    """
+    lang="auto" 时的语言预检测
+
+    先查缓存；未命中时只上传音频开头 ASR_LANG_PROBE_SECONDS 秒（按 _probe_policy 只发送一轮请求），
+    从结果的 raw_text 标记中读出语言并按内容缓存。识别出语言时预检测片段的转录结果作为开头保留，
+    只需再转录其余音频；预检测失败或没有识别出语言时仍按 auto 转录整段音频。
+
+    Returns:
+        (整段转录使用的参数, metadata.language_probe 报告；未做预检测时为 None,
+         已转录的开头片段 (片段位置, 转录结果)；没有时为 None)
+    """
+    if not _should_probe(info, options):
+        return options, None, None
+
+    key = _probe_cache_key(options)
+    cached = _CACHE.get(key) if key is not None else None
+    if cached is not None:
+        report = {"detected": cached["language"], "cached": True}
+        return *_apply_probe(filename, options, cached["language"], report), None
+
+    with _stage(options, "probe"):
+        clip = _probe_clip(path, info)
+        result = _transcribe_payload(
+            f"{Path(filename).stem}_probe.wav", lambda: io.BytesIO(clip.data), replace(options, sink=None),
+            _probe_policy(),
+        )
+    detected = _detected_language(result)
+    if key is not None and detected is not None:
+        _CACHE.put(key, {"language": detected})
+    report = {"detected": detected, "cached": False, "probe_seconds": round(clip.end, 3)}
+    return *_apply_probe(filename, options, detected, report), _probe_head(clip, result, detected)
+
+
+async def _probe_language_async(
+    filename: str, path: Path, info: WavInfo | None, options: _TranscribeOptions
+) -> tuple[_TranscribeOptions, dict | None, tuple[dict, dict] | None]:
+    """_probe_language 的异步版本，片段读取和缓存读写在线程中执行"""
+    if not _should_probe(info, options):
+        return options, None, None
+
+    key = _probe_cache_key(options)
+    cached = await asyncio.to_thread(_CACHE.get, key) if key is not None else None
+    if cached is not None:
+        report = {"detected": cached["language"], "cached": True}
+        return *_apply_probe(filename, options, cached["language"], report), None
+
+    with _stage(options, "probe"):
+        clip = await asyncio.to_thread(_probe_clip, path, info)
+        result = await _transcribe_payload_async(
+            f"{Path(filename).stem}_probe.wav", lambda: io.BytesIO(clip.data), replace(options, sink=None),
+            _probe_policy(),
+        )
+    detected = _detected_language(result)
+    if key is not None and detected is not None:
+        await asyncio.to_thread(_CACHE.put, key, {"language": detected})
+    report = {"detected": detected, "cached": False, "probe_seconds": round(clip.end, 3)}
+    return *_apply_probe(filename, options, detected, report), _probe_head(clip, result, detected)
+
+
+def _with_span_timestamps(result: dict, info: WavInfo | None) -> dict:
+    """整体上传的 WAV 在后端没有返回时间戳时，以整段音频作为一个片段"""
+    if "error" not in result and "timestamps" not in result and info is not None and info.duration > 0:
+        result["timestamps"] = from_span(0.0, info.duration)
+    return result
+
+
+def _remaining_chunks(
+    filename: str, path: Path, info: WavInfo, head: tuple[dict, dict] | None
+) -> list[tuple[int, int]]:
+    """
+    已转录的开头片段之后的切分点
+
+    剩余音频不长于 ASR_CHUNK_MIN_DURATION 时作为一个片段；否则沿用整段音频在静音处的切分点，
+    跨过开头片段结束处的片段从该处开始。
+    """
+    start = 0 if head is None else round(head[0]["end"] * info.sample_rate)
+    if (info.n_frames - start) / info.sample_rate <= ASR_CHUNK_MIN_DURATION:
+        chunks = [(start, info.n_frames)] if info.n_frames > start else []
+    else:
+        chunks = [(max(a, start), b) for a, b in plan_chunks(path, info, ASR_CHUNK_SECONDS) if b > start]
+    if head is None:
+        print(f"[ASR] Split {filename} ({info.duration:.1f}s) into {len(chunks)} segments at silence")
+    else:
+        print(f"[ASR] Reusing the {head[0]['end']:.1f}s language probe of {filename}, "
+              f"transcribing the remaining {(info.n_frames - start) / info.sample_rate:.1f}s in {len(chunks)} segments")
+    return chunks
+
+
+def _write_segment(options: _TranscribeOptions, span: dict, result: dict) -> None:
+    """长音频的一个片段转录完成后立即写入输出文件（需要输出文件时）"""
+    if options.sink is not None:
+        options.sink.write(result.get("text", ""), merge([(span["start"], span["end"], 0, result.get("timestamps"))]))
+
+
+def _transcribe_prepared(
+    filename: str,
+    path: Path,
+    info: WavInfo | None,
+    options: _TranscribeOptions,
+    head: tuple[dict, dict] | None = None,
+    content_hash: str | None = None,
+) -> dict:
+    """
+    将预处理后的音频上传到 ASR 服务并格式化结果
+
+    时长超过 ASR_CHUNK_MIN_DURATION 的 WAV 先在静音处切分为片段，
+    并发转录后按顺序拼接，避免长音频受限于单个后端 worker 和请求超时；
+    返回结果的格式与整体上传时相同。
+
+    Args:
+        filename: 原始文件名（写入结果的 filename 字段）
+        path: 实际上传的文件路径
+        info: path 的 WavInfo，非 WAV 时为 None
+        options: 本次转录的参数
+        head: 已经转录的开头片段 (片段位置, 转录结果)（语言预检测的片段），
+            只上传它之后的音频，再与它拼接
+        content_hash: path 内容的 SHA-256（path 就是未经规范化的输入文件时），整体上传大文件时不再重新计算
+
+    Returns:
+        与 audio_to_text 相同格式的结果字典（成功结果或错误信息）
+    """
+    if head is None and (info is None or info.duration <= ASR_CHUNK_MIN_DURATION):
+        result = _transcribe_payload(filename, lambda: open(path, 'rb'), options, content_hash=content_hash)
+        return _with_span_timestamps(result, info)
+
+    chunks = _remaining_chunks(filename, path, info, head)
+    results = []
+    if head is not None:
+        results.append(head)
+        _write_segment(options, *head)
+    for segment, result in _transcribe_segments(
+        Path(filename), split_wav(path, info, chunks, len(results)), options, ASR_SEGMENT_WORKERS
+    ):
+        if "error" in result:
+            return result
+        results.append((_segment_span(segment), result))
+        _write_segment(options, *results[-1])
+
+    return _stitch_results(filename, options.lang, results)
+
+
+def _transcribe_segments(
+    audio_file: Path, segments: Iterable[AudioSegment], options: _TranscribeOptions, workers: int
+) -> Iterator[tuple[AudioSegment, dict]]:
+    """
+    并发转录音频片段，并按时间顺序逐个返回结果
+
+    最多同时有 workers 个片段在请求中；前面的片段一完成就立即返回，
+    不需要等待整个文件转录结束。
+
+    Yields:
+        (片段, 该片段的转录结果或错误信息)
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for segment in segments:
+                upload_name = f"{audio_file.stem}_{segment.index:04d}.wav"
+                future = executor.submit(
+                    _transcribe_payload, upload_name, lambda s=segment: io.BytesIO(s.data), options
+                )
+                pending.append((segment, future))
+                if len(pending) >= workers:
+                    segment, future = pending.popleft()
+                    yield segment, future.result()
+
+            while pending:
+                segment, future = pending.popleft()
+                yield segment, future.result()
+        finally:
+            # 调用方提前停止迭代时，取消尚未开始的请求
+            for _, future in pending:
+                future.cancel()
+
+
+@asynccontextmanager
+async def _prepared_audio_async(audio_file: Path, options: _TranscribeOptions):
+    """_prepared_audio 的异步版本，重采样和临时文件清理在线程中执行"""
+    prepared = _prepared_audio(audio_file, options)
+    entered = await asyncio.to_thread(prepared.__enter__)
+    try:
+        yield entered
+    finally:
+        await asyncio.to_thread(prepared.__exit__, None, None, None)
+
+
+async def _transcribe_audio_async(audio_file: Path, options: _TranscribeOptions) -> dict:
+    """_transcribe_audio 的异步版本"""
+    try:
+        async with _prepared_audio_async(audio_file, options) as (path, info, report):
+            probe = None
+            result = await asyncio.to_thread(_detect_nospeech, audio_file.name, path, info, options)
+            if result is None:
+                options, probe, head = await _probe_language_async(audio_file.name, path, info, options)
+                content_hash = options.content_hash if path == audio_file else None
+                result = await _transcribe_prepared_async(audio_file.name, path, info, options, head, content_hash)
+    except (OSError, ValueError) as e:
+        return _error_result(f"打开或处理音频文件失败: {str(e)}", "FILE_ERROR")
+
+    if report is not None and "error" not in result:
+        _with_metadata(result, normalization=report)
+    if probe is not None and "error" not in result:
+        _with_metadata(result, language_probe=probe)
+    return result
+
+
+async def _transcribe_prepared_async(
+    filename: str,
+    path: Path,
+    info: WavInfo | None,
+    options: _TranscribeOptions,
+    head: tuple[dict, dict] | None = None,
+    content_hash: str | None = None,
+) -> dict:
+    """
+    _transcribe_prepared 的异步版本
+
+    长 WAV 的片段以协程并发上传，同时在请求中的片段不超过 ASR_SEGMENT_WORKERS 个；
+    下一个片段在有空位后才从磁盘读出，内存占用与同步版本相同。
+    """
+    if head is None and (info is None or info.duration <= ASR_CHUNK_MIN_DURATION):
+        result = await _transcribe_payload_async(
+            filename, lambda: open(path, 'rb'), options, content_hash=content_hash
+        )
+        return _with_span_timestamps(result, info)
+
+    chunks = await asyncio.to_thread(_remaining_chunks, filename, path, info, head)
+
+    slots = asyncio.Semaphore(ASR_SEGMENT_WORKERS)
+    stem = Path(filename).stem
+
+    async def transcribe(segment: AudioSegment) -> dict:
+        try:
+            return await _transcribe_payload_async(
+                f"{stem}_{segment.index:04d}.wav", lambda: io.BytesIO(segment.data), options
+            )
+        finally:
+            slots.release()
 
+    tasks = []
+    spans = []
+    segments = split_wav(path, info, chunks, 0 if head is None else 1)
+    try:
+        while True:
+            await slots.acquire()
+            segment = await asyncio.to_thread(next, segments, None)
+            if segment is None:
+                slots.release()
+                break
+            spans.append(_segment_span(segment))
+            tasks.append(asyncio.create_task(transcribe(segment)))
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        segments.close()
+
+    for result in results:
+        if "error" in result:
+            return result
+    return _stitch_results(filename, options.lang, ([head] if head is not None else []) + list(zip(spans, results)))
+
+
+def _join_texts_with_offsets(parts: Iterable[str]) -> tuple[str, list[int]]:
+    """
+    拼接各片段文本：中日韩文字直接相连，英文单词之间补一个空格
+
+    Returns:
+        (拼接后的文本, 各片段在其中的起始下标)
+    """
+    joined = ""
+    offsets = []
+    for part in parts:
+        if part and joined and joined[-1].isascii() and joined[-1].isalnum() and part[0].isascii() \
+                and part[0].isalnum():
+            joined += " "
+        offsets.append(len(joined))
+        joined += part or ""
+    return joined, offsets
+
+
+def _join_texts(parts: Iterable[str]) -> str:
+    """拼接各片段文本，见 _join_texts_with_offsets"""
+    return _join_texts_with_offsets(parts)[0]
+
+
+def _merge_upload_reports(reports: list[dict]) -> dict:
+    """汇总各片段的上传报告：字节数和编码耗时求和，编码取各片段实际使用的编码"""
+    codecs = sorted({report["codec"] for report in reports})
+    return {
+        "codec": codecs[0] if len(codecs) == 1 else "mixed",
+        "original_bytes": sum(report["original_bytes"] for report in reports),
+        "wire_bytes": sum(report["wire_bytes"] for report in reports),
+        "encode_ms": round(sum(report.get("encode_ms", 0.0) for report in reports), 1),
+        "segments": len(reports),
+    }
+
+
+def _merge_backend_reports(reports: list[dict]) -> dict:
+    """汇总各片段的后端报告：请求数和重试次数求和，后端取各片段实际使用的后端"""
+    endpoints = sorted({report["endpoint"] for report in reports})
+    return {
+        "endpoint": endpoints[0] if len(endpoints) == 1 else "mixed",
+        "attempts": sum(report["attempts"] for report in reports),
+        "retries": sum(report["retries"] for report in reports),
+        "segments": len(reports),
+    }
+
+
+def _merge_concurrency_reports(reports: list[dict]) -> dict:
+    """汇总各片段的并发限制报告：上限取最后一个片段结束时的值，调整记录按序号去重合并"""
+    changes = {change["seq"]: change for report in reports for change in report["changes"]}
+    return {**reports[-1], "changes": [changes[seq] for seq in sorted(changes)]}
+
+
+def _segment_span(segment: AudioSegment) -> dict:
+    """片段在原音频中的位置（不含音频数据，拼接前保留它不会占用内存）"""
+    return {"index": segment.index, "start": segment.start, "end": segment.end}
+
+
+def _stitch_results(filename: str, lang: str, segments: list[tuple[dict, dict]]) -> dict:
+    """
+    按时间顺序拼接各片段的转录结果，格式与整体转录的结果相同
+
+    各片段的起止时间和文本记录在 metadata.segments 中；各片段的时间戳
+    平移到整段音频的时间轴和拼接后的文本下标后合并为 timestamps。
+
+    Args:
+        segments: 按时间顺序排列的 (_segment_span 返回的片段位置, 片段的转录结果)
+    """
+    results = [result for _, result in segments]
+    text, offsets = _join_texts_with_offsets(result.get("text", "") for result in results)
+    stitched = {
+        "text": text,
+        "filename": filename,
+        "language": lang,
+        "raw_text": "".join(result.get("raw_text", "") for result in results),
+        "clean_text": _join_texts(result.get("clean_text", "") for result in results)
+    }
+    tags = parse_tags(stitched["raw_text"])
+    if tags:
+        stitched["tags"] = tags
+    timestamps = merge(
+        (span["start"], span["end"], offset, result.get("timestamps"))
+        for (span, result), offset in zip(segments, offsets)
+    )
+    if timestamps is not None:
+        stitched["timestamps"] = timestamps
+    uploads = [result["metadata"]["upload"] for result in results if "upload" in result.get("metadata", {})]
+    if uploads:
+        _with_metadata(stitched, upload=_merge_upload_reports(uploads))
+    backends = [result["metadata"]["backend"] for result in results if "backend" in result.get("metadata", {})]
+    if backends:
+        _with_metadata(stitched, backend=_merge_backend_reports(backends))
+    limits = [result["metadata"]["concurrency"] for result in results if "concurrency" in result.get("metadata", {})]
+    if limits:
+        _with_metadata(stitched, concurrency=_merge_concurrency_reports(limits))
+    return _with_metadata(stitched, segments=[
+        {**span, "text": result.get("text", "")} for span, result in segments
+    ])
+
+
+def _stream_error(error: dict) -> dict:
+    """将错误字典转换为 SSE error 事件"""
+    return {"type": "error", "data": error["error"]["message"], "error_code": error["error"]["code"]}
+
+
+def _stream_file(
+    audio_file: Path,
+    path: Path,
+    info: WavInfo | None,
+    options: _TranscribeOptions,
+    normalization: dict | None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    audio_to_text_stream 的片段转录阶段
+
+    Args:
+        audio_file: 原始音频文件路径
+        path: 预处理后实际上传的文件路径
+        info: path 的 WavInfo，非 WAV 时为 None
+        options: 本次转录的参数
+        normalization: 规范化报告，未开启时为 None
 
-def audio_to_text(lang: str = "auto") -> dict:
+    Yields:
+        start / content / progress / done / error 事件
+    """
+    lang = options.lang
+    nospeech = _detect_nospeech(audio_file.name, path, info, options)
+
+    # 规划片段：WAV 在静音处切片，其他格式整体上传；没有语音的 WAV 不上传
+    if info is None:
+        duration = None
+        total = 1
+        whole = AudioSegment(index=0, start=0.0, end=0.0, data=b"")
+        results = ((segment, _transcribe_file(audio_file, options)) for segment in [whole])
+    elif nospeech is not None:
+        duration = info.duration
+        total = 0
+        results = iter(())
+    else:
+        duration = info.duration
+        chunks = plan_chunks(path, info, ASR_STREAM_SEGMENT_SECONDS)
+        total = max(1, len(chunks))
+        segments = split_wav(path, info, chunks)
+        results = _transcribe_segments(audio_file, segments, options, ASR_SEGMENT_WORKERS)
+
+    yield {
+        "type": "start",
+        "data": {
+            "filename": audio_file.name,
+            "language": lang,
+            "total_segments": total,
+            "duration": duration,
+        }
+    }
+
+    # 按顺序输出每个片段的结果
+    segment_results = []
+    for current, (segment, result) in enumerate(results, 1):
+        if "error" in result:
+            yield _stream_error(result)
+            return
+        segment_results.append((_segment_span(segment), result))
+
+        if result.get("text"):
+            yield {"type": "content", "data": result["text"]}
+
+        yield {
+            "type": "progress",
+            "data": {
+                "current": current,
+                "total": total,
+                "percentage": int(current / total * 100),
+                "segment": {
+                    "index": segment.index,
+                    "start": segment.start,
+                    "end": segment.end,
+                    "text": result.get("text", ""),
+                }
+            }
+        }
+
+    # 完成事件携带完整结果
+    done = nospeech if nospeech is not None else _stitch_results(audio_file.name, lang, segment_results)
+    done = {**done, "segments": len(segment_results)}
+    if normalization is not None:
+        _with_metadata(done, normalization=normalization)
+    yield {"type": "done", "data": done}
+
+
+@_observed
+def audio_to_text(
+    lang: str = "auto", normalize_audio: bool = False, compress_upload: bool = False, output_formats: str = ""
+) -> dict:
     """
     将音频文件转换为文字（ASR - 自动语音识别）
 
@@ -64,6 +1951,13 @@ def audio_to_text(lang: str = "auto") -> dict:
 
     Args:
         lang: 音频内容的语言，默认为 "auto" 自动检测
+        normalize_audio: 上传前将 WAV 下混、重采样为 16kHz 单声道 16 位 PCM，
+            对 44.1k/48k 立体声录音可减少约 5-6 倍的上传量，默认为 False
+        compress_upload: 上传前将 WAV 无损压缩为 FLAC（语音通常可减少 30-50%），
+            ASR 服务不支持时自动改用原始 WAV，默认为 False
+        output_formats: 逗号分隔的输出文件格式（srt / vtt / jsonl），默认为空（结果直接返回）。
+            指定时按片段把转录结果写入 data/outputs/<文件名>.<格式>，长音频的片段
+            转录完成后立即写入，返回值只包含输出文件列表和摘要
 
     Returns:
         包含转录结果的字典，格式：
@@ -73,7 +1967,29 @@ def audio_to_text(lang: str = "auto") -> dict:
             "filename": "audio.wav",
             "language": "zh",
             "raw_text": "原始文本（包含标记）",
-            "clean_text": "清理后的文本"
+            "clean_text": "清理后的文本",
+            "tags": [{"language": "zh", "emotion": "NEUTRAL", "event": "Speech", "text": "..."}, ...],
+            "timestamps": {
+                "unit": "ms", "source": "backend",
+                "segments": {"start": [0, 29600], "end": [29600, 58100], "text_offset": [0, 57]},
+                "words": {"start": [120, ...], "end": [380, ...], "text_offset": [0, ...], "length": [1, ...]}
+            },
+            "metadata": {
+                "cache": {"hit": False, "hits": 0, "misses": 1},
+                "normalization": {"applied": True, "original_bytes": ..., "bytes_saved": ...},
+                "upload": {"codec": "flac", "original_bytes": ..., "wire_bytes": ..., "encode_ms": ...},
+                "backend": {"endpoint": "http://host:50000/api/v1/asr", "attempts": 1, "retries": 0},
+                "segments": [{"index": 0, "start": 0.0, "end": 29.6, "text": "..."}, ...],
+                "coalesced": {"shared_with": "thread"},
+                "metrics": {
+                    "total_ms": 812.3,
+                    "stages_ms": {"scan": 0.2, "hash": 1.1, "cache": 0.3, "prepare": 0.1,
+                                  "upload": 35.0, "inference": 770.4, "parse": 0.2},
+                    "spans": [{"stage": "scan", "start_ms": 0.0, "duration_ms": 0.2}, ...],
+                    "bytes_sent": 512345, "response_bytes": 180,
+                    "audio_seconds": 16.0, "real_time_factor": 19.7
+                }
+            }
         }
 
         失败时：
@@ -92,145 +2008,248 @@ def audio_to_text(lang: str = "auto") -> dict:
         >>> # 指定中文
         >>> audio_to_text(lang="zh")
         {"text": "...", "filename": "test.wav", "language": "zh"}
+
+        >>> # 写入字幕文件，只返回摘要
+        >>> audio_to_text(output_formats="srt,jsonl")
+        {"filename": "test.wav", "language": "auto", "segments": 12, "characters": 830,
+         "outputs": [{"format": "srt", "path": "data/outputs/test.srt", "bytes": 1534}, ...], "metadata": {...}}
     """
     try:
-        # 1. 验证语言参数
-        valid_languages = ["auto", "zh", "en", "yue", "ja", "ko", "nospeech"]
-        if lang not in valid_languages:
-            return {
-                "error": {
-                    "message": f"不支持的语言: {lang}。支持的语言: {', '.join(valid_languages)}",
-                    "code": "INVALID_LANGUAGE"
-                }
-            }
+        # 1. 验证参数
+        lang_error = _validate_language(lang)
+        if lang_error:
+            return lang_error
+
+        formats = _parse_output_formats(output_formats)
+        if isinstance(formats, dict):
+            return formats
 
         # 2. 扫描输入目录，获取第一个音频文件
-        if not DATA_INPUTS.exists():
-            return {
-                "error": {
-                    "message": "输入目录不存在",
-                    "code": "NO_INPUT_DIR"
-                }
-            }
+        metrics = CallMetrics()
+        with metrics.span("scan"):
+            audio_files = _find_audio_files(first_only=True)
+        if isinstance(audio_files, dict):
+            return audio_files
 
-        # 支持的音频文件扩展名
-        audio_extensions = {".wav", ".mp3", ".WAV", ".MP3"}
-        audio_files = [
-            f for f in DATA_INPUTS.iterdir()
-            if f.is_file() and f.suffix in audio_extensions
-        ]
-
-        if not audio_files:
-            return {
-                "error": {
-                    "message": "未找到音频文件（支持 .wav 和 .mp3 格式）",
-                    "code": "NO_AUDIO_FILES"
-                }
-            }
+        # 3. 只处理第一个文件；需要输出文件时，长音频的片段转录完成后立即写入
+        sink = TranscriptWriter(DATA_OUTPUTS, audio_files[0].stem, formats) if formats else None
+        options = _TranscribeOptions(
+            lang=lang, normalize_audio=bool(normalize_audio), compress_upload=bool(compress_upload),
+            metrics=metrics, sink=sink,
+        )
+        try:
+            result = _transcribe_file(audio_files[0], options)
+        except BaseException:
+            if sink is not None:
+                sink.abort()
+            raise
+        if sink is not None:
+            result = _write_outputs(result, sink)
+        _log_pool_stats()
+        return _report_metrics(result, audio_files[0], lang, metrics)
 
-        # 只处理第一个文件
-        audio_file = audio_files[0]
-        print(f"[ASR] Processing file: {audio_file.name}")
+    except Exception as e:
+        return _error_result(str(e), "UNEXPECTED_ERROR")
 
-        # 3. 准备文件上传
-        file_handle = None
-        try:
-            file_handle = open(audio_file, 'rb')
-            files = [('files', (audio_file.name, file_handle, 'audio/wav'))]
-
-            # 4. 准备表单数据
-            data = {"lang": lang}
-
-            # 5. 调用 ASR API
-            response = requests.post(
-                ASR_API_URL,
-                files=files,
-                data=data,
-                timeout=300  # 5分钟超时（处理较长音频）
-            )
 
-            # 检查响应状态
-            if response.status_code != 200:
-                return {
-                    "error": {
-                        "message": f"ASR 服务返回错误: HTTP {response.status_code} - {response.text}",
-                        "code": "ASR_API_ERROR"
-                    }
-                }
+@_observed
+def audio_to_text_batch(
+    lang: str = "auto", max_workers: int = 4, normalize_audio: bool = False, compress_upload: bool = False
+) -> dict:
+    """
+    批量将音频文件转换为文字
 
-            # 解析响应
-            result_data = response.json()
-
-            # 6. 格式化返回结果
-            # ASR 服务返回格式: {"result": [{"key": "filename", "text": "...", ...}]}
-            if isinstance(result_data, dict) and "result" in result_data:
-                results = result_data["result"]
-                if results and len(results) > 0:
-                    first_result = results[0]
-                    return {
-                        "text": first_result.get("clean_text") or first_result.get("text", ""),
-                        "filename": audio_file.name,
-                        "language": lang,
-                        "raw_text": first_result.get("raw_text", ""),
-                        "clean_text": first_result.get("clean_text", "")
-                    }
-
-            # 如果格式不符合预期，返回原始数据
-            return {
-                "text": str(result_data),
-                "filename": audio_file.name,
-                "language": lang
-            }
+    扫描 data/inputs/input/ 目录中的所有音频文件，通过有界线程池并发
+    调用 ASR 服务，在一次调用中完成全部转录。单个文件失败不会影响其他
+    文件，错误信息按文件记录在结果中。
 
-        except requests.exceptions.Timeout:
-            return {
-                "error": {
-                    "message": "ASR 服务请求超时（5分钟）",
-                    "code": "TIMEOUT"
-                }
-            }
+    Args:
+        lang: 音频内容的语言，默认为 "auto" 自动检测（对所有文件生效）
+        max_workers: 并发请求数，范围 1-16，默认为 4
+        normalize_audio: 上传前将 WAV 规范化为 16kHz 单声道，与 audio_to_text 相同
+        compress_upload: 上传前将 WAV 无损压缩为 FLAC，与 audio_to_text 相同
 
-        except requests.exceptions.ConnectionError:
-            return {
-                "error": {
-                    "message": f"无法连接到 ASR 服务: {ASR_API_URL}",
-                    "code": "CONNECTION_ERROR"
+    Returns:
+        包含批量转录结果的字典，格式：
+        成功时：
+        {
+            "results": {
+                "a.wav": {"text": "...", "filename": "a.wav", "language": "zh", ...},
+                "b.mp3": {"error": {"message": "...", "code": "TIMEOUT"}}
+            },
+            "total_files": 2,
+            "succeeded": 1,
+            "failed": 1,
+            "language": "zh",
+            "endpoints": {
+                "http://host:50000/api/v1/asr": {
+                    "state": "closed", "outstanding": 0, "requests": 2,
+                    "failures": 0, "ewma_latency_ms": 812.5
                 }
             }
+        }
 
-        except requests.exceptions.RequestException as e:
-            return {
-                "error": {
-                    "message": f"请求 ASR 服务时发生错误: {str(e)}",
-                    "code": "REQUEST_ERROR"
-                }
+        失败时（参数或输入目录错误）：
+        {
+            "error": {
+                "message": "错误信息",
+                "code": "ERROR_CODE"
             }
+        }
 
-        except ValueError as e:
-            return {
-                "error": {
-                    "message": f"解析 ASR 响应失败: {str(e)}",
-                    "code": "PARSE_ERROR"
-                }
-            }
+    Examples:
+        >>> audio_to_text_batch(lang="zh", max_workers=8)
+        {"results": {...}, "total_files": 200, "succeeded": 200, "failed": 0, "language": "zh"}
+    """
+    try:
+        # 1. 验证参数
+        lang_error = _validate_language(lang)
+        if lang_error:
+            return lang_error
 
-        except Exception as e:
-            return {
-                "error": {
-                    "message": f"打开或处理音频文件失败: {str(e)}",
-                    "code": "FILE_ERROR"
-                }
-            }
+        if not isinstance(max_workers, int) or max_workers < 1:
+            return _error_result(
+                f"max_workers 必须是 1-{BATCH_MAX_WORKERS} 之间的整数: {max_workers}",
+                "INVALID_PARAMETER"
+            )
+        workers = min(max_workers, BATCH_MAX_WORKERS)
 
-        finally:
-            # 确保关闭文件
-            if file_handle:
-                file_handle.close()
+        # 2. 扫描输入目录，获取所有音频文件（按文件名排序，保证结果顺序稳定）
+        audio_files = _find_audio_files()
+        if isinstance(audio_files, dict):
+            return audio_files
+        audio_files = sorted(audio_files, key=lambda f: f.name)
+
+        print(f"[ASR] Batch processing {len(audio_files)} files with {workers} workers")
+
+        # 3. 并发转录，executor.map 保持输入顺序
+        options = _TranscribeOptions(
+            lang=lang, normalize_audio=bool(normalize_audio), compress_upload=bool(compress_upload)
+        )
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = executor.map(lambda f: _transcribe_file(f, options), audio_files)
+            results = {f.name: outcome for f, outcome in zip(audio_files, outcomes)}
+
+        failed = sum(1 for outcome in results.values() if "error" in outcome)
+        _log_pool_stats()
 
-    except Exception as e:
         return {
-            "error": {
-                "message": str(e),
-                "code": "UNEXPECTED_ERROR"
-            }
+            "results": results,
+            "total_files": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed,
+            "language": lang,
+            "endpoints": _BALANCER.stats()
         }
+
+    except Exception as e:
+        return _error_result(str(e), "UNEXPECTED_ERROR")
+
+
+@_observed
+def audio_to_text_stream(
+    lang: str = "auto", normalize_audio: bool = False, compress_upload: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    流式将音频文件转换为文字（SSE 事件流）
+
+    WAV 文件在静音处切分为不超过 ASR_STREAM_SEGMENT_SECONDS（默认 30 秒）
+    的片段，多个片段并发转录，每个片段完成后立即按时间顺序返回，
+    Gateway 无需等待整个文件转录结束就能展示前面的文字。
+    其他格式（如 MP3）无法在本地切分，作为一个整体转录。
+
+    Args:
+        lang: 音频内容的语言，默认为 "auto" 自动检测
+        normalize_audio: 上传前将 WAV 规范化为 16kHz 单声道，与 audio_to_text 相同
+        compress_upload: 上传前将 WAV 无损压缩为 FLAC，与 audio_to_text 相同
+
+    Yields:
+        dict: SSE 事件数据
+        - start: {"filename", "language", "total_segments", "duration"}
+        - content: 片段转录文本
+        - progress: {"current", "total", "percentage", "segment": {"index", "start", "end", "text"}}
+        - done: 与 audio_to_text 成功结果相同的字段，外加 "segments"（片段数）
+        - error: 错误描述，error_code 为与 audio_to_text 相同的错误代码
+
+    Examples:
+        >>> for event in audio_to_text_stream(lang="zh"):
+        ...     print(event["type"], event["data"])
+        start {"filename": "call.wav", "language": "zh", "total_segments": 4, "duration": 95.2}
+        content 您好，这里是客服中心
+        progress {"current": 1, "total": 4, "percentage": 25, ...}
+        ...
+        done {"text": "...", "filename": "call.wav", "language": "zh", ..., "segments": 4}
+    """
+    try:
+        # 1. 验证语言参数
+        lang_error = _validate_language(lang)
+        if lang_error:
+            yield _stream_error(lang_error)
+            return
+
+        # 2. 扫描输入目录，获取第一个音频文件
+        audio_files = _find_audio_files(first_only=True)
+        if isinstance(audio_files, dict):
+            yield _stream_error(audio_files)
+            return
+        audio_file = audio_files[0]
+        print(f"[ASR] Streaming file: {audio_file.name}")
+
+        # 3. 预处理后按片段转录并输出事件
+        options = _TranscribeOptions(
+            lang=lang, normalize_audio=bool(normalize_audio), compress_upload=bool(compress_upload)
+        )
+        with _prepared_audio(audio_file, options) as (path, info, normalization):
+            yield from _stream_file(audio_file, path, info, options, normalization)
+
+    except (OSError, ValueError) as e:
+        yield _stream_error(_error_result(f"打开或处理音频文件失败: {str(e)}", "FILE_ERROR"))
+    except Exception as e:
+        yield {"type": "error", "data": str(e), "error_code": "UNEXPECTED_ERROR"}
+
+
+@_observed
+async def audio_to_text_async(
+    lang: str = "auto", normalize_audio: bool = False, compress_upload: bool = False, output_formats: str = ""
+) -> dict:
+    """
+    audio_to_text 的 asyncio 版本
+
+    参数、返回值和错误代码与 audio_to_text 完全相同。上传使用基于 asyncio
+    的 keep-alive 连接池，文件读取、哈希计算和重采样放到线程中执行，
+    不会阻塞事件循环；一个进程可以同时有数百个转录请求在途，
+    同时使用的连接数由 ASR_ASYNC_MAX_CONNECTIONS 限制。
+
+    指定 output_formats 时，输出文件在整个文件转录完成后（在线程中）一次写入。
+
+    Examples:
+        >>> result = await audio_to_text_async(lang="zh")
+        {"text": "...", "filename": "test.wav", "language": "zh", ...}
+    """
+    try:
+        lang_error = _validate_language(lang)
+        if lang_error:
+            return lang_error
+
+        formats = _parse_output_formats(output_formats)
+        if isinstance(formats, dict):
+            return formats
+
+        metrics = CallMetrics()
+        with metrics.span("scan"):
+            audio_files = await asyncio.to_thread(_find_audio_files, True)
+        if isinstance(audio_files, dict):
+            return audio_files
+
+        options = _TranscribeOptions(
+            lang=lang, normalize_audio=bool(normalize_audio), compress_upload=bool(compress_upload), metrics=metrics
+        )
+        result = await _transcribe_file_async(audio_files[0], options)
+        if formats:
+            sink = TranscriptWriter(DATA_OUTPUTS, audio_files[0].stem, formats)
+            result = await asyncio.to_thread(_write_outputs, result, sink)
+        _log_pool_stats(_ASYNC_HTTP_POOL)
+        return _report_metrics(result, audio_files[0], lang, metrics)
+
+    except Exception as e:
+        return _error_result(str(e), "UNEXPECTED_ERROR")
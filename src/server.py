@@ -0,0 +1,362 @@
+"""
+常驻服务模式
+
+以长期运行的进程提供预制件函数。网关复用已经预热的工作进程，而不是每次调用都
+启动新的解释器：已导入的模块、HTTP 连接池、负载均衡状态和缓存都在调用之间保留。
+
+    python -m src.server --port 8765 --workers 4
+    python -m src.server --unix /run/asr-prefab.sock
+
+接口（HTTP/1.1，JSON）：
+- POST /invoke  {"function": "audio_to_text", "parameters": {"lang": "zh"}, "workdir": "/path/to/job"}
+  工作进程切换到 workdir（默认为服务的启动目录），按 manifest 的约定从其中的
+  data/inputs/ 读取文件，返回函数的结果。流式函数以 SSE（text/event-stream）
+  逐个返回事件
+- GET /healthz  返回状态、工作进程数和正在处理的请求数；排空时返回 503
+
+收到 SIGTERM/SIGINT 后优雅排空：不再接受新请求（返回 503），等待正在处理的
+请求完成（最多 ASR_SERVER_DRAIN_SECONDS 秒）后退出。
+"""
+
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any
+
+from . import main
+from .main import _error_result
+
+# 工作进程数和排空等待时间（秒）
+ASR_SERVER_WORKERS = int(os.environ.get("ASR_SERVER_WORKERS", "4"))
+ASR_SERVER_DRAIN_SECONDS = float(os.environ.get("ASR_SERVER_DRAIN_SECONDS", "30"))
+
+# 可调用的函数，与 prefab-manifest.json 中声明的函数一致；值为是否是流式函数
+FUNCTIONS = {
+    "audio_to_text": False,
+    "audio_to_text_batch": False,
+    "audio_to_text_stream": True,
+}
+
+# 请求体上限：请求只包含函数名和参数，音频文件由网关放在 workdir 中
+_MAX_REQUEST_BYTES = 1024 * 1024
+# 流式调用等待下一个事件时检查工作进程状态的间隔（秒）
+_EVENT_POLL_INTERVAL = 0.1
+
+
+# ========== 工作进程 ==========
+
+def _init_worker() -> None:
+    """工作进程初始化：排空由主进程控制，终端的 Ctrl+C 不应中断正在处理的请求"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+@contextmanager
+def _workdir(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _invoke(function: str, parameters: dict, workdir: str, events: Any = None) -> Any:
+    """
+    在工作进程中执行一次调用
+
+    工作进程同一时间只处理一个请求，可以安全地切换工作目录。流式函数的事件
+    逐个放入 events 队列，结束时放入 None。
+    """
+    with _workdir(workdir):
+        result = getattr(main, function)(**parameters)
+        if events is None:
+            return result
+        try:
+            for event in result:
+                events.put(event)
+        finally:
+            events.put(None)
+
+
+# ========== HTTP 前端 ==========
+
+class _Handler(BaseHTTPRequestHandler):
+    """把 HTTP 请求转发给 PrefabServer"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/healthz":
+            self._send_json(404, _error_result(f"未知路径: {self.path}", "NOT_FOUND"))
+            return
+        health = self.server.prefab.health()
+        self._send_json(200 if health["status"] == "ok" else 503, health)
+
+    def do_POST(self):
+        if self.path != "/invoke":
+            self._send_json(404, _error_result(f"未知路径: {self.path}", "NOT_FOUND"))
+            return
+        prefab = self.server.prefab
+        if not prefab.begin():
+            self._send_json(503, _error_result("服务正在排空，不再接受新请求", "SERVER_DRAINING"), close=True)
+            return
+        try:
+            self._invoke(prefab)
+        finally:
+            prefab.end()
+
+    def _invoke(self, prefab: "PrefabServer") -> None:
+        request = self._read_request()
+        if "error" in request:
+            self._send_json(400, request, close=True)
+            return
+        function, parameters, workdir = request["function"], request["parameters"], request["workdir"]
+
+        if not FUNCTIONS[function]:
+            try:
+                result = prefab.submit(function, parameters, workdir).result()
+            except Exception as e:
+                print(f"[ASR] Server: {function} failed: {e}")
+                self._send_json(500, _error_result(f"调用 {function} 失败: {e}", "INTERNAL_ERROR"))
+                return
+            self._send_json(200, result)
+            return
+
+        events = prefab.event_queue()
+        future = prefab.submit(function, parameters, workdir, events)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event in _drain_events(events, future):
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+    def _read_request(self) -> dict:
+        """读取并校验请求体，返回 {"function", "parameters", "workdir"} 或错误字典"""
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > _MAX_REQUEST_BYTES:
+            return _error_result("请求体过大", "INVALID_REQUEST")
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return _error_result(f"请求体不是合法的 JSON: {e}", "INVALID_REQUEST")
+        if not isinstance(request, dict):
+            return _error_result("请求体必须是 JSON 对象", "INVALID_REQUEST")
+
+        function = request.get("function")
+        if function not in FUNCTIONS:
+            return _error_result(
+                f"未知函数: {function}，可用函数: {', '.join(FUNCTIONS)}", "UNKNOWN_FUNCTION"
+            )
+        parameters = request.get("parameters") or {}
+        if not isinstance(parameters, dict):
+            return _error_result("parameters 必须是 JSON 对象", "INVALID_PARAMETERS")
+        try:
+            inspect.signature(getattr(main, function)).bind(**parameters)
+        except TypeError as e:
+            return _error_result(f"参数错误: {e}", "INVALID_PARAMETERS")
+        workdir = request.get("workdir") or os.getcwd()
+        if not Path(workdir).is_dir():
+            return _error_result(f"工作目录不存在: {workdir}", "INVALID_WORKDIR")
+        return {"function": function, "parameters": parameters, "workdir": str(workdir)}
+
+    def _send_json(self, status: int, payload: Any, close: bool = False) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _drain_events(events: Any, future: Future):
+    """逐个返回流式调用的事件，直到结束标记；工作进程异常退出时以 error 事件结束"""
+    while True:
+        try:
+            event = events.get(timeout=_EVENT_POLL_INTERVAL)
+        except queue.Empty:
+            # 事件在工作进程返回前已同步写入队列：调用结束且队列为空说明不会再有事件
+            if future.done():
+                break
+            continue
+        if event is None:
+            break
+        yield event
+    if future.exception() is not None:
+        error = future.exception()
+        print(f"[ASR] Server: stream failed: {error}")
+        yield main._stream_error(_error_result(f"流式调用失败: {error}", "INTERNAL_ERROR"))
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+# ========== 服务 ==========
+
+class PrefabServer:
+    """
+    常驻的预制件服务：HTTP 前端线程接收请求，分派到预热的工作进程池执行
+
+    Args:
+        workers: 工作进程数（同时执行的调用数上限，超出的请求排队）
+        host, port: TCP 监听地址，port 为 0 时自动分配
+        unix_path: Unix 套接字路径；指定时不监听 TCP
+    """
+
+    def __init__(
+        self,
+        workers: int = ASR_SERVER_WORKERS,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        unix_path: str | None = None,
+    ):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self._context = multiprocessing.get_context("spawn")
+        self._executor = None
+        self._manager = None
+        self._httpd = None
+        self._inflight = 0
+        self._draining = False
+        self._idle = threading.Condition()
+
+    @property
+    def address(self) -> str:
+        """监听地址：http://host:port 或 Unix 套接字路径"""
+        if self.unix_path is not None:
+            return self.unix_path
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "PrefabServer":
+        """启动并预热全部工作进程，然后开始监听"""
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=self._context, initializer=_init_worker
+        )
+        # 预热：启动工作进程并导入预制件模块（提交 _ping 会在子进程中导入 src.server 和 src.main）
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+        if self.unix_path is not None:
+            Path(self.unix_path).unlink(missing_ok=True)
+            self._httpd = _UnixServer(self.unix_path, _Handler)
+        else:
+            self._httpd = _TCPServer((self.host, self.port), _Handler)
+        self._httpd.prefab = self
+        threading.Thread(target=self._httpd.serve_forever, name="asr-server", daemon=True).start()
+        print(f"[ASR] Server listening on {self.address} with {self.workers} workers")
+        return self
+
+    def submit(self, function: str, parameters: dict, workdir: str, events: Any = None) -> Future:
+        return self._executor.submit(_invoke, function, parameters, workdir, events)
+
+    def event_queue(self) -> Any:
+        """创建可在工作进程中写入的事件队列（Manager 在第一次流式调用时启动）"""
+        with self._idle:
+            if self._manager is None:
+                self._manager = self._context.Manager()
+            return self._manager.Queue()
+
+    def begin(self) -> bool:
+        """登记一个请求；排空期间返回 False"""
+        with self._idle:
+            if self._draining:
+                return False
+            self._inflight += 1
+            return True
+
+    def end(self) -> None:
+        with self._idle:
+            self._inflight -= 1
+            self._idle.notify_all()
+
+    def health(self) -> dict:
+        with self._idle:
+            return {
+                "status": "draining" if self._draining else "ok",
+                "workers": self.workers,
+                "inflight": self._inflight,
+            }
+
+    def drain(self, timeout: float = ASR_SERVER_DRAIN_SECONDS) -> bool:
+        """
+        优雅排空：拒绝新请求，等待正在处理的请求完成（最多 timeout 秒），然后停止服务
+
+        Returns:
+            超时前所有请求都已完成时为 True
+        """
+        with self._idle:
+            self._draining = True
+            print(f"[ASR] Server draining, {self._inflight} requests in flight")
+            drained = self._idle.wait_for(lambda: self._inflight == 0, timeout=timeout)
+        if not drained:
+            print(f"[ASR] Server drain timed out after {timeout:g}s")
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self.unix_path is not None:
+            Path(self.unix_path).unlink(missing_ok=True)
+        self._executor.shutdown(wait=drained, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+        print("[ASR] Server stopped")
+        return drained
+
+    def serve_forever(self, drain_timeout: float = ASR_SERVER_DRAIN_SECONDS) -> None:
+        """启动服务，阻塞到收到 SIGTERM/SIGINT 后排空退出（需在主线程调用）"""
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+        self.start()
+        stop.wait()
+        self.drain(drain_timeout)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="ASR 预制件常驻服务")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP 监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="TCP 监听端口")
+    parser.add_argument("--unix", help="监听 Unix 套接字（指定时不监听 TCP）")
+    parser.add_argument("--workers", type=int, default=ASR_SERVER_WORKERS, help="工作进程数")
+    parser.add_argument(
+        "--drain-seconds", type=float, default=ASR_SERVER_DRAIN_SECONDS, help="排空时等待正在处理的请求的最长秒数"
+    )
+    args = parser.parse_args()
+
+    PrefabServer(workers=args.workers, host=args.host, port=args.port, unix_path=args.unix).serve_forever(
+        args.drain_seconds
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,5 @@
+"""
+ASR 预制件内部工具模块
+
+这里的模块只供 src/main.py 使用，不会作为预制件函数暴露给 AI。
+"""
@@ -0,0 +1,266 @@
+"""
+异步 HTTP 连接池
+
+基于 asyncio 流实现的最小 HTTP/1.1 客户端，供 audio_to_text_async 使用：
+- 每个主机保持一组 keep-alive 连接，空闲超过阈值的连接在取用时关闭
+- 同时使用的连接数有上限，超出的请求在事件循环中排队而不是占用线程
+- 请求体按块从文件对象读取，磁盘读取放到线程中执行，不阻塞事件循环
+- 与同步连接池使用同样的复用统计
+
+只实现 ASR 请求需要的功能：POST、Content-Length 请求体、
+Content-Length / chunked / 读到连接关闭三种响应体。
+"""
+
+import asyncio
+import json
+import socket
+import ssl
+import time
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+from .http_pool import PoolStats
+
+
+# 每次从请求体读取并写入连接的字节数
+_SEND_BLOCK_SIZE = 256 * 1024
+
+# 响应头的最大行数，防止异常响应耗尽内存
+_MAX_HEADER_LINES = 100
+
+
+class HTTPTimeout(Exception):
+    """请求在超时时间内没有完成"""
+
+
+class HTTPConnectionError(Exception):
+    """无法建立连接，或连接在收到完整响应前被关闭"""
+
+
+class AsyncResponse:
+    """
+    HTTP 响应，提供与 requests.Response 相同的常用属性
+
+    Attributes:
+        status_code: HTTP 状态码
+        headers: 响应头（键为小写）
+        content: 响应体字节
+    """
+
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        """解析 JSON 响应体，格式错误时抛出 ValueError"""
+        return json.loads(self.content)
+
+
+class _Connection:
+    """一条 keep-alive 连接"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # 所属事件循环已经关闭（例如上一次 asyncio.run 结束），直接断开 TCP 连接
+            sock = self.writer.get_extra_info("socket")
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class AsyncHTTPPool:
+    """
+    进程级共享的异步 keep-alive HTTP 连接池
+
+    连接在第一次请求时建立，绑定到创建它的事件循环。
+
+    Args:
+        max_connections: 同时使用的最大连接数（所有主机合计）
+        idle_timeout: 连接空闲超过该秒数后，下次取用时关闭并重新建连
+    """
+
+    def __init__(self, max_connections: int = 100, idle_timeout: float = 30.0):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._stats = PoolStats()
+        self._idle: dict[tuple, list[_Connection]] = {}
+        self._semaphore = None
+        self._loop = None
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        """在当前事件循环中创建信号量；换了事件循环（如多次 asyncio.run）时丢弃旧连接"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for connections in self._idle.values():
+                for conn in connections:
+                    conn.close()
+            self._idle = {}
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+        return self._semaphore
+
+    async def _acquire(self, origin: tuple) -> tuple[_Connection, bool]:
+        """取出一条空闲连接或新建连接，返回 (连接, 是否复用)"""
+        idle = self._idle.get(origin, [])
+        evicted = False
+        while idle:
+            conn = idle.pop()
+            if time.monotonic() - conn.last_used > self.idle_timeout:
+                conn.close()
+                evicted = True
+                continue
+            if conn.reader.at_eof():
+                # 对端已经关闭了连接
+                conn.close()
+                continue
+            self._stats.record(reused=True, evicted=evicted)
+            return conn, True
+
+        scheme, host, port = origin
+        context = ssl.create_default_context() if scheme == "https" else None
+        try:
+            reader, writer = await asyncio.open_connection(host, port, ssl=context)
+        except OSError as e:
+            raise HTTPConnectionError(f"无法连接到 {host}:{port}: {e}") from e
+        self._stats.record(reused=False, evicted=evicted)
+        return _Connection(reader, writer), False
+
+    def _release(self, origin: tuple, conn: _Connection) -> None:
+        conn.last_used = time.monotonic()
+        self._idle.setdefault(origin, []).append(conn)
+
+    async def post(
+        self, url: str, data: BinaryIO, headers: dict | None = None, timeout: float | None = None
+    ) -> AsyncResponse:
+        """
+        发送 POST 请求
+
+        Args:
+            url: 请求地址（http 或 https）
+            data: 支持 len()、read() 和 seek() 的请求体（如 MultipartStream）
+            headers: 额外的请求头
+            timeout: 整个请求（排队、连接、发送和接收）的超时时间（秒）
+
+        Raises:
+            HTTPTimeout: 超时
+            HTTPConnectionError: 连接失败或被提前关闭
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        origin = (scheme, parts.hostname, port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+
+        head = f"POST {target} HTTP/1.1\r\nHost: {host_header}\r\nContent-Length: {len(data)}\r\n"
+        for name, value in (headers or {}).items():
+            head += f"{name}: {value}\r\n"
+        head = (head + "Connection: keep-alive\r\n\r\n").encode("latin-1")
+
+        semaphore = self._bind_loop()
+        try:
+            async with asyncio.timeout(timeout):
+                async with semaphore:
+                    return await self._send(origin, head, data)
+        except TimeoutError as e:
+            raise HTTPTimeout(f"请求超时（{timeout} 秒）") from e
+
+    async def _send(self, origin: tuple, head: bytes, data: BinaryIO) -> AsyncResponse:
+        """在一条连接上发送请求；复用的连接已被对端关闭时换新连接重试一次"""
+        while True:
+            conn, reused = await self._acquire(origin)
+            try:
+                await asyncio.to_thread(data.seek, 0)
+                conn.writer.write(head)
+                while True:
+                    chunk = await asyncio.to_thread(data.read, _SEND_BLOCK_SIZE)
+                    if not chunk:
+                        break
+                    conn.writer.write(chunk)
+                    await conn.writer.drain()
+                await conn.writer.drain()
+                response, keep_alive = await self._read_response(conn.reader)
+            except (OSError, asyncio.IncompleteReadError, HTTPConnectionError) as e:
+                conn.close()
+                if reused:
+                    continue
+                if isinstance(e, HTTPConnectionError):
+                    raise
+                raise HTTPConnectionError(f"连接被关闭: {e}") from e
+            except BaseException:
+                conn.close()
+                raise
+
+            if keep_alive:
+                self._release(origin, conn)
+            else:
+                conn.close()
+            return response
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> tuple[AsyncResponse, bool]:
+        """读取一个完整响应，返回 (响应, 连接能否复用)"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise HTTPConnectionError("连接在收到响应前被关闭")
+        try:
+            version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+            status_code = int(status)
+        except ValueError as e:
+            raise HTTPConnectionError(f"无效的响应状态行: {status_line!r}") from e
+
+        headers = {}
+        for _ in range(_MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPConnectionError("响应头过长")
+
+        keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # 跳过 trailer
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        return AsyncResponse(status_code, headers, content), keep_alive
+
+    def stats(self) -> dict:
+        """返回连接复用统计（字段与同步连接池相同）"""
+        return {"pool_size": self.max_connections, **self._stats.snapshot()}
+
+    async def close(self) -> None:
+        """关闭所有空闲连接"""
+        for connections in self._idle.values():
+            for conn in connections:
+                conn.close()
+        self._idle = {}
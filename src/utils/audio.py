@@ -0,0 +1,473 @@
+"""
+音频处理工具
+
+提供上传前的客户端音频处理：
+- 解析 PCM WAV 文件头（支持 WAVE_FORMAT_EXTENSIBLE）
+- 基于能量的向量化 VAD，在静音处规划切分点
+- 基于能量和过零率的语音检测，识别整段静音或只有底噪的录音
+- 将 WAV 按切分点拆成独立的 WAV 片段，便于并发转录
+- 将 WAV 下混并重采样为 16kHz 单声道 16 位 PCM（向量化多相滤波）
+
+PCM 数据通过 numpy.memmap 按块读取，长录音不会整体载入内存；默认对每个 WAV 都执行的语音检测
+改用 seek/read 逐块读取，读过的数据不会像内存映射的页面那样留在 RSS 中。
+"""
+
+import io
+import math
+import struct
+import wave
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+
+import numpy as np
+
+
+# WAV 格式标识
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 计算帧能量时每次从磁盘读取的采样帧数
+_ENERGY_BLOCK_FRAMES = 1 << 20
+# 语音检测每次读取的采样帧数（16kHz 约 16 秒；有语音的录音通常读完第一块即可停止）
+_SPEECH_BLOCK_FRAMES = 1 << 18
+
+# 重采样时每块计算的输出采样数（控制中间矩阵的内存占用）
+_RESAMPLE_BLOCK_FRAMES = 1 << 16
+
+
+@dataclass
+class WavInfo:
+    """
+    PCM WAV 文件的基本参数
+
+    Attributes:
+        channels: 声道数
+        sample_width: 每个采样的字节数（1/2/4）
+        sample_rate: 采样率
+        n_frames: 采样帧总数
+        data_offset: data 块在文件中的字节偏移
+    """
+
+    channels: int
+    sample_width: int
+    sample_rate: int
+    n_frames: int
+    data_offset: int
+
+    @property
+    def duration(self) -> float:
+        """音频时长（秒）"""
+        return self.n_frames / self.sample_rate
+
+    @property
+    def block_align(self) -> int:
+        """每个采样帧的字节数"""
+        return self.channels * self.sample_width
+
+
+@dataclass
+class AudioSegment:
+    """
+    一个待转录的音频片段
+
+    Attributes:
+        index: 片段序号（从 0 开始）
+        start: 片段在原音频中的起始时间（秒）
+        end: 片段在原音频中的结束时间（秒）
+        data: 片段的完整 WAV 字节（含文件头）
+    """
+
+    index: int
+    start: float
+    end: float
+    data: bytes
+
+
+def read_wav_info(source: Path | BinaryIO) -> WavInfo | None:
+    """
+    解析 WAV 文件头
+
+    Args:
+        source: WAV 文件路径，或可 seek 的二进制文件对象（从开头解析）
+
+    Returns:
+        WavInfo；文件不是 8/16/32 位整数 PCM WAV 时返回 None
+    """
+    try:
+        with (nullcontext(source) if hasattr(source, "read") else open(source, "rb")) as f:
+            f.seek(0)
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+
+            fmt = None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                    if chunk_size % 2:
+                        f.seek(1, 1)
+                elif chunk_id == b"data":
+                    if fmt is None or len(fmt) < 16:
+                        return None
+                    data_offset = f.tell()
+                    break
+                else:
+                    f.seek(chunk_size + chunk_size % 2, 1)
+
+            file_size = f.seek(0, 2)
+    except OSError:
+        return None
+
+    format_tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag = struct.unpack("<H", fmt[24:26])[0]
+    sample_width = bits // 8
+    if format_tag != _WAVE_FORMAT_PCM or sample_width not in (1, 2, 4) or channels < 1 or sample_rate < 1:
+        return None
+    if block_align != channels * sample_width:
+        return None
+
+    # 流式写出的 WAV 可能把 data 块长度写成 0 或 0xFFFFFFFF，以实际文件长度为准
+    data_size = min(chunk_size, file_size - data_offset)
+    return WavInfo(
+        channels=channels,
+        sample_width=sample_width,
+        sample_rate=sample_rate,
+        n_frames=data_size // block_align,
+        data_offset=data_offset,
+    )
+
+
+def wav_duration(path: Path) -> float | None:
+    """
+    读取 WAV 文件时长
+
+    Returns:
+        时长（秒）；文件不是可解析的 PCM WAV 时返回 None
+    """
+    info = read_wav_info(path)
+    return info.duration if info else None
+
+
+def _pcm_view(path: Path, info: WavInfo) -> np.ndarray:
+    """以 (n_frames, channels) 形状内存映射 PCM 数据"""
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[info.sample_width]
+    return np.memmap(path, dtype=np.dtype(dtype).newbyteorder("<"), mode="r",
+                     offset=info.data_offset, shape=(info.n_frames, info.channels))
+
+
+def _iter_pcm_blocks(path: Path, info: WavInfo, block_frames: int) -> Iterator[np.ndarray]:
+    """以 seek/read 逐块读取 PCM 数据，每块为 (帧数, channels) 形状，任何时刻只有一块驻留在内存中"""
+    dtype = np.dtype({1: np.uint8, 2: np.int16, 4: np.int32}[info.sample_width]).newbyteorder("<")
+    with open(path, "rb") as f:
+        f.seek(info.data_offset)
+        for start in range(0, info.n_frames, block_frames):
+            frames = min(block_frames, info.n_frames - start)
+            data = f.read(frames * info.block_align)
+            frames = len(data) // info.block_align
+            if frames == 0:
+                return
+            yield np.frombuffer(data[:frames * info.block_align], dtype=dtype).reshape(frames, info.channels)
+
+
+def _to_float_mono(block: np.ndarray, sample_width: int) -> np.ndarray:
+    """将 PCM 整数块转换为 [-1, 1] 范围的单声道 float32"""
+    samples = block.astype(np.float32)
+    if sample_width == 1:
+        samples = (samples - 128.0) / 128.0
+    else:
+        samples /= float(1 << (sample_width * 8 - 1))
+    return samples.mean(axis=1)
+
+
+def frame_energy_db(path: Path, info: WavInfo, frame_seconds: float = 0.03) -> np.ndarray:
+    """
+    计算每个分析帧的 RMS 能量（dBFS）
+
+    Args:
+        path: WAV 文件路径
+        info: read_wav_info 的结果
+        frame_seconds: 分析帧长度（秒）
+
+    Returns:
+        长度为 ceil(n_frames / frame_size) 的 float32 数组
+    """
+    frame_size = max(1, int(info.sample_rate * frame_seconds))
+    pcm = _pcm_view(path, info)
+    block_frames = max(frame_size, _ENERGY_BLOCK_FRAMES // frame_size * frame_size)
+
+    energies = []
+    for start in range(0, info.n_frames, block_frames):
+        mono = _to_float_mono(pcm[start:start + block_frames], info.sample_width)
+        pad = (-len(mono)) % frame_size
+        if pad:
+            mono = np.pad(mono, (0, pad))
+        frames = mono.reshape(-1, frame_size)
+        energies.append(np.mean(frames * frames, axis=1))
+
+    if not energies:
+        return np.zeros(0, dtype=np.float32)
+    power = np.concatenate(energies)
+    return (10.0 * np.log10(power + 1e-10)).astype(np.float32)
+
+
+def iter_speech_frames(
+    path: Path, info: WavInfo, min_energy_db: float, max_zero_crossing_rate: float, frame_seconds: float = 0.03
+) -> Iterator[np.ndarray]:
+    """
+    按块标记含语音的分析帧
+
+    RMS 能量不低于 min_energy_db、且过零率（相邻采样符号变化的比例）不高于
+    max_zero_crossing_rate 的帧视为语音：静音的能量低，底噪、嘶声等宽带噪声的
+    过零率接近 0.5，而浊音的过零率明显更低。能量和过零率按块一次算出，
+    调用方找到足够的语音后可以停止迭代，不必读完整个文件。
+
+    Args:
+        path: WAV 文件路径
+        info: read_wav_info 的结果
+        min_energy_db: 语音帧的最低能量（dBFS）
+        max_zero_crossing_rate: 语音帧的最高过零率（0-1）
+        frame_seconds: 分析帧长度
+
+    Yields:
+        按时间顺序排列的布尔数组，拼接后长度为 ceil(n_frames / frame_size)
+    """
+    frame_size = max(1, int(info.sample_rate * frame_seconds))
+    block_frames = max(frame_size, _SPEECH_BLOCK_FRAMES // frame_size * frame_size)
+    min_power = 10.0 ** (min_energy_db / 10.0)
+
+    for block in _iter_pcm_blocks(path, info, block_frames):
+        mono = _to_float_mono(block, info.sample_width)
+        pad = (-len(mono)) % frame_size
+        if pad:
+            mono = np.pad(mono, (0, pad))
+        frames = mono.reshape(-1, frame_size)
+        # 末尾补零的帧按实际采样数计算，补的零不会压低能量和过零率
+        lengths = np.full(len(frames), frame_size)
+        lengths[-1] -= pad
+        power = np.sum(frames * frames, axis=1) / lengths
+        signs = np.signbit(frames)
+        crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / np.maximum(lengths - 1, 1)
+        yield (power >= min_power) & (crossings <= max_zero_crossing_rate)
+
+
+def plan_chunks(
+    path: Path,
+    info: WavInfo,
+    max_seconds: float,
+    min_seconds: float | None = None,
+    frame_seconds: float = 0.03,
+    silence_seconds: float = 0.3,
+) -> list[tuple[int, int]]:
+    """
+    在静音处规划切分点
+
+    对帧能量做 silence_seconds 长度的滑动平均，每个片段在
+    [min_seconds, max_seconds] 窗口内选择平滑能量最低的位置切分，
+    即窗口中最长、最安静的停顿处，避免把一个词切成两半。
+
+    Args:
+        path: WAV 文件路径
+        info: read_wav_info 的结果
+        max_seconds: 片段最大时长
+        min_seconds: 片段最小时长，默认为 max_seconds 的三分之一
+        frame_seconds: 能量分析帧长度
+        silence_seconds: 平滑窗口（期望的最短停顿）长度
+
+    Returns:
+        按时间顺序排列的 (起始采样帧, 结束采样帧) 列表，覆盖整个音频
+    """
+    if min_seconds is None:
+        min_seconds = max_seconds / 3
+    frame_size = max(1, int(info.sample_rate * frame_seconds))
+    max_frames = max(1, int(max_seconds / frame_seconds))
+    min_frames = max(1, min(max_frames, int(min_seconds / frame_seconds)))
+
+    energy = frame_energy_db(path, info, frame_seconds)
+    total = len(energy)
+    if total <= max_frames:
+        return [(0, info.n_frames)] if info.n_frames else []
+
+    # 滑动平均：smooth[i] 为以第 i 帧为中心的 silence_seconds 窗口平均能量
+    window = max(1, int(silence_seconds / frame_seconds))
+    cumsum = np.concatenate(([0.0], np.cumsum(energy, dtype=np.float64)))
+    lo = np.clip(np.arange(total) - window // 2, 0, total)
+    hi = np.clip(lo + window, 0, total)
+    smooth = (cumsum[hi] - cumsum[lo]) / np.maximum(hi - lo, 1)
+
+    cuts = []
+    start = 0
+    while total - start > max_frames:
+        candidates = smooth[start + min_frames:start + max_frames + 1]
+        cut = start + min_frames + int(np.argmin(candidates))
+        cuts.append(cut)
+        start = cut
+
+    boundaries = [0] + [min(c * frame_size, info.n_frames) for c in cuts] + [info.n_frames]
+    return [(a, b) for a, b in zip(boundaries, boundaries[1:]) if b > a]
+
+
+def _encode_wav(frames: bytes, channels: int, sample_width: int, sample_rate: int) -> bytes:
+    """将 PCM 帧封装为 WAV 字节"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(sample_width)
+        writer.setframerate(sample_rate)
+        writer.writeframes(frames)
+    return buffer.getvalue()
+
+
+def split_wav(path: Path, info: WavInfo, chunks: list[tuple[int, int]], first_index: int = 0):
+    """
+    按切分点拆分 WAV 文件
+
+    逐段读取，任何时刻只有一个片段驻留在内存中。
+
+    Args:
+        path: WAV 文件路径
+        info: read_wav_info 的结果
+        chunks: plan_chunks 返回的 (起始采样帧, 结束采样帧) 列表
+        first_index: 第一个片段的序号（前面的片段已经另行转录时）
+
+    Yields:
+        AudioSegment: 按时间顺序排列的片段
+    """
+    with open(path, "rb") as f:
+        for index, (start, end) in enumerate(chunks, first_index):
+            f.seek(info.data_offset + start * info.block_align)
+            frames = f.read((end - start) * info.block_align)
+            yield AudioSegment(
+                index=index,
+                start=start / info.sample_rate,
+                end=end / info.sample_rate,
+                data=_encode_wav(frames, info.channels, info.sample_width, info.sample_rate),
+            )
+
+
+def _lowpass_filter(up: int, down: int, half_zeros: int = 10, rolloff: float = 0.94,
+                    beta: float = 8.6) -> np.ndarray:
+    """
+    设计多相重采样使用的 Kaiser 窗 sinc 低通滤波器
+
+    截止频率为输入、输出采样率中较低者的 Nyquist 频率乘以 rolloff，
+    增益为 up 以补偿插零带来的能量损失。
+    """
+    factor = max(up, down)
+    n_taps = 2 * half_zeros * factor + 1
+    t = (np.arange(n_taps) - (n_taps - 1) / 2) / factor
+    h = rolloff * np.sinc(rolloff * t) * np.kaiser(n_taps, beta)
+    return h * (up / h.sum())
+
+
+def _resample_blocks(
+    read_window: Callable[[int, int], np.ndarray], n_in: int, up: int, down: int
+) -> Iterator[np.ndarray]:
+    """
+    多相滤波有理数倍重采样（等价于 插零 -> 低通 -> 抽取），按块产出输出
+
+    只计算需要保留的输出点：第 m 个输出使用相位 (m*down + D) % up 的子滤波器，
+    与以 (m*down + D) // up 结尾的 L 个输入点做内积，每块用 numpy 一次算完。
+
+    Args:
+        read_window: read_window(lo, hi) 返回输入信号 [lo, hi) 区间的 float32 数组，
+            调用方保证 0 <= lo < hi <= n_in
+        n_in: 输入信号长度
+        up: 插值倍数（已约分）
+        down: 抽取倍数（已约分）
+
+    Yields:
+        float32 输出块，总长度为 ceil(n_in * up / down)
+    """
+    h = _lowpass_filter(up, down)
+    delay = (len(h) - 1) // 2
+    taps_per_phase = -(-len(h) // up)
+    # phases[p, i] = h[p + i*up]，不足的位置补零
+    phases = np.zeros(up * taps_per_phase, dtype=np.float32)
+    phases[:len(h)] = h
+    phases = phases.reshape(taps_per_phase, up).T.copy()
+    offsets = np.arange(taps_per_phase)
+
+    n_out = -(-n_in * up // down)
+    for m0 in range(0, n_out, _RESAMPLE_BLOCK_FRAMES):
+        m = np.arange(m0, min(m0 + _RESAMPLE_BLOCK_FRAMES, n_out), dtype=np.int64)
+        t = m * down + delay
+        phase = t % up
+        base = t // up
+
+        # 取出本块需要的输入区间，越界部分视为 0
+        lo = int(base[0]) - taps_per_phase + 1
+        hi = int(base[-1]) + 1
+        window = np.zeros(hi - lo, dtype=np.float32)
+        src_lo, src_hi = max(lo, 0), min(hi, n_in)
+        if src_hi > src_lo:
+            window[src_lo - lo:src_hi - lo] = read_window(src_lo, src_hi)
+
+        gathered = window[(base - lo)[:, None] - offsets[None, :]]
+        yield np.einsum("ij,ij->i", gathered, phases[phase])
+
+
+def resample_poly(samples: np.ndarray, up: int, down: int) -> np.ndarray:
+    """
+    对内存中的一维信号做有理数倍重采样
+
+    Args:
+        samples: 一维输入信号
+        up: 插值倍数
+        down: 抽取倍数
+
+    Returns:
+        长度为 ceil(len(samples) * up / down) 的 float32 输出
+    """
+    gcd = math.gcd(up, down)
+    up, down = up // gcd, down // gcd
+    samples = np.asarray(samples, dtype=np.float32)
+    if up == down:
+        return samples.copy()
+    blocks = list(_resample_blocks(lambda lo, hi: samples[lo:hi], len(samples), up, down))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def normalize_wav(path: Path, info: WavInfo, out: BinaryIO, sample_rate: int = 16000) -> int:
+    """
+    将 PCM WAV 下混为单声道并重采样为 16 位 PCM，写入 out
+
+    输入通过 numpy.memmap 按需读取，输出按块写出，内存占用与音频长度无关。
+
+    Args:
+        path: 输入 WAV 文件路径
+        info: read_wav_info 的结果
+        out: 可写、可 seek 的二进制文件对象
+        sample_rate: 目标采样率
+
+    Returns:
+        写出的 WAV 字节数
+    """
+    gcd = math.gcd(info.sample_rate, sample_rate)
+    up, down = sample_rate // gcd, info.sample_rate // gcd
+    pcm = _pcm_view(path, info)
+
+    def read_window(lo: int, hi: int) -> np.ndarray:
+        return _to_float_mono(pcm[lo:hi], info.sample_width)
+
+    if up == down:
+        blocks = (read_window(i, min(i + _RESAMPLE_BLOCK_FRAMES, info.n_frames))
+                  for i in range(0, info.n_frames, _RESAMPLE_BLOCK_FRAMES))
+    else:
+        blocks = _resample_blocks(read_window, info.n_frames, up, down)
+
+    start = out.tell()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        for block in blocks:
+            pcm16 = np.clip(np.rint(block * 32767.0), -32768, 32767).astype("<i2")
+            writer.writeframes(pcm16.tobytes())
+    return out.tell() - start
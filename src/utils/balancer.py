@@ -0,0 +1,233 @@
+"""
+ASR 后端负载均衡
+
+在多个 ASR 服务地址之间分配请求：
+- 选择策略：最少在途请求（least_outstanding）或 EWMA 延迟加权（ewma）
+- 熔断：连续失败达到阈值的后端被摘除，冷却后放行一个探测请求，
+  成功则恢复，失败则继续摘除
+- 故障转移：连接失败、超时或 502/503/504 时换一个后端重发同一请求
+- 按后端统计请求数、失败数、在途数、EWMA 延迟和熔断状态
+
+同步和异步调用共用同一个均衡器，内部状态由锁保护。
+"""
+
+import threading
+import time
+from typing import Awaitable, Callable, Iterable
+
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STRATEGIES = ("least_outstanding", "ewma")
+
+# 表示后端不健康、值得换一个后端重试的 HTTP 状态码
+FAILOVER_STATUS = frozenset({502, 503, 504})
+
+
+class Endpoint:
+    """
+    一个 ASR 后端及其统计
+
+    Attributes:
+        url: 后端地址
+        outstanding: 在途请求数
+        ewma_latency: 成功请求延迟的指数加权平均（秒），没有样本时为 None
+        state: 熔断器状态
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.ewma_latency = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency_ms": None if self.ewma_latency is None else round(self.ewma_latency * 1000, 1),
+        }
+
+
+class EndpointBalancer:
+    """
+    带熔断和故障转移的后端选择器
+
+    Args:
+        urls: 后端地址列表
+        strategy: 选择策略，"least_outstanding" 或 "ewma"
+        failure_threshold: 连续失败多少次后摘除后端
+        reset_timeout: 摘除后多少秒放行探测请求
+        ewma_alpha: EWMA 延迟的平滑系数，越大越偏向最近的样本
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        ewma_alpha: float = 0.3,
+    ):
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        if not self.endpoints:
+            raise ValueError("至少需要一个 ASR 服务地址")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的负载均衡策略: {strategy}，可选: {', '.join(STRATEGIES)}")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+
+    def _available(self, endpoint: Endpoint, now: float) -> bool:
+        """熔断器是否允许向该后端发请求；冷却结束的后端转为半开"""
+        if endpoint.state == OPEN and now - endpoint.opened_at >= self.reset_timeout:
+            endpoint.state = HALF_OPEN
+            endpoint.probing = False
+        if endpoint.state == HALF_OPEN:
+            return not endpoint.probing
+        return endpoint.state == CLOSED
+
+    def _score(self, endpoint: Endpoint) -> tuple:
+        if self.strategy == "ewma":
+            # 没有延迟样本的后端优先，让它尽快获得样本
+            latency = endpoint.ewma_latency or 0.0
+            return (latency * (endpoint.outstanding + 1), endpoint.outstanding)
+        return (endpoint.outstanding, endpoint.ewma_latency or 0.0)
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Endpoint | None:
+        """
+        选择一个后端并将其在途数加一
+
+        所有后端都被熔断时退而选择最早被摘除的一个，而不是直接失败。
+
+        Args:
+            exclude: 本次请求已经尝试过的后端地址
+
+        Returns:
+            选中的后端；exclude 覆盖了所有后端时返回 None
+        """
+        exclude = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.url not in exclude]
+            if not candidates:
+                return None
+            healthy = [e for e in candidates if self._available(e, now)]
+            if healthy:
+                endpoint = min(healthy, key=self._score)
+            else:
+                endpoint = min(candidates, key=lambda e: e.opened_at)
+            if endpoint.state == HALF_OPEN:
+                endpoint.probing = True
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: float, ok: bool) -> None:
+        """
+        记录一次请求的结果
+
+        Args:
+            endpoint: acquire 返回的后端
+            latency: 请求耗时（秒）
+            ok: 后端是否健康地完成了请求（业务错误也算健康）
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.probing = False
+            if ok:
+                endpoint.consecutive_failures = 0
+                endpoint.state = CLOSED
+                if endpoint.ewma_latency is None:
+                    endpoint.ewma_latency = latency
+                else:
+                    endpoint.ewma_latency += self.ewma_alpha * (latency - endpoint.ewma_latency)
+                return
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.state == HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+                if endpoint.state != OPEN:
+                    print(f"[ASR] Circuit opened for {endpoint.url} after "
+                          f"{endpoint.consecutive_failures} consecutive failures")
+                endpoint.state = OPEN
+                endpoint.opened_at = time.monotonic()
+
+    def call(self, send: Callable[[str], object], retry_on: tuple):
+        """
+        发送请求，后端不健康时换一个后端重发，每个后端最多尝试一次
+
+        Args:
+            send: send(url) 发送请求并返回带 status_code 的响应；必须可以重复调用（幂等）
+            retry_on: 视为后端故障、需要换后端重试的异常类型
+
+        Returns:
+            (响应, {"endpoint": 最终使用的后端, "attempts": 尝试次数})
+
+        Raises:
+            所有后端都以 retry_on 中的异常失败时，抛出最后一个异常
+        """
+        tried = []
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.append(endpoint.url)
+            started = time.monotonic()
+            try:
+                response = send(endpoint.url)
+            except retry_on as e:
+                self.release(endpoint, time.monotonic() - started, ok=False)
+                if len(tried) >= len(self.endpoints):
+                    raise
+                print(f"[ASR] {endpoint.url} failed ({type(e).__name__}), failing over")
+                continue
+            except BaseException:
+                self.release(endpoint, time.monotonic() - started, ok=True)
+                raise
+
+            healthy = response.status_code not in FAILOVER_STATUS
+            self.release(endpoint, time.monotonic() - started, ok=healthy)
+            if healthy or len(tried) >= len(self.endpoints):
+                return response, {"endpoint": endpoint.url, "attempts": len(tried)}
+            print(f"[ASR] {endpoint.url} returned HTTP {response.status_code}, failing over")
+
+    async def call_async(self, send: Callable[[str], Awaitable], retry_on: tuple):
+        """call 的异步版本，send(url) 返回可等待对象"""
+        tried = []
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.append(endpoint.url)
+            started = time.monotonic()
+            try:
+                response = await send(endpoint.url)
+            except retry_on as e:
+                self.release(endpoint, time.monotonic() - started, ok=False)
+                if len(tried) >= len(self.endpoints):
+                    raise
+                print(f"[ASR] {endpoint.url} failed ({type(e).__name__}), failing over")
+                continue
+            except BaseException:
+                self.release(endpoint, time.monotonic() - started, ok=True)
+                raise
+
+            healthy = response.status_code not in FAILOVER_STATUS
+            self.release(endpoint, time.monotonic() - started, ok=healthy)
+            if healthy or len(tried) >= len(self.endpoints):
+                return response, {"endpoint": endpoint.url, "attempts": len(tried)}
+            print(f"[ASR] {endpoint.url} returned HTTP {response.status_code}, failing over")
+
+    def stats(self) -> dict:
+        """按后端地址返回统计快照"""
+        with self._lock:
+            return {endpoint.url: endpoint.snapshot() for endpoint in self.endpoints}
@@ -0,0 +1,159 @@
+"""
+转录结果缓存
+
+以音频内容为键的持久化磁盘缓存：
+- 键由文件内容的流式 SHA-256、语言参数和后端标识组成，与文件名无关
+- 每条记录一个 JSON 文件，按键的前两位分目录存放
+- 记录超过 TTL 视为过期；总大小超过上限时按最近访问时间（LRU）淘汰。
+  总大小在写入时增量估计，只有估计值超过上限或距上次扫描过久时才扫描整个目录
+- 多个进程可以共享同一个缓存目录，写入通过临时文件 + 原子替换完成
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+# 计算文件哈希时每次读取的字节数
+_HASH_BLOCK_SIZE = 1 << 20
+
+# 距上次扫描超过该秒数时重新扫描目录，校正其他进程写入造成的大小估计偏差
+_RESCAN_INTERVAL = 300.0
+
+
+def hash_file(path: Path) -> str:
+    """流式计算文件内容的 SHA-256，内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash: str, lang: str, backend: str, variant: str = "") -> str:
+    """
+    由内容哈希、语言参数和后端标识组合出缓存键
+
+    variant 用于区分会影响转录结果的客户端处理方式（例如上传前重采样）。
+    """
+    return hashlib.sha256(f"{content_hash}\0{lang}\0{backend}\0{variant}".encode("utf-8")).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    以内容哈希为键的转录结果磁盘缓存
+
+    Args:
+        directory: 缓存目录，不存在时自动创建
+        max_bytes: 缓存总大小上限（字节），超过后按 LRU 淘汰
+        ttl: 记录有效期（秒）
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 上次扫描得到的总大小加上之后本进程写入的增量；None 表示还没有扫描过
+        self._estimated_bytes = None
+        self._scanned_at = 0.0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        """
+        读取缓存记录
+
+        Returns:
+            缓存的结果字典；不存在、已过期或已损坏时返回 None
+        """
+        path = self._path(key)
+        result = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if time.time() - entry["created"] <= self.ttl:
+                result = entry["result"]
+                # 更新访问时间，供 LRU 淘汰使用
+                os.utime(path)
+            else:
+                path.unlink(missing_ok=True)
+        except (OSError, ValueError, KeyError, TypeError):
+            result = None
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """写入缓存记录，总大小估计超过上限时淘汰最久未访问的记录"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced_bytes = path.stat().st_size
+        except OSError:
+            replaced_bytes = 0
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "result": result}, f, ensure_ascii=False)
+            written_bytes = os.path.getsize(tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            if self._estimated_bytes is None or time.monotonic() - self._scanned_at > _RESCAN_INTERVAL:
+                needs_scan = True
+            else:
+                self._estimated_bytes += written_bytes - replaced_bytes
+                needs_scan = self._estimated_bytes > self.max_bytes
+        if needs_scan:
+            self._evict()
+
+    def _evict(self) -> None:
+        """扫描缓存目录：删除过期记录，总大小超过上限时按访问时间从旧到新淘汰，并校正大小估计"""
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                # mtime 晚于 created，mtime 过期说明记录一定已过期
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+        with self._lock:
+            self._estimated_bytes = total
+            self._scanned_at = time.monotonic()
+
+    def stats(self) -> dict:
+        """返回本进程内的命中统计"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
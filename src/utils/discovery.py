@@ -0,0 +1,77 @@
+"""
+输入音频发现
+
+用 os.scandir 惰性扫描输入目录，按文件头的魔数识别音频格式：
+- 目录项的类型来自 scandir 返回的 d_type，普通文件不需要额外的 stat 调用
+- 扫描是惰性的：单文件模式在第一个匹配处停止，不会遍历整个目录
+- 格式由文件开头的字节决定，与扩展名（及其大小写）无关
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator
+
+# 识别格式需要读取的文件头字节数
+_HEADER_SIZE = 12
+
+# MPEG 音频帧头中 layer 字段为 00 的是保留值（ADTS AAC 等也以 0xFFF 同步字开头）
+_MPEG_LAYER_MASK = 0x06
+
+
+def sniff_audio_format(header: bytes) -> str | None:
+    """
+    根据文件头识别音频格式
+
+    Args:
+        header: 文件开头的字节（至少 12 字节才能识别 WAV）
+
+    Returns:
+        "wav"、"mp3"；不是支持的音频格式时返回 None
+    """
+    if len(header) >= 12 and header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:3] == b"ID3":
+        return "mp3"
+    if (
+        len(header) >= 3
+        and header[0] == 0xFF
+        and header[1] & 0xE0 == 0xE0
+        and header[1] & _MPEG_LAYER_MASK
+        # 比特率索引 1111 无效
+        and header[2] & 0xF0 != 0xF0
+    ):
+        return "mp3"
+    return None
+
+
+def detect_audio_format(path: str | os.PathLike) -> str | None:
+    """读取文件头识别音频格式，文件无法读取时返回 None"""
+    # 直接使用 os.open/os.read：只读 12 字节，不需要缓冲文件对象的开销
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        return sniff_audio_format(os.read(fd, _HEADER_SIZE))
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+
+def iter_audio_files(directory: Path) -> Iterator[Path]:
+    """
+    惰性地逐个返回目录中的音频文件（按目录项顺序，不排序）
+
+    Raises:
+        FileNotFoundError: 目录不存在
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if detect_audio_format(entry.path) is not None:
+                yield Path(entry.path)
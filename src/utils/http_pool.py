@@ -0,0 +1,169 @@
+"""
+HTTP 连接池
+
+为 ASR 服务提供进程级共享的 keep-alive 连接池：
+- 同一进程内的多次调用、多个线程复用同一组 TCP 连接
+- 连接池大小可配置，空闲超过阈值的连接在下次取用时被主动关闭
+- 统计新建连接数和复用命中数，用于确认连接确实被复用
+
+requests（及其 urllib3/charset_normalizer/idna 依赖链）在第一次请求时才导入：
+每次调用预制件都会启动新的解释器，导入它占短音频冷启动耗时的很大一部分，
+而缓存命中、参数错误等路径根本不需要发请求。
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+
+class PoolStats:
+    """线程安全的连接池计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.idle_evictions = 0
+
+    def record(self, reused: bool, evicted: bool = False) -> None:
+        """记录一次连接取用"""
+        with self._lock:
+            self.requests += 1
+            if reused:
+                self.reused_connections += 1
+            else:
+                self.new_connections += 1
+            if evicted:
+                self.idle_evictions += 1
+
+    def snapshot(self) -> dict:
+        """返回当前计数的快照"""
+        with self._lock:
+            reuse_ratio = self.reused_connections / self.requests if self.requests else 0.0
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": self.reused_connections,
+                "idle_evictions": self.idle_evictions,
+                "reuse_ratio": round(reuse_ratio, 4),
+            }
+
+
+class _TrackingPoolMixin:
+    """
+    在 urllib3 连接池取用/归还连接时记录复用情况并执行空闲淘汰
+
+    具体的 stats 和 idle_timeout 由 _tracking_pool_class 以类属性的形式注入。
+    """
+
+    _stats: PoolStats = None
+    _idle_timeout: float = 0.0
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        evicted = False
+        last_used = getattr(conn, "_asr_last_used", None)
+        if conn.sock is not None and last_used is not None:
+            if time.monotonic() - last_used > self._idle_timeout:
+                conn.close()
+                evicted = True
+        # urllib3 已经关闭了对端断开的连接，sock 为空表示本次请求需要重新建连
+        self._stats.record(reused=conn.sock is not None, evicted=evicted)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._asr_last_used = time.monotonic()
+        super()._put_conn(conn)
+
+
+def _tracking_pool_class(base: type, stats: PoolStats, idle_timeout: float) -> type:
+    """为 urllib3 连接池类生成带统计和空闲淘汰的子类"""
+    return type(
+        f"Tracking{base.__name__}",
+        (_TrackingPoolMixin, base),
+        {"_stats": stats, "_idle_timeout": idle_timeout},
+    )
+
+
+def load_requests():
+    """导入并返回 requests 模块（只有第一次调用需要实际导入）"""
+    import requests
+
+    return requests
+
+
+def _tracking_adapter(stats: PoolStats, idle_timeout: float, **kwargs):
+    """创建使用带统计功能的连接池类的 HTTPAdapter（HTTPAdapter 子类随 requests 延迟定义）"""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _TrackingAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _tracking_pool_class(HTTPConnectionPool, stats, idle_timeout),
+                "https": _tracking_pool_class(HTTPSConnectionPool, stats, idle_timeout),
+            }
+
+    return _TrackingAdapter(**kwargs)
+
+
+class HTTPPool:
+    """
+    进程级共享的 keep-alive HTTP 连接池
+
+    底层的 requests.Session 在第一次请求时才导入 requests 并创建；requests.Session 本身
+    可以在多个线程间共享，连接池大小决定了能同时保持的连接数。
+
+    Args:
+        pool_size: 每个主机最多保持的连接数
+        idle_timeout: 连接空闲超过该秒数后，下次取用时关闭并重新建连
+    """
+
+    def __init__(self, pool_size: int = 16, idle_timeout: float = 30.0):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._stats = PoolStats()
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> "requests.Session":
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    requests = load_requests()
+                    adapter = _tracking_adapter(
+                        self._stats,
+                        self.idle_timeout,
+                        pool_connections=self.pool_size,
+                        pool_maxsize=self.pool_size,
+                    )
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def post(self, url: str, **kwargs) -> "requests.Response":
+        """通过连接池发送 POST 请求，参数与 requests.post 相同"""
+        return self._get_session().post(url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """通过连接池发送任意方法的请求，参数与 requests.request 相同"""
+        return self._get_session().request(method, url, **kwargs)
+
+    def stats(self) -> dict:
+        """返回连接复用统计"""
+        return {"pool_size": self.pool_size, **self._stats.snapshot()}
+
+    def close(self) -> None:
+        """关闭所有连接，下次请求时重新创建 Session"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
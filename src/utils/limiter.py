@@ -0,0 +1,228 @@
+"""
+自适应并发限制
+
+同一进程内大量并发转录时，固定的并发数要么用不满 ASR 集群，要么把它压到超时。
+AdaptiveLimiter 按 AIMD（加性增、乘性减）根据观测到的请求结果调整允许的在途请求数：
+
+- 过载信号：调用方报告的 429/503 响应或请求超时，或请求耗时超过同组基线的 tolerance 倍
+  → limit 乘以 backoff（向下取整，不低于 min_limit）
+- 其他成功请求：在途请求数达到过 limit 时，每累计 limit 个成功请求 limit 加 1（不超过 max_limit）；
+  并发用不满时不增加，避免空闲时 limit 无限增长
+- 每次减小后，只有在减小之后才发出的请求能触发下一次减小：减小前已在途的请求
+  观测到的是旧并发下的负载，不应连续减半
+
+耗时样本按调用方给出的分组（例如请求体大小的量级）分别保存，基线是同组最近 BASELINE_WINDOW 个样本的
+中位数：小请求不会把大请求的基线拉低，个别特别快的请求也不会让之后的正常请求都被判定为过载；
+后端整体变慢（例如换了更大的模型）后，窗口中过半的样本变慢，基线随之跟上。
+
+同步调用（acquire/release）和异步调用（acquire_async/release）共用同一个限制，内部状态由锁保护。
+"""
+
+import asyncio
+import collections
+import math
+import statistics
+import threading
+import time
+from typing import Callable, Hashable
+
+# 耗时基线取同组最近多少个样本的中位数
+BASELINE_WINDOW = 50
+# 同组样本少于该数量时不按耗时判断过载
+BASELINE_MIN_SAMPLES = 5
+
+
+class AdaptiveLimiter:
+    """
+    AIMD 自适应并发限制器
+
+    Args:
+        initial_limit: 初始的在途请求上限
+        min_limit: 上限的下界
+        max_limit: 上限的上界
+        backoff: 过载时上限乘以的系数
+        tolerance: 耗时超过基线的该倍数时视为过载
+        history: 保留的最近上限变化条数
+        on_change: 上限变化后（在锁外）以变化记录调用
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        tolerance: float = 2.0,
+        history: int = 50,
+        on_change: Callable[[dict], None] | None = None,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"invalid limits: min={min_limit}, max={max_limit}")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.on_change = on_change
+        self._limit = min(max(initial_limit, min_limit), max_limit)
+        self._in_flight = 0
+        self._peak = 0
+        self._successes = 0
+        self._samples = {}
+        # 上限每减小一次 epoch 加 1；请求取得的令牌是发出时的 epoch
+        self._epoch = 0
+        self._seq = 0
+        self._history = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters = collections.deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def seq(self) -> int:
+        """到目前为止上限变化的次数，传给 changes() 只取之后的变化"""
+        return self._seq
+
+    def _try_acquire(self) -> int | None:
+        if self._in_flight < self._limit:
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+            return self._epoch
+        # 有请求在排队说明上限已经用满
+        self._peak = max(self._peak, self._limit)
+        return None
+
+    def acquire(self, timeout: float | None = None) -> int:
+        """
+        等待一个在途名额
+
+        Returns:
+            令牌，请求结束后传给 release()
+
+        Raises:
+            TimeoutError: timeout 秒内没有空出名额
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (token := self._try_acquire()) is None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("concurrency limit wait timed out")
+                self._cond.wait(remaining)
+        return token
+
+    async def acquire_async(self) -> int:
+        """acquire 的异步版本；超时由调用方用 asyncio.wait_for 控制"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                token = self._try_acquire()
+                if token is not None:
+                    return token
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                    elif waiter.done() and not waiter.cancelled():
+                        # 已被唤醒却不再需要名额，把唤醒转给下一个等待者
+                        self._wake()
+                raise
+
+    def release(
+        self, token: int, latency: float | None = None, overload: str | None = None, group: Hashable | None = 0
+    ) -> None:
+        """
+        归还名额并根据请求结果调整上限
+
+        Args:
+            token: acquire 返回的令牌
+            latency: 请求耗时（秒），没有得到响应时为 None
+            overload: 过载原因（如 "HTTP 503"、"timeout"），没有过载信号时为 None
+            group: 耗时样本的分组，耗时只与同组的基线比较；为 None 时耗时不作为样本
+                （例如错误响应的耗时不代表正常处理耗时），请求只计为一次成功
+        """
+        with self._lock:
+            self._in_flight -= 1
+            change = self._adjust(token, latency, overload, group)
+            self._wake()
+        if change is not None and self.on_change is not None:
+            self.on_change(change)
+
+    def _adjust(self, token: int, latency: float | None, overload: str | None, group: Hashable | None) -> dict | None:
+        if overload is None and latency is not None and group is not None:
+            samples = self._samples.setdefault(group, collections.deque(maxlen=BASELINE_WINDOW))
+            if len(samples) >= BASELINE_MIN_SAMPLES and latency > statistics.median(samples) * self.tolerance:
+                overload = "latency"
+            samples.append(latency)
+        if overload is not None:
+            # 减小之前就已发出的请求不再触发减小
+            if token < self._epoch or self._limit <= self.min_limit:
+                return None
+            self._epoch += 1
+            return self._set_limit(max(self.min_limit, math.floor(self._limit * self.backoff)), overload)
+        if latency is None or self._peak < self._limit or self._limit >= self.max_limit:
+            return None
+        self._successes += 1
+        if self._successes < self._limit:
+            return None
+        return self._set_limit(self._limit + 1, "increase")
+
+    def _set_limit(self, limit: int, reason: str) -> dict:
+        self._seq += 1
+        change = {
+            "seq": self._seq,
+            "time": round(time.time(), 3),
+            "previous": self._limit,
+            "limit": limit,
+            "reason": reason,
+        }
+        self._history.append(change)
+        self._limit = limit
+        self._successes = 0
+        self._peak = self._in_flight
+        return change
+
+    def _wake(self) -> None:
+        """唤醒与空闲名额数相同数量的同步和异步等待者（调用方持有锁）"""
+        free = self._limit - self._in_flight
+        if free <= 0:
+            return
+        self._cond.notify(free)
+        for _ in range(min(free, len(self._async_waiters))):
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # 等待者所在的事件循环已经关闭
+                pass
+
+    def changes(self, since: int = 0) -> list[dict]:
+        """返回序号大于 since 的上限变化（最多保留最近 history 条）"""
+        with self._lock:
+            return [dict(change) for change in self._history if change["seq"] > since]
+
+    def report(self, since: int = 0) -> dict:
+        """当前上限、在途请求数和 since 之后的上限变化"""
+        with self._lock:
+            return {
+                "limit": self._limit,
+                "in_flight": self._in_flight,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "changes": [dict(change) for change in self._history if change["seq"] > since],
+            }
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
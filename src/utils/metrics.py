@@ -0,0 +1,98 @@
+"""
+单次调用的分阶段耗时
+
+记录一次转录调用中各阶段（扫描、哈希、预处理、编码、上传、后端推理、解析……）
+的耗时 span，以及发送和接收的字节数，汇总为结果中的指标对象：
+- span 的起点相对调用开始，长音频的片段并发上传时同一阶段会有多个相互重叠的 span
+- 线程安全：片段在线程池中上传时各线程写入同一个对象
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class CallMetrics:
+    """
+    一次调用的分阶段耗时和传输字节数
+
+    Attributes:
+        audio_seconds: 音频时长（秒），无法确定（如 MP3）时为 None
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.audio_seconds: float | None = None
+        self._spans: list[tuple[str, float, float]] = []
+        self._bytes_sent = 0
+        self._response_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, start: float, end: float) -> None:
+        """记录一个阶段 span，start/end 为 time.monotonic() 时间"""
+        with self._lock:
+            self._spans.append((stage, start, max(start, end)))
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """记录 with 块的耗时（块内抛出异常时同样记录）"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, start, time.monotonic())
+
+    def record_request(self, sent_at: float, body_done_at: float | None, bytes_sent: int, response=None) -> None:
+        """
+        记录一次 HTTP 请求：从开始发送到请求体读完为 upload，之后到收到响应为 inference
+
+        Args:
+            sent_at: 开始发送请求的时间
+            body_done_at: 请求体最后一个字节被读出的时间；请求体未读完（连接失败等）时为 None
+            bytes_sent: 已发送的请求体字节数
+            response: 响应对象，请求失败时为 None
+        """
+        now = time.monotonic()
+        upload_end = body_done_at if body_done_at is not None else now
+        self.record("upload", sent_at, upload_end)
+        content = getattr(response, "content", None) if response is not None else None
+        with self._lock:
+            self._bytes_sent += bytes_sent
+            if isinstance(content, (bytes, bytearray)):
+                self._response_bytes += len(content)
+        if response is not None:
+            self.record("inference", upload_end, now)
+
+    def report(self) -> dict:
+        """
+        汇总指标
+
+        Returns:
+            {"total_ms", "stages_ms"（各阶段 span 耗时之和）, "spans", "bytes_sent",
+             "response_bytes", "audio_seconds", "real_time_factor"（音频秒数 ÷ 墙钟秒数）}
+        """
+        total = time.monotonic() - self.started
+        with self._lock:
+            spans = sorted(self._spans, key=lambda span: span[1])
+            bytes_sent, response_bytes = self._bytes_sent, self._response_bytes
+        stages: dict[str, float] = {}
+        for stage, start, end in spans:
+            stages[stage] = stages.get(stage, 0.0) + (end - start) * 1000
+        rtf = self.audio_seconds / total if self.audio_seconds and total > 0 else None
+        return {
+            "total_ms": round(total * 1000, 1),
+            "stages_ms": {stage: round(ms, 1) for stage, ms in stages.items()},
+            "spans": [
+                {
+                    "stage": stage,
+                    "start_ms": round((start - self.started) * 1000, 1),
+                    "duration_ms": round((end - start) * 1000, 1),
+                }
+                for stage, start, end in spans
+            ],
+            "bytes_sent": bytes_sent,
+            "response_bytes": response_bytes,
+            "audio_seconds": round(self.audio_seconds, 3) if self.audio_seconds is not None else None,
+            "real_time_factor": round(rtf, 2) if rtf is not None else None,
+        }
@@ -0,0 +1,208 @@
+"""
+分片续传上传
+
+几百 MB 的录音整体 POST 时，连接在上传途中断开只能从第 0 字节重来。分片续传协议把文件
+切成固定大小的分片，逐片带 SHA-256 校验上传；会话信息保存在本地状态文件中，同一次调用的
+重试和之后的调用都从服务已确认的分片之后继续：
+
+    POST {url}/uploads                 {"filename", "size", "part_size", "sha256"} -> 201 {"upload_id"}
+    GET  {url}/uploads/{id}            -> 200 {"parts": [已确认的分片序号]}；会话不存在时 404
+    PUT  {url}/uploads/{id}/parts/{n}  分片字节，X-Content-SHA256 头为分片的 SHA-256 -> 200；校验不符时 422
+    POST {url}/uploads/{id}/complete   {"sha256", 表单字段...} -> 与整体上传相同的转录响应
+
+创建会话返回 404/405/501 表示服务不支持该协议，upload() 抛出 ResumableNotSupported，
+调用方回退到整体 multipart 上传。
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+# 创建会话时表示服务不支持分片续传的状态码
+UNSUPPORTED_STATUS = frozenset({404, 405, 501})
+
+# 分片校验不符时的状态码，该分片重传一次
+CHECKSUM_MISMATCH_STATUS = 422
+
+CHECKSUM_HEADER = "X-Content-SHA256"
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class ResumableNotSupported(Exception):
+    """ASR 服务不支持分片续传协议"""
+
+
+def _json_body(value: dict) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def hash_stream(file_handle: BinaryIO) -> tuple[str, int]:
+    """
+    从头流式计算文件对象内容的 SHA-256
+
+    Returns:
+        (十六进制摘要, 字节数)
+    """
+    digest = hashlib.sha256()
+    file_handle.seek(0)
+    size = 0
+    while True:
+        block = file_handle.read(_HASH_BLOCK_SIZE)
+        if not block:
+            break
+        digest.update(block)
+        size += len(block)
+    return digest.hexdigest(), size
+
+
+def _created_upload_id(response) -> str:
+    """
+    创建会话响应中的 upload_id
+
+    Raises:
+        ResumableNotSupported: 响应不是带 upload_id 的 JSON（该路径实际由其他接口处理）
+    """
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict) or not body.get("upload_id"):
+        raise ResumableNotSupported("create response has no upload_id")
+    return body["upload_id"]
+
+
+class ResumableUploader:
+    """
+    分片续传上传客户端
+
+    Args:
+        request: request(method, url, **kwargs) 发送 HTTP 请求并返回带 status_code 的响应
+            （与 requests.Session.request 相同）
+        state_dir: 会话状态文件目录，多次调用（和多个进程）之间共享
+        part_size: 分片字节数
+    """
+
+    def __init__(self, request: Callable, state_dir: Path, part_size: int):
+        self.request = request
+        self.state_dir = Path(state_dir)
+        self.part_size = part_size
+
+    def _state_path(self, url: str, sha256: str) -> Path:
+        endpoint = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return self.state_dir / f"{sha256}.{endpoint}.json"
+
+    def _load_state(self, path: Path, size: int) -> dict | None:
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        # 分片大小改变后旧会话的分片序号不再对应
+        if state.get("size") != size or state.get("part_size") != self.part_size:
+            return None
+        return state
+
+    def _save_state(self, path: Path, state: dict) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def upload(
+        self,
+        url: str,
+        filename: str,
+        file_handle: BinaryIO,
+        sha256: str,
+        size: int,
+        fields: dict,
+        timeout: Callable[[], float],
+        record: Callable[[float, int, object, bool], None] | None = None,
+    ) -> tuple[object, dict]:
+        """
+        分片上传文件并提交转录
+
+        已有该文件在该后端的会话时先查询已确认的分片，只上传其余分片。
+        提交成功（2xx），或服务以 404/422 表示会话已失效、数据校验不符时删除状态文件；
+        其他情况（连接断开、5xx 等）保留，供下次续传。
+
+        Args:
+            url: ASR 服务地址（整体上传的地址，会话接口在其下的 /uploads）
+            filename: 上传的文件名
+            file_handle: 可 seek 的文件对象
+            sha256: 文件内容的 SHA-256（hash_stream 的结果）
+            size: 文件字节数
+            fields: 提交时附带的表单字段（如 lang）
+            timeout: 每个请求发出前调用，返回该请求的超时秒数（可以抛出异常终止上传）
+            record: record(发出时间, 请求体字节数, 响应, 是否为提交请求) 在每个请求结束后调用，
+                请求失败时响应为 None
+
+        Returns:
+            (提交请求的响应，或中途失败的那个响应, {"upload_id", "parts", "parts_resumed", "bytes_sent"})
+
+        Raises:
+            ResumableNotSupported: 服务不支持分片续传
+        """
+        def send(method: str, target: str, body: bytes = b"", headers: dict | None = None, final: bool = False):
+            sent_at, response = time.monotonic(), None
+            try:
+                response = self.request(method, target, data=body, headers=headers or {}, timeout=timeout())
+                return response
+            finally:
+                if record is not None:
+                    record(sent_at, len(body), response, final)
+
+        path = self._state_path(url, sha256)
+        total = max(1, math.ceil(size / self.part_size))
+        state = self._load_state(path, size)
+        acknowledged = None
+        if state is not None:
+            # 续传：只上传服务还没有确认的分片；会话已过期（404）时重新创建
+            response = send("GET", f"{url}/uploads/{state['upload_id']}")
+            if response.status_code == 200:
+                acknowledged = set(response.json().get("parts", []))
+        if acknowledged is None:
+            body = {"filename": filename, "size": size, "part_size": self.part_size, "sha256": sha256}
+            response = send("POST", f"{url}/uploads", _json_body(body), _JSON_HEADERS)
+            if response.status_code in UNSUPPORTED_STATUS:
+                raise ResumableNotSupported(f"HTTP {response.status_code}")
+            if response.status_code not in (200, 201):
+                return response, {}
+            state = {"url": url, "upload_id": _created_upload_id(response), "size": size,
+                     "part_size": self.part_size, "sha256": sha256}
+            self._save_state(path, state)
+            acknowledged = set()
+
+        session = f"{url}/uploads/{state['upload_id']}"
+        report = {"upload_id": state["upload_id"], "parts": total,
+                  "parts_resumed": len(acknowledged & set(range(total))), "bytes_sent": 0}
+        for index in range(total):
+            if index in acknowledged:
+                continue
+            file_handle.seek(index * self.part_size)
+            part = file_handle.read(self.part_size)
+            headers = {"Content-Type": "application/octet-stream", CHECKSUM_HEADER: hashlib.sha256(part).hexdigest()}
+            for _ in range(2):
+                response = send("PUT", f"{session}/parts/{index}", part, headers)
+                report["bytes_sent"] += len(part)
+                if response.status_code != CHECKSUM_MISMATCH_STATUS:
+                    break
+            if response.status_code != 200:
+                return response, report
+
+        response = send("POST", f"{session}/complete", _json_body({**fields, "sha256": sha256}), _JSON_HEADERS, True)
+        if 200 <= response.status_code < 300 or response.status_code in (404, CHECKSUM_MISMATCH_STATUS):
+            path.unlink(missing_ok=True)
+        return response, report
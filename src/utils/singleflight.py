@@ -0,0 +1,261 @@
+"""
+请求合并（single-flight）
+
+相同键的并发调用只执行一次，其余调用等待并共享结果：
+- 同一进程内：第一个调用者执行，其他线程或协程等待它完成后得到结果的副本。
+  协程在事件循环中等待，不占用线程
+- 同一节点的多个进程之间：调用方提供 lookup（例如查询共享的磁盘缓存）时，
+  执行者持有 <lock_dir>/<key>.lock 的排他文件锁，其他进程等锁释放后先调用
+  lookup，命中则直接使用，未命中（对方失败）时再自己执行。等锁时间有上限，
+  超时后不再等待、自己执行
+
+文件锁依赖 fcntl，在不支持的平台（Windows）上只在进程内合并。
+"""
+
+import asyncio
+import copy
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+# 结果来源：本次调用自己执行时为 None
+SHARED_THREAD = "thread"
+SHARED_PROCESS = "process"
+
+# 等待其他进程释放文件锁时的轮询间隔（秒）
+_LOCK_POLL_INTERVAL = 0.05
+
+
+class SingleFlight:
+    """
+    按键合并并发调用
+
+    Args:
+        lock_dir: 跨进程文件锁目录，不存在时自动创建；为 None 时只在进程内合并
+    """
+
+    def __init__(self, lock_dir: Path | None = None):
+        self.lock_dir = Path(lock_dir) if lock_dir is not None and fcntl is not None else None
+        # 正在执行的调用：键 -> 结果 Future，线程用 result() 等待，协程包装为 asyncio Future 等待
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = {SHARED_THREAD: 0, SHARED_PROCESS: 0}
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """加入正在执行的调用，没有时登记一个新调用，返回 (结果 Future, 是否由本调用者执行)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared[SHARED_THREAD] += 1
+                return call, False
+            call = self._calls[key] = Future()
+            return call, True
+
+    def _finish(self, key: str, call: Future, result: Any, error: BaseException | None) -> None:
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            call.set_exception(error)
+        else:
+            # 保存快照：执行者的调用方之后修改自己的结果不影响等待者
+            call.set_result(copy.deepcopy(result))
+
+    @staticmethod
+    def _copy(result: Any) -> Any:
+        # 每个等待者得到独立的副本，互相修改结果不受影响
+        return copy.deepcopy(result)
+
+    @staticmethod
+    def _lock_file(path: Path, timeout: float | None) -> tuple[int | None, bool]:
+        """
+        取得 path 的排他文件锁
+
+        Returns:
+            (文件描述符, 是否等待过其他进程)；等待超过 timeout 秒时文件描述符为 None
+        """
+        waited = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        waited = True
+                        if deadline is not None and time.monotonic() >= deadline:
+                            os.close(fd)
+                            return None, waited
+                        time.sleep(_LOCK_POLL_INTERVAL)
+            except BaseException:
+                os.close(fd)
+                raise
+            # 上一个持锁者在释放前删除了锁文件时，锁在已删除的文件上，需要重新打开
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd, waited
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    @contextmanager
+    def _process_lock(self, key: str, timeout: float | None):
+        """
+        持有 key 的跨进程排他文件锁
+
+        锁目录不可用或等锁超时时不持锁继续执行（退化为只在进程内合并）。
+
+        Yields:
+            是否等待过其他进程释放锁
+        """
+        if self.lock_dir is None:
+            yield False
+            return
+
+        path = self.lock_dir / f"{key}.lock"
+        try:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+            fd, waited = self._lock_file(path, timeout)
+        except OSError:
+            yield False
+            return
+        if fd is None:
+            yield waited
+            return
+
+        try:
+            yield waited
+        finally:
+            path.unlink(missing_ok=True)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _enter(self, key: str, lookup: Callable[[], Any] | None, timeout: float | None):
+        """
+        执行前的跨进程阶段：没有 lookup 时进程之间无法共享结果，不使用文件锁
+
+        Returns:
+            (已进入的锁上下文或 None, 其他进程留下的结果或 None)
+        """
+        if lookup is None or self.lock_dir is None:
+            return None, None
+        lock = self._process_lock(key, timeout)
+        waited = lock.__enter__()
+        if not waited:
+            return lock, None
+        try:
+            result = lookup()
+        except BaseException:
+            lock.__exit__(None, None, None)
+            raise
+        if result is not None:
+            with self._lock:
+                self.shared[SHARED_PROCESS] += 1
+        return lock, result
+
+    def _count_execution(self) -> None:
+        with self._lock:
+            self.executed += 1
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        lookup: Callable[[], Any] | None = None,
+        timeout: float | None = None,
+    ) -> tuple[Any, str | None]:
+        """
+        执行 fn，或等待并共享相同键的正在执行的调用的结果
+
+        Args:
+            key: 合并键
+            fn: 实际执行的函数
+            lookup: 等待其他进程后查询其结果的函数，未命中时返回 None；
+                为 None 时只在进程内合并
+            timeout: 等待其他进程释放文件锁的最长秒数，为 None 时一直等待
+
+        Returns:
+            (结果, 来源)；来源为 None（本调用执行）、"thread" 或 "process"
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self._copy(call.result()), SHARED_THREAD
+
+        result, error = None, None
+        try:
+            lock, result = self._enter(key, lookup, timeout)
+            if result is not None:
+                lock.__exit__(None, None, None)
+                return result, SHARED_PROCESS
+            try:
+                self._count_execution()
+                result = fn()
+            finally:
+                if lock is not None:
+                    lock.__exit__(None, None, None)
+            return result, None
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, call, result, error)
+
+    async def do_async(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable],
+        lookup: Callable[[], Any] | None = None,
+        timeout: float | None = None,
+    ) -> tuple[Any, str | None]:
+        """
+        do 的异步版本：fn 返回可等待对象
+
+        等待者在事件循环中等待结果，不占用线程；只有执行者的文件锁操作在线程中执行。
+        """
+        call, leader = self._join(key)
+        if not leader:
+            # shield：单个等待者被取消时不影响执行者和其他等待者
+            result = await asyncio.shield(asyncio.wrap_future(call))
+            return self._copy(result), SHARED_THREAD
+
+        result, error = None, None
+        try:
+            lock, result = (None, None)
+            if lookup is not None and self.lock_dir is not None:
+                lock, result = await asyncio.to_thread(self._enter, key, lookup, timeout)
+            if result is not None:
+                await asyncio.to_thread(lock.__exit__, None, None, None)
+                return result, SHARED_PROCESS
+            try:
+                self._count_execution()
+                result = await fn()
+            finally:
+                if lock is not None:
+                    await asyncio.to_thread(lock.__exit__, None, None, None)
+            return result, None
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, call, result, error)
+
+    def stats(self) -> dict:
+        """返回本进程内实际执行的次数和共享结果的次数"""
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "shared_thread": self.shared[SHARED_THREAD],
+                "shared_process": self.shared[SHARED_PROCESS],
+            }
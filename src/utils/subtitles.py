@@ -0,0 +1,117 @@
+"""
+转录结果文件输出
+
+把转录结果按片段写成字幕和逐行 JSON 文件，供 Gateway 作为输出文件上传：
+- srt:   SubRip 字幕（HH:MM:SS,mmm）
+- vtt:   WebVTT 字幕（HH:MM:SS.mmm）
+- jsonl: 每行一个片段 {"index", "start_ms", "end_ms", "text"}
+
+长音频的片段按时间顺序转录完成后立即写入，文件不需要在内存中拼出完整内容。
+写入过程中使用同目录下的临时文件，close() 时才替换为正式文件名，
+失败时 abort() 删除临时文件，输出目录中不会留下写了一半的文件。
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterator
+
+OUTPUT_FORMATS = ("srt", "vtt", "jsonl")
+
+
+def format_timestamp(ms: int, separator: str = ",") -> str:
+    """毫秒数转为 HH:MM:SS,mmm（WebVTT 使用 "." 作为毫秒分隔符）"""
+    seconds, millis = divmod(max(0, int(ms)), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{millis:03d}"
+
+
+def iter_cues(text: str, timestamps: dict | None) -> Iterator[tuple[int | None, int | None, str]]:
+    """
+    按列式时间戳的片段拆分文本
+
+    Yields:
+        (起始毫秒, 结束毫秒, 片段文本)；没有时间戳时整段文本作为一条，起止时间为 None
+    """
+    if not timestamps:
+        if text.strip():
+            yield None, None, text.strip()
+        return
+    segments = timestamps["segments"]
+    offsets = segments["text_offset"] + [len(text)]
+    for i, (start, end) in enumerate(zip(segments["start"], segments["end"])):
+        cue = text[offsets[i]:offsets[i + 1]].strip()
+        if cue:
+            yield start, end, cue
+
+
+class TranscriptWriter:
+    """
+    把转录片段依次写入各格式的输出文件
+
+    Attributes:
+        pieces: 已调用 write() 的次数（为 0 表示还没有写入任何转录结果）
+        cues: 已写入的片段数
+    """
+
+    def __init__(self, directory: Path, stem: str, formats: list[str]):
+        directory.mkdir(parents=True, exist_ok=True)
+        self.pieces = 0
+        self.cues = 0
+        self._paths = {fmt: directory / f"{stem}.{fmt}" for fmt in formats}
+        self._files = {}
+        try:
+            for fmt, path in self._paths.items():
+                self._files[fmt] = open(path.with_name(f".{path.name}.part"), "w", encoding="utf-8")
+        except OSError:
+            self.abort()
+            raise
+        if "vtt" in self._files:
+            self._files["vtt"].write("WEBVTT\n\n")
+
+    def write(self, text: str, timestamps: dict | None) -> None:
+        """写入一段转录结果（片段的时间戳须已平移到整段音频的时间轴）"""
+        self.pieces += 1
+        for start, end, cue in iter_cues(text, timestamps):
+            self.cues += 1
+            if "jsonl" in self._files:
+                record = {"index": self.cues - 1, "start_ms": start, "end_ms": end, "text": cue}
+                self._files["jsonl"].write(json.dumps(record, ensure_ascii=False) + "\n")
+            if start is None:
+                # 字幕需要起止时间，时长未知的片段只写入 JSONL
+                continue
+            if "srt" in self._files:
+                self._files["srt"].write(
+                    f"{self.cues}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{cue}\n\n"
+                )
+            if "vtt" in self._files:
+                self._files["vtt"].write(
+                    f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{cue}\n\n"
+                )
+        # 每段写完即落盘，长音频转录途中已完成的片段可以被读取
+        for handle in self._files.values():
+            handle.flush()
+
+    def close(self) -> list[dict]:
+        """
+        完成写入，把临时文件替换为正式文件
+
+        Returns:
+            [{"format", "path", "bytes"}, ...]
+        """
+        outputs = []
+        for fmt, handle in self._files.items():
+            handle.close()
+            path = self._paths[fmt]
+            os.replace(handle.name, path)
+            outputs.append({"format": fmt, "path": str(path), "bytes": path.stat().st_size})
+        self._files = {}
+        return outputs
+
+    def abort(self) -> None:
+        """放弃写入，删除临时文件"""
+        for handle in self._files.values():
+            handle.close()
+            Path(handle.name).unlink(missing_ok=True)
+        self._files = {}
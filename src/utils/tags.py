@@ -0,0 +1,72 @@
+"""
+SenseVoice raw_text 标记解析
+
+后端返回的 raw_text 中每段文本前带有内联标记，例如：
+
+    <|zh|><|NEUTRAL|><|Speech|><|woitn|>你好<|en|><|HAPPY|><|Laughter|><|woitn|>ha ha
+
+parse_tags() 以一个预编译的正则单遍扫描，把它拆成按段排列的
+{"language", "emotion", "event", "text"}：一组连续标记开启一段，到下一组标记之前的
+文本属于该段。未识别的标记不会出现在文本中。
+"""
+
+import re
+
+_TAG = re.compile(r"<\|([^|<>]*)\|>")
+
+LANGUAGES = frozenset({"zh", "en", "yue", "ja", "ko", "nospeech"})
+EMOTIONS = frozenset({"HAPPY", "SAD", "ANGRY", "NEUTRAL", "FEARFUL", "DISGUSTED", "SURPRISED", "EMO_UNKNOWN"})
+EVENTS = frozenset({"Speech", "BGM", "Applause", "Laughter", "Cry", "Sneeze", "Breath", "Cough", "Event_UNK"})
+
+# 标记值 -> 所属字段（一次字典查找完成分类）
+_FIELDS = {
+    **{tag: "language" for tag in LANGUAGES},
+    **{tag: "emotion" for tag in EMOTIONS},
+    **{tag: "event" for tag in EVENTS},
+}
+
+
+def _segment() -> dict:
+    return {"language": None, "emotion": None, "event": None, "text": ""}
+
+
+def parse_tags(raw_text: str) -> list[dict]:
+    """
+    将 raw_text 解析为按段排列的标记和文本
+
+    Args:
+        raw_text: 后端返回的带标记文本
+
+    Returns:
+        [{"language", "emotion", "event", "text"}, ...]，段内没有的标记为 None，
+        text 已去掉首尾空白；没有标记的文本单独成段（标记均为 None），raw_text 为空时返回 []
+    """
+    segments = []
+    current = None
+    position = 0
+    for match in _TAG.finditer(raw_text):
+        text = raw_text[position:match.start()]
+        if text.strip():
+            if current is None:
+                current = _segment()
+                segments.append(current)
+            current["text"] += text
+            # 文本之后出现的标记开启新的一段
+            current = None
+        if current is None:
+            current = _segment()
+            segments.append(current)
+        field = _FIELDS.get(match.group(1))
+        if field is not None:
+            current[field] = match.group(1)
+        position = match.end()
+
+    tail = raw_text[position:]
+    if tail.strip():
+        if current is None:
+            current = _segment()
+            segments.append(current)
+        current["text"] += tail
+    for segment in segments:
+        segment["text"] = segment["text"].strip()
+    return segments
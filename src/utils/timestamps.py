@@ -0,0 +1,149 @@
+"""
+列式时间戳
+
+转录结果的 timestamps 字段用并列数组（而不是字典列表）表示片段和词的时间：
+
+    {
+        "unit": "ms",
+        "source": "backend" | "chunks",
+        "segments": {"start": [...], "end": [...], "text_offset": [...]},
+        "words": {"start": [...], "end": [...], "text_offset": [...], "length": [...]}
+    }
+
+- 时间为相对整段音频开头的毫秒整数
+- text_offset / length 是结果 text 字段中的字符下标，第 i 个片段的文本为
+  text[text_offset[i]:text_offset[i + 1]]，第 i 个词为 text[text_offset[i]:text_offset[i] + length[i]]
+- 后端返回 timestamp（每个词的 [起, 止]）或 sentence_info 时 source 为 backend；
+  否则由客户端切分片段的起止时间得出（source 为 chunks，没有 words）
+"""
+
+import re
+from typing import Iterable
+
+# 中日韩文字按单字切分，其他文字按连续的字母数字切分（与 FunASR 的时间戳对齐方式一致）
+_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]|[^\W_]+(?:'[^\W_]+)*")
+
+
+def _empty() -> dict:
+    return {"start": [], "end": [], "text_offset": []}
+
+
+def _locate(text: str, tokens: Iterable[str]) -> list[int] | None:
+    """依次在 text 中查找各词的位置，找不到任何一个词时返回 None"""
+    offsets = []
+    position = 0
+    for token in tokens:
+        index = text.find(token, position)
+        if index < 0:
+            return None
+        offsets.append(index)
+        position = index + len(token)
+    return offsets
+
+
+def _words(item: dict, text: str) -> dict | None:
+    """解析后端返回的词级时间戳：timestamp 为 [[起, 止], ...]，words 可选（缺省时按 text 分词）"""
+    stamps = item.get("timestamp")
+    if not isinstance(stamps, list) or not stamps:
+        return None
+    tokens = item.get("words")
+    if not isinstance(tokens, list):
+        tokens = _TOKEN.findall(text)
+    if len(tokens) != len(stamps):
+        return None
+    tokens = [str(token).strip() for token in tokens]
+    offsets = _locate(text, tokens)
+    if offsets is None:
+        return None
+    try:
+        starts = [int(start) for start, _ in stamps]
+        ends = [int(end) for _, end in stamps]
+    except (TypeError, ValueError):
+        return None
+    return {"start": starts, "end": ends, "text_offset": offsets, "length": [len(token) for token in tokens]}
+
+
+def _sentences(item: dict, text: str) -> dict | None:
+    """解析后端返回的句级时间戳：sentence_info 为 [{"text", "start", "end"}, ...]"""
+    sentences = item.get("sentence_info")
+    if not isinstance(sentences, list) or not sentences:
+        return None
+    try:
+        starts = [int(sentence["start"]) for sentence in sentences]
+        ends = [int(sentence["end"]) for sentence in sentences]
+    except (KeyError, TypeError, ValueError):
+        return None
+    offsets = _locate(text, (str(sentence.get("text", "")).strip() for sentence in sentences))
+    if offsets is None:
+        return None
+    return {"start": starts, "end": ends, "text_offset": offsets}
+
+
+def from_backend(item: dict, text: str) -> dict | None:
+    """
+    从 ASR 服务返回的一项结果中提取时间戳
+
+    Args:
+        item: 响应 result 数组中的一项
+        text: 结果的 text 字段（text_offset 以它为准）
+
+    Returns:
+        列式时间戳，后端没有提供（或与文本对不上）时为 None
+    """
+    words = _words(item, text)
+    segments = _sentences(item, text)
+    if words is None and segments is None:
+        return None
+    if segments is None:
+        # 没有句级信息时整段上传视为一个片段，范围为首词开始到末词结束
+        segments = {"start": [words["start"][0]], "end": [words["end"][-1]], "text_offset": [0]}
+    timestamps = {"unit": "ms", "source": "backend", "segments": segments}
+    if words is not None:
+        timestamps["words"] = words
+    return timestamps
+
+
+def from_span(start: float, end: float) -> dict:
+    """由客户端已知的音频范围（秒）生成只有一个片段的时间戳"""
+    return {
+        "unit": "ms",
+        "source": "chunks",
+        "segments": {"start": [round(start * 1000)], "end": [round(end * 1000)], "text_offset": [0]},
+    }
+
+
+def merge(parts: Iterable[tuple[float, float, int, dict | None]]) -> dict | None:
+    """
+    拼接各片段的时间戳
+
+    Args:
+        parts: 按时间顺序排列的 (片段起始秒数, 片段结束秒数, 片段文本在拼接后 text 中的下标,
+            片段结果的时间戳或 None)；没有时间戳的片段以其起止时间作为一个片段
+
+    Returns:
+        拼接后的列式时间戳，没有任何可用信息时为 None
+    """
+    segments = _empty()
+    words = {**_empty(), "length": []}
+    backend = False
+    for start, end, text_offset, timestamps in parts:
+        if timestamps is None:
+            if end <= start:
+                continue
+            timestamps = from_span(0.0, end - start)
+        backend = backend or timestamps["source"] == "backend"
+        shift = round(start * 1000)
+        for target, source in ((segments, timestamps["segments"]), (words, timestamps.get("words"))):
+            if source is None:
+                continue
+            target["start"].extend(value + shift for value in source["start"])
+            target["end"].extend(value + shift for value in source["end"])
+            target["text_offset"].extend(value + text_offset for value in source["text_offset"])
+            if "length" in target:
+                target["length"].extend(source["length"])
+    if not segments["start"]:
+        return None
+    merged = {"unit": "ms", "source": "backend" if backend else "chunks", "segments": segments}
+    if words["start"]:
+        merged["words"] = words
+    return merged
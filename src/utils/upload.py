@@ -0,0 +1,135 @@
+"""
+流式 multipart 上传
+
+在不把文件读入内存的前提下构造 multipart/form-data 请求体：
+- 表单字段和 multipart 边界预先编码为小段字节
+- 文件内容在发送时按块从磁盘读取，常驻内存与文件大小无关
+- 请求体总长度预先计算，请求带 Content-Length 而不是 chunked 编码
+
+不使用 mmap：被访问过的映射页会计入进程 RSS，直到内存紧张才会被回收，
+对几百 MB 的文件反而会推高峰值内存。
+"""
+
+import os
+import time
+import uuid
+from typing import BinaryIO, Iterator
+
+
+# 每次从文件读取的字节数
+UPLOAD_BLOCK_SIZE = 256 * 1024
+
+
+def _quote(value: str) -> str:
+    """按 WHATWG HTML 规范转义 multipart 头部参数值（与 urllib3 一致）"""
+    return value.translate({10: "%0A", 13: "%0D", 34: "%22"})
+
+
+class MultipartStream:
+    """
+    以文件对象形式提供的 multipart/form-data 请求体
+
+    requests 会通过 len() 得到 Content-Length，并由 http.client 反复调用
+    read() 分块发送。文件对象需要可以 seek，调用方负责关闭它。
+
+    Args:
+        fields: 普通表单字段
+        file_field: 文件字段名
+        filename: 上传的文件名
+        fileobj: 已打开的二进制文件对象（磁盘文件或 BytesIO）
+        content_type: 文件的 Content-Type
+        boundary: multipart 边界，默认随机生成
+    """
+
+    def __init__(
+        self,
+        fields: dict,
+        file_field: str,
+        filename: str,
+        fileobj: BinaryIO,
+        content_type: str = "audio/wav",
+        boundary: str | None = None,
+    ):
+        self.filename = filename
+        self.fields = dict(fields)
+        self.boundary = boundary or uuid.uuid4().hex
+
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'.encode("utf-8")
+            + str(value).encode("utf-8") + b"\r\n"
+            for name, value in self.fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(file_field)}"; '
+            f'filename="{_quote(filename)}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode("utf-8")
+        self._head = head
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+        self._file = fileobj
+        self._file_start = fileobj.tell()
+        self.file_size = fileobj.seek(0, os.SEEK_END) - self._file_start
+        fileobj.seek(self._file_start)
+
+        self._length = len(self._head) + self.file_size + len(self._tail)
+        self._position = 0
+        # 请求体最后一个字节被读出的时间（time.monotonic()），用于区分上传和后端处理耗时
+        self.completed_at: float | None = None
+        # 文件对象当前位置相对 _file_start 的偏移，顺序读取时无需 seek
+        self._file_offset = 0
+
+    @property
+    def content_type(self) -> str:
+        """请求的 Content-Type 头"""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._length
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """移动读取位置（requests 在重定向后重发请求体时使用）"""
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._position, os.SEEK_END: self._length}[whence]
+        self._position = min(max(0, base + offset), self._length)
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        """读取最多 size 字节；size < 0 时读取剩余全部内容（仅用于测试小文件）"""
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        while size > 0 and self._position < self._length:
+            chunk = self._read_part(size)
+            chunks.append(chunk)
+            size -= len(chunk)
+            self._position += len(chunk)
+        if chunks and self._position == self._length:
+            self.completed_at = time.monotonic()
+        return b"".join(chunks)
+
+    def _read_part(self, size: int) -> bytes:
+        """从当前位置所在的区段（头部/文件/尾部）读取数据"""
+        head_end = len(self._head)
+        file_end = head_end + self.file_size
+        if self._position < head_end:
+            return self._head[self._position:self._position + size]
+        if self._position < file_end:
+            offset = self._position - head_end
+            if offset != self._file_offset:
+                self._file.seek(self._file_start + offset)
+            chunk = self._file.read(min(size, self.file_size - offset))
+            if not chunk:
+                raise OSError(f"文件在上传过程中被截断: {self.filename}")
+            self._file_offset = offset + len(chunk)
+            return chunk
+        offset = self._position - file_end
+        return self._tail[offset:offset + size]
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(UPLOAD_BLOCK_SIZE)
+            if not chunk:
+                return
+            yield chunk
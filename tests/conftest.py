@@ -0,0 +1,58 @@
+"""
+pytest 公共夹具
+"""
+
+import pytest
+
+from src.utils.balancer import EndpointBalancer
+from src.utils.cache import TranscriptionCache
+from src.utils.singleflight import SingleFlight
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """每个测试使用独立的转录缓存目录，避免测试之间互相命中缓存"""
+    cache = TranscriptionCache(tmp_path / "asr-cache")
+    monkeypatch.setattr("src.main._CACHE", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_single_flight(tmp_path, monkeypatch):
+    """每个测试使用独立的请求合并状态和锁目录"""
+    single_flight = SingleFlight(tmp_path / "asr-locks")
+    monkeypatch.setattr("src.main._SINGLE_FLIGHT", single_flight)
+    return single_flight
+
+
+@pytest.fixture(autouse=True)
+def isolated_codecs(tmp_path, monkeypatch):
+    """每个测试从空的"被拒编码"和"不支持分片续传"集合开始，避免回退状态在测试之间传递"""
+    monkeypatch.setattr("src.main._REJECTED_CODECS", set())
+    monkeypatch.setattr("src.main._RESUMABLE_UNSUPPORTED", set())
+    monkeypatch.setattr("src.main.ASR_UPLOAD_STATE_DIR", tmp_path / "asr-uploads")
+
+
+@pytest.fixture(autouse=True)
+def isolated_balancer(monkeypatch):
+    """每个测试使用新的负载均衡器，避免熔断状态在测试之间传递"""
+    from src import main
+    balancer = EndpointBalancer(main.ASR_API_URLS)
+    monkeypatch.setattr("src.main._BALANCER", balancer)
+    return balancer
+
+
+@pytest.fixture(autouse=True)
+def no_retries(monkeypatch):
+    """默认不重试，使各测试的请求次数可预期；测试重试的用例自行替换 _RETRY_POLICY"""
+    from src.main import _RetryPolicy
+    monkeypatch.setattr("src.main._RETRY_POLICY", _RetryPolicy(max_attempts=1))
+
+
+@pytest.fixture(autouse=True)
+def isolated_limiter(monkeypatch):
+    """每个测试使用新的自适应并发限制器，避免上一个测试降低的上限影响后续测试"""
+    from src import main
+    limiter = main._new_limiter()
+    monkeypatch.setattr("src.main._LIMITER", limiter)
+    return limiter
@@ -0,0 +1,104 @@
+"""
+异步 HTTP 连接池测试
+
+使用本地 HTTP 服务验证请求体完整发送、连接复用、响应体解析和超时。
+"""
+
+import asyncio
+import hashlib
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.async_http import AsyncHTTPPool, HTTPConnectionError, HTTPTimeout
+from src.utils.upload import MultipartStream
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """返回请求体的 SHA-256；路径决定响应方式"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/slow":
+            time.sleep(1.0)
+        payload = f'{{"sha256": "{hashlib.sha256(body).hexdigest()}"}}'.encode()
+
+        self.send_response(200)
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for part in (payload[:5], payload[5:]):
+                self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _body(content: bytes) -> MultipartStream:
+    return MultipartStream({"lang": "zh"}, "files", "a.wav", io.BytesIO(content), boundary="b")
+
+
+def test_concurrent_requests_reuse_connections(server):
+    """测试并发请求的请求体完整到达，且连接数不超过上限并被复用"""
+    pool = AsyncHTTPPool(max_connections=4)
+    bodies = [bytes([i]) * 200_000 for i in range(40)]
+
+    async def run():
+        return await asyncio.gather(*(
+            pool.post(f"{server}/", data=_body(content), timeout=10) for content in bodies
+        ))
+
+    responses = asyncio.run(run())
+
+    for content, response in zip(bodies, responses):
+        assert response.status_code == 200
+        assert response.json()["sha256"] == hashlib.sha256(_body(content).read()).hexdigest()
+    stats = pool.stats()
+    assert stats["requests"] == 40
+    assert stats["new_connections"] <= 4
+    assert stats["reused_connections"] >= 36
+
+
+def test_chunked_response(server):
+    """测试解析 chunked 编码的响应体"""
+    pool = AsyncHTTPPool()
+    response = asyncio.run(pool.post(f"{server}/chunked", data=_body(b"abc"), timeout=10))
+
+    assert response.json()["sha256"] == hashlib.sha256(_body(b"abc").read()).hexdigest()
+
+
+def test_timeout(server):
+    """测试超过超时时间时抛出 HTTPTimeout"""
+    pool = AsyncHTTPPool()
+    with pytest.raises(HTTPTimeout):
+        asyncio.run(pool.post(f"{server}/slow", data=_body(b"abc"), timeout=0.2))
+
+
+def test_connection_refused():
+    """测试无法连接时抛出 HTTPConnectionError"""
+    probe = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    port = probe.server_address[1]
+    probe.server_close()
+
+    pool = AsyncHTTPPool()
+    with pytest.raises(HTTPConnectionError):
+        asyncio.run(pool.post(f"http://127.0.0.1:{port}/", data=_body(b"abc"), timeout=5))
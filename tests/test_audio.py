@@ -0,0 +1,216 @@
+"""
+音频处理工具测试
+
+测试 WAV 解析、基于能量的切分点规划、语音检测、片段拆分和重采样。
+"""
+
+import io
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from src.utils.audio import (
+    iter_speech_frames, normalize_wav, plan_chunks, read_wav_info, resample_poly, split_wav
+)
+
+
+def _write_wav(path, samples, sample_rate=16000):
+    """将 int16 数组（单声道或 (n, channels)）写入 WAV"""
+    samples = np.asarray(samples, dtype=np.int16)
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.tobytes())
+
+
+def _speech_with_pauses(pause_at, total_seconds, sample_rate=16000, pause_seconds=0.5):
+    """生成带噪声"语音"的信号，在 pause_at 列出的时间点插入静音停顿"""
+    rng = np.random.default_rng(0)
+    signal = (rng.standard_normal(int(total_seconds * sample_rate)) * 3000).astype(np.int16)
+    for t in pause_at:
+        signal[int(t * sample_rate):int((t + pause_seconds) * sample_rate)] = 0
+    return signal
+
+
+class TestReadWavInfo:
+    """测试 WAV 文件头解析"""
+
+    def test_pcm_wav(self, tmp_path):
+        """测试标准 PCM WAV"""
+        path = tmp_path / "a.wav"
+        _write_wav(path, np.zeros((8000, 2)), sample_rate=8000)
+
+        info = read_wav_info(path)
+
+        assert info.channels == 2
+        assert info.sample_width == 2
+        assert info.sample_rate == 8000
+        assert info.n_frames == 8000
+        assert info.duration == 1.0
+
+    def test_extensible_wav(self, tmp_path):
+        """测试 WAVE_FORMAT_EXTENSIBLE 格式的 PCM WAV"""
+        pcm = np.arange(100, dtype=np.int16).tobytes()
+        subformat = struct.pack("<H", 1) + b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+        fmt = struct.pack("<HHIIHH", 0xFFFE, 1, 16000, 32000, 2, 16) + struct.pack("<HHI", 22, 16, 4) + subformat
+        body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(pcm)) + pcm
+        path = tmp_path / "ext.wav"
+        path.write_bytes(b"RIFF" + struct.pack("<I", len(body)) + body)
+
+        info = read_wav_info(path)
+
+        assert info is not None
+        assert info.n_frames == 100
+        assert info.data_offset == len(path.read_bytes()) - len(pcm)
+
+    @pytest.mark.parametrize("content", [b"", b"fake audio data", b"ID3\x04\x00" + b"\x00" * 100])
+    def test_not_wav(self, tmp_path, content):
+        """测试非 WAV 文件"""
+        path = tmp_path / "x.wav"
+        path.write_bytes(content)
+
+        assert read_wav_info(path) is None
+
+
+class TestPlanChunks:
+    """测试静音切分点规划"""
+
+    def test_short_audio_is_single_chunk(self, tmp_path):
+        """测试短于最大片段时长的音频不切分"""
+        path = tmp_path / "short.wav"
+        _write_wav(path, _speech_with_pauses([], 5))
+
+        assert plan_chunks(path, read_wav_info(path), max_seconds=10) == [(0, 80000)]
+
+    def test_cuts_land_in_pauses(self, tmp_path):
+        """测试切分点落在停顿处，片段首尾相接且不超过最大时长"""
+        path = tmp_path / "long.wav"
+        pauses = [7.0, 16.0, 24.5, 33.0]
+        _write_wav(path, _speech_with_pauses(pauses, 40))
+        info = read_wav_info(path)
+
+        chunks = plan_chunks(path, info, max_seconds=10)
+
+        assert chunks[0][0] == 0
+        assert chunks[-1][1] == info.n_frames
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            assert end == start
+        for start, end in chunks:
+            assert (end - start) / 16000 <= 10.0 + 0.03
+        for _, end in chunks[:-1]:
+            cut = end / 16000
+            assert any(p <= cut <= p + 0.5 for p in pauses)
+
+    def test_stereo_and_8bit(self, tmp_path):
+        """测试立体声和 8 位 WAV 也能规划切分点"""
+        path = tmp_path / "u8.wav"
+        mono = _speech_with_pauses([4.0], 8)
+        with wave.open(str(path), "wb") as writer:
+            writer.setnchannels(2)
+            writer.setsampwidth(1)
+            writer.setframerate(16000)
+            u8 = ((mono >> 8) + 128).astype(np.uint8)
+            writer.writeframes(np.repeat(u8, 2).tobytes())
+
+        chunks = plan_chunks(path, read_wav_info(path), max_seconds=6)
+
+        assert len(chunks) == 2
+        assert 4.0 <= chunks[0][1] / 16000 <= 4.5
+
+
+class TestIterSpeechFrames:
+    """测试基于能量和过零率的语音帧检测"""
+
+    def test_tone_is_speech_silence_is_not(self, tmp_path):
+        """测试正弦波帧标记为语音，之后的静音帧不是"""
+        path = tmp_path / "tone.wav"
+        t = np.arange(8000) / 16000
+        _write_wav(path, np.concatenate([0.3 * 32767 * np.sin(2 * np.pi * 200 * t), np.zeros(8000)]))
+
+        flags = np.concatenate(list(iter_speech_frames(path, read_wav_info(path), -45, 0.35)))
+
+        assert len(flags) == 34  # ceil(16000 / 480)
+        assert flags[:16].all()
+        assert not flags[17:].any()
+
+    def test_broadband_noise_is_not_speech(self, tmp_path):
+        """测试能量足够但过零率接近 0.5 的宽带噪声不算语音，放宽过零率阈值后才算"""
+        path = tmp_path / "hiss.wav"
+        _write_wav(path, np.random.default_rng(0).standard_normal(16000) * 1000)
+        info = read_wav_info(path)
+
+        assert not np.concatenate(list(iter_speech_frames(path, info, -45, 0.35))).any()
+        assert np.concatenate(list(iter_speech_frames(path, info, -45, 1.0))).all()
+
+    def test_small_blocks_match_single_block(self, tmp_path, monkeypatch):
+        """测试按小块逐块读取时（含不满一块的末尾），结果与一次读完相同"""
+        path = tmp_path / "mixed.wav"
+        _write_wav(path, _speech_with_pauses([1.0, 2.5], 4))
+        info = read_wav_info(path)
+        whole = np.concatenate(list(iter_speech_frames(path, info, -45, 0.35)))
+
+        monkeypatch.setattr("src.utils.audio._SPEECH_BLOCK_FRAMES", 1000)
+        blocks = list(iter_speech_frames(path, info, -45, 0.35))
+
+        assert len(blocks) > 10
+        assert np.array_equal(np.concatenate(blocks), whole)
+
+
+class TestSplitWav:
+    """测试按切分点拆分 WAV"""
+
+    def test_segments_reassemble_original(self, tmp_path):
+        """测试拆分出的片段拼接后与原始 PCM 完全一致"""
+        path = tmp_path / "a.wav"
+        samples = _speech_with_pauses([2.0], 5)
+        _write_wav(path, samples)
+        info = read_wav_info(path)
+
+        segments = list(split_wav(path, info, [(0, 30000), (30000, 80000)]))
+
+        assert [s.index for s in segments] == [0, 1]
+        assert segments[1].start == 1.875
+        assert segments[1].end == 5.0
+        pcm = b""
+        for segment in segments:
+            with wave.open(io.BytesIO(segment.data), "rb") as reader:
+                assert reader.getframerate() == 16000
+                pcm += reader.readframes(reader.getnframes())
+        assert pcm == samples.tobytes()
+
+
+class TestNormalizeWav:
+    """测试重采样和 16kHz 单声道规范化"""
+
+    def test_resample_keeps_passband_and_removes_alias(self):
+        """测试 48k→16k 保留 1kHz 信号，滤除高于新奈奎斯特频率的 10kHz 信号"""
+        t = np.arange(48000) / 48000
+        low = resample_poly(np.sin(2 * np.pi * 1000 * t), 1, 3)
+        high = resample_poly(np.sin(2 * np.pi * 10000 * t), 1, 3)
+
+        expected = np.sin(2 * np.pi * 1000 * np.arange(16000) / 16000)
+        assert len(low) == 16000
+        assert np.max(np.abs(low[200:-200] - expected[200:-200])) < 1e-3
+        assert np.sqrt(np.mean(high[200:-200] ** 2)) < 1e-3
+
+    def test_stereo_44k_to_16k_mono(self, tmp_path):
+        """测试 44.1kHz 立体声被下混并重采样为 16kHz 单声道 16 位 WAV"""
+        path = tmp_path / "stereo.wav"
+        t = np.arange(44100 * 2) / 44100
+        tone = (0.5 * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+        _write_wav(path, np.stack([tone, tone], axis=1), sample_rate=44100)
+
+        out = io.BytesIO()
+        written = normalize_wav(path, read_wav_info(path), out)
+
+        assert written == len(out.getvalue())
+        with wave.open(io.BytesIO(out.getvalue()), "rb") as reader:
+            assert (reader.getnchannels(), reader.getsampwidth(), reader.getframerate()) == (1, 2, 16000)
+            assert reader.getnframes() == 32000
+            samples = np.frombuffer(reader.readframes(reader.getnframes()), dtype=np.int16)
+        expected = 0.5 * 32767 * np.sin(2 * np.pi * 440 * np.arange(32000) / 16000)
+        assert np.max(np.abs(samples[500:-500] - expected[500:-500])) < 100
@@ -0,0 +1,160 @@
+"""
+后端负载均衡测试
+
+验证后端选择策略、熔断器的打开/半开/恢复和故障转移。
+"""
+
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.utils.balancer import CLOSED, HALF_OPEN, OPEN, EndpointBalancer
+
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+def _response(status_code=200):
+    response = Mock()
+    response.status_code = status_code
+    return response
+
+
+class TestSelection:
+    """测试后端选择"""
+
+    def test_least_outstanding_spreads_requests(self):
+        """测试在途请求最少的后端优先"""
+        balancer = EndpointBalancer(URLS)
+
+        chosen = [balancer.acquire().url for _ in range(3)]
+
+        assert sorted(chosen) == URLS
+
+    def test_ewma_prefers_faster_endpoint(self):
+        """测试 EWMA 策略优先选择延迟更低的后端"""
+        balancer = EndpointBalancer(URLS[:2], strategy="ewma")
+        balancer.release(balancer.acquire(exclude=["http://b"]), 1.0, ok=True)
+        balancer.release(balancer.acquire(exclude=["http://a"]), 0.1, ok=True)
+
+        assert balancer.acquire().url == "http://b"
+
+    def test_duplicate_urls_are_merged(self):
+        """测试重复的地址只算一个后端"""
+        assert len(EndpointBalancer(["http://a", "http://a"]).endpoints) == 1
+
+    def test_invalid_arguments(self):
+        """测试空地址列表和未知策略"""
+        with pytest.raises(ValueError):
+            EndpointBalancer([])
+        with pytest.raises(ValueError):
+            EndpointBalancer(URLS, strategy="random")
+
+
+class TestCircuitBreaker:
+    """测试熔断器状态转换"""
+
+    def test_opens_after_consecutive_failures(self):
+        """测试连续失败达到阈值后摘除后端，请求转到其他后端"""
+        balancer = EndpointBalancer(URLS[:2], failure_threshold=2)
+        a = balancer.endpoints[0]
+        for _ in range(2):
+            balancer.release(balancer.acquire(exclude=["http://b"]), 0.1, ok=False)
+
+        assert a.state == OPEN
+        assert [balancer.acquire().url for _ in range(3)] == ["http://b"] * 3
+
+    def test_half_open_probe_closes_or_reopens(self):
+        """测试冷却结束后只放行一个探测请求，成功则恢复，失败则重新摘除"""
+        balancer = EndpointBalancer(URLS[:1], failure_threshold=1, reset_timeout=10)
+        endpoint = balancer.endpoints[0]
+        with patch("src.utils.balancer.time.monotonic", return_value=100.0):
+            balancer.release(balancer.acquire(), 0.1, ok=False)
+        assert endpoint.state == OPEN
+
+        with patch("src.utils.balancer.time.monotonic", return_value=111.0):
+            probe = balancer.acquire()
+            assert endpoint.state == HALF_OPEN and endpoint.probing
+            balancer.release(probe, 0.1, ok=False)
+        assert endpoint.state == OPEN
+
+        with patch("src.utils.balancer.time.monotonic", return_value=122.0):
+            balancer.release(balancer.acquire(), 0.1, ok=True)
+        assert endpoint.state == CLOSED
+        assert balancer.stats()["http://a"]["failures"] == 2
+
+    def test_all_open_falls_back_to_oldest(self):
+        """测试所有后端都被摘除时仍然选择最早被摘除的后端，而不是直接失败"""
+        balancer = EndpointBalancer(URLS[:2], failure_threshold=1, reset_timeout=60)
+        with patch("src.utils.balancer.time.monotonic", return_value=1.0):
+            balancer.release(balancer.acquire(exclude=["http://a"]), 0.1, ok=False)
+        with patch("src.utils.balancer.time.monotonic", return_value=2.0):
+            balancer.release(balancer.acquire(exclude=["http://b"]), 0.1, ok=False)
+
+        with patch("src.utils.balancer.time.monotonic", return_value=3.0):
+            assert balancer.acquire().url == "http://b"
+
+
+class TestFailover:
+    """测试故障转移"""
+
+    def test_fails_over_on_exception_and_status(self):
+        """测试连接异常和 503 都换后端重发，每个后端最多尝试一次"""
+        balancer = EndpointBalancer(URLS)
+        outcomes = {"http://a": ConnectionError(), "http://b": _response(503), "http://c": _response(200)}
+        tried = []
+
+        def send(url):
+            tried.append(url)
+            outcome = outcomes[url]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        response, report = balancer.call(send, (ConnectionError,))
+
+        assert response.status_code == 200
+        assert sorted(tried) == URLS
+        assert report == {"endpoint": tried[-1], "attempts": 3}
+
+    def test_raises_when_every_endpoint_fails(self):
+        """测试所有后端都失败时抛出最后一个异常"""
+        balancer = EndpointBalancer(URLS[:2])
+
+        with pytest.raises(ConnectionError):
+            balancer.call(Mock(side_effect=ConnectionError()), (ConnectionError,))
+        assert all(e["failures"] == 1 and e["outstanding"] == 0 for e in balancer.stats().values())
+
+    def test_last_unhealthy_response_is_returned(self):
+        """测试所有后端都返回 503 时返回最后一个响应，由调用方映射为错误"""
+        balancer = EndpointBalancer(URLS[:2])
+
+        response, report = balancer.call(lambda url: _response(503), (ConnectionError,))
+
+        assert response.status_code == 503
+        assert report["attempts"] == 2
+
+    def test_other_exceptions_do_not_fail_over(self):
+        """测试非后端故障的异常直接抛出，不计入后端失败"""
+        balancer = EndpointBalancer(URLS)
+
+        with pytest.raises(KeyError):
+            balancer.call(Mock(side_effect=KeyError()), (ConnectionError,))
+        assert sum(e["requests"] for e in balancer.stats().values()) == 1
+        assert all(e["failures"] == 0 for e in balancer.stats().values())
+
+    def test_async_failover(self):
+        """测试异步版本的故障转移"""
+        balancer = EndpointBalancer(URLS[:2])
+
+        async def send(url):
+            if url == "http://a":
+                raise ConnectionError()
+            return _response(200)
+
+        with patch.object(balancer, "_score", side_effect=lambda e: e.url):
+            response, report = asyncio.run(balancer.call_async(send, (ConnectionError,)))
+
+        assert response.status_code == 200
+        assert report == {"endpoint": "http://b", "attempts": 2}
@@ -0,0 +1,111 @@
+"""
+转录结果缓存测试
+
+测试缓存键、命中统计、TTL 过期和 LRU 淘汰。
+"""
+
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from src.utils.cache import TranscriptionCache, cache_key, hash_file
+
+
+class TestCacheKey:
+    """测试缓存键"""
+
+    def test_hash_file_matches_content(self, tmp_path):
+        """测试相同内容的文件哈希相同，与文件名无关"""
+        (tmp_path / "a.wav").write_bytes(b"x" * 3_000_000)
+        (tmp_path / "b.wav").write_bytes(b"x" * 3_000_000)
+        (tmp_path / "c.wav").write_bytes(b"x" * 2_999_999 + b"y")
+
+        assert hash_file(tmp_path / "a.wav") == hash_file(tmp_path / "b.wav")
+        assert hash_file(tmp_path / "a.wav") != hash_file(tmp_path / "c.wav")
+
+    def test_key_depends_on_lang_and_backend(self):
+        """测试语言参数和后端地址不同时缓存键不同"""
+        base = cache_key("abc", "zh", "http://a")
+
+        assert base == cache_key("abc", "zh", "http://a")
+        assert base != cache_key("abc", "en", "http://a")
+        assert base != cache_key("abc", "zh", "http://b")
+
+
+class TestTranscriptionCache:
+    """测试磁盘缓存"""
+
+    def test_put_and_get(self, tmp_path):
+        """测试写入后命中，并统计命中/未命中次数"""
+        cache = TranscriptionCache(tmp_path)
+
+        assert cache.get("k1") is None
+        cache.put("k1", {"text": "你好"})
+
+        assert cache.get("k1") == {"text": "你好"}
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+    def test_persists_across_instances(self, tmp_path):
+        """测试缓存持久化在磁盘上，新的实例（新进程）也能命中"""
+        TranscriptionCache(tmp_path).put("k1", {"text": "hello"})
+
+        assert TranscriptionCache(tmp_path).get("k1") == {"text": "hello"}
+
+    def test_expired_entry_is_miss(self, tmp_path):
+        """测试超过 TTL 的记录视为未命中并被删除"""
+        cache = TranscriptionCache(tmp_path, ttl=0.05)
+        cache.put("k1", {"text": "old"})
+        time.sleep(0.1)
+
+        assert cache.get("k1") is None
+        assert not list(tmp_path.glob("*/*.json"))
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        """测试总大小超过上限时淘汰最久未访问的记录"""
+        cache = TranscriptionCache(tmp_path)
+        payload = {"text": "x" * 60}
+        for i, key in enumerate(["a1", "b2", "c3"]):
+            cache.put(key, payload)
+            # 上限设为 3.5 条记录的大小
+            cache.max_bytes = int((tmp_path / key[:2] / f"{key}.json").stat().st_size * 3.5)
+            # 人为拉开访问时间，a1 最旧
+            path = tmp_path / key[:2] / f"{key}.json"
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+        # 访问 a1 使其成为最近使用，随后写入 d4 触发淘汰
+        assert cache.get("a1") == payload
+        cache.put("d4", payload)
+
+        remaining = {p.stem for p in tmp_path.glob("*/*.json")}
+        assert "a1" in remaining
+        assert "d4" in remaining
+        assert "b2" not in remaining
+
+    def test_put_below_limit_does_not_rescan(self, tmp_path):
+        """测试总大小估计未超过上限时，写入不扫描整个缓存目录"""
+        cache = TranscriptionCache(tmp_path)
+        cache.put("a1", {"text": "first"})
+
+        with patch.object(Path, "glob", wraps=tmp_path.glob) as glob:
+            for i in range(20):
+                cache.put(f"k{i}", {"text": "x" * 60})
+                cache.put(f"k{i}", {"text": "y" * 60})
+
+        glob.assert_not_called()
+        total = sum(p.stat().st_size for p in tmp_path.glob("*/*.json"))
+        assert cache._estimated_bytes == total
+
+    def test_estimate_crossing_limit_triggers_eviction(self, tmp_path):
+        """测试增量估计超过上限时扫描并淘汰，估计值随之校正"""
+        cache = TranscriptionCache(tmp_path)
+        cache.put("a1", {"text": "x" * 60})
+        entry_bytes = (tmp_path / "a1" / "a1.json").stat().st_size
+        cache.max_bytes = entry_bytes * 2
+
+        for key in ["b2", "c3", "d4"]:
+            cache.put(key, {"text": "x" * 60})
+
+        total = sum(p.stat().st_size for p in tmp_path.glob("*/*.json"))
+        assert total <= cache.max_bytes
+        assert cache._estimated_bytes == total
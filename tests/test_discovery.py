@@ -0,0 +1,88 @@
+"""
+输入音频发现测试
+
+验证按文件头识别格式（与扩展名无关）以及扫描的惰性。
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.utils.discovery import detect_audio_format, iter_audio_files, sniff_audio_format
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+MP3_ID3_HEADER = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+# MPEG-1 Layer III，128 kbps，44.1 kHz 的帧头
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x64"
+
+
+class TestSniff:
+    """测试文件头识别"""
+
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            (WAV_HEADER, "wav"),
+            (MP3_ID3_HEADER, "mp3"),
+            (MP3_FRAME_HEADER, "mp3"),
+            # RIFF 容器但不是 WAVE（AVI）
+            (b"RIFF\x00\x00\x00\x00AVI ", None),
+            # ADTS AAC 也以 0xFFF 同步字开头，但 layer 字段为 00
+            (b"\xff\xf1\x50\x80", None),
+            # 比特率索引 1111 无效
+            (b"\xff\xfb\xf0\x64", None),
+            (b"RIFF", None),
+            (b"fLaC\x00\x00\x00\x22", None),
+            (b"", None),
+        ],
+    )
+    def test_sniff(self, header, expected):
+        """测试各种文件头的识别结果"""
+        assert sniff_audio_format(header) == expected
+
+    def test_unreadable_file(self, tmp_path):
+        """测试无法读取的文件返回 None"""
+        assert detect_audio_format(tmp_path / "missing.wav") is None
+
+
+class TestIterAudioFiles:
+    """测试目录扫描"""
+
+    def test_detects_by_content_not_suffix(self, tmp_path):
+        """测试扩展名不影响识别：无扩展名的 WAV 被找到，只有扩展名的文本被跳过"""
+        (tmp_path / "recording").write_bytes(WAV_HEADER + b"data")
+        (tmp_path / "SONG.Mp3").write_bytes(MP3_FRAME_HEADER + b"data")
+        (tmp_path / "fake.wav").write_text("not audio")
+        (tmp_path / "empty.mp3").write_bytes(b"")
+        (tmp_path / "sub.wav").mkdir()
+
+        assert sorted(path.name for path in iter_audio_files(tmp_path)) == ["SONG.Mp3", "recording"]
+
+    def test_is_lazy(self, tmp_path):
+        """测试只取第一个结果时不会读取其余文件的文件头"""
+        for i in range(50):
+            (tmp_path / f"{i:02d}.wav").write_bytes(WAV_HEADER)
+
+        with patch("src.utils.discovery.detect_audio_format", return_value="wav") as detect:
+            first = next(iter_audio_files(tmp_path))
+
+        assert detect.call_count == 1
+        assert first.parent == tmp_path
+
+    def test_missing_directory(self, tmp_path):
+        """测试目录不存在时抛出 FileNotFoundError"""
+        with pytest.raises(FileNotFoundError):
+            next(iter_audio_files(tmp_path / "missing"))
+
+    @pytest.mark.skipif(not hasattr(os, "symlink"), reason="需要符号链接")
+    def test_follows_file_symlinks(self, tmp_path):
+        """测试指向音频文件的符号链接也被识别"""
+        target = tmp_path / "target"
+        target.mkdir()
+        (target / "a.wav").write_bytes(WAV_HEADER)
+        inputs = tmp_path / "inputs"
+        inputs.mkdir()
+        os.symlink(target / "a.wav", inputs / "link.wav")
+
+        assert [path.name for path in iter_audio_files(inputs)] == ["link.wav"]
@@ -0,0 +1,124 @@
+"""
+FLAC 编码测试
+
+验证 CRC、STREAMINFO 和帧结构；安装了 soundfile 时用 libsndfile 解码，
+确认编码无损。
+"""
+
+import hashlib
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from src.utils.audio import read_wav_info
+from src.utils.flac import FLAC_BLOCK_SIZE, crc8, crc16, encode_flac
+
+
+def _wav_bytes(samples, sample_rate=16000, sample_width=2):
+    """将整数数组（单声道或 (n, channels)）封装为 WAV 字节"""
+    samples = np.asarray(samples)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as writer:
+        writer.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        writer.setsampwidth(sample_width)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def _encode(wav: bytes) -> bytes:
+    source = io.BytesIO(wav)
+    out = io.BytesIO()
+    written = encode_flac(source, read_wav_info(source), out)
+    assert written == len(out.getvalue())
+    return out.getvalue()
+
+
+def _speech(seconds, sample_rate=16000):
+    """带停顿的正弦波加少量噪声，模拟语音"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = np.sin(2 * np.pi * 0.5 * t) > 0
+    signal = 8000 * np.sin(2 * np.pi * 220 * t) * voiced + rng.standard_normal(len(t)) * 100
+    return signal.astype(np.int16)
+
+
+def _bitwise_crc(data, poly, width):
+    crc = 0
+    for byte in data:
+        crc ^= byte << (width - 8)
+        for _ in range(8):
+            crc = (crc << 1) ^ poly if crc & (1 << (width - 1)) else crc << 1
+            crc &= (1 << width) - 1
+    return crc
+
+
+class TestCRC:
+    """测试向量化 CRC 与逐位计算结果一致"""
+
+    @pytest.mark.parametrize("length", [0, 1, 63, 64, 65, 1000])
+    def test_crc16(self, length):
+        data = np.random.default_rng(length).integers(0, 256, length, dtype=np.uint8).tobytes()
+        assert crc16(data) == _bitwise_crc(data, 0x8005, 16)
+
+    def test_crc8(self):
+        data = bytes(range(50))
+        assert crc8(data) == _bitwise_crc(data, 0x07, 8)
+
+
+class TestEncodeFlac:
+    """测试 FLAC 编码"""
+
+    def test_streaminfo(self):
+        """测试 STREAMINFO 记录格式、总采样数和原始 PCM 的 MD5"""
+        samples = np.stack([_speech(1.0), _speech(1.0) // 2], axis=1)
+        flac = _encode(_wav_bytes(samples, sample_rate=44100))
+
+        assert flac[:4] == b"fLaC"
+        assert flac[4] == 0x80 and flac[7] == 34
+        info = flac[8:42]
+        assert int.from_bytes(info[0:2], "big") == FLAC_BLOCK_SIZE
+        packed = int.from_bytes(info[10:18], "big")
+        assert packed >> 44 == 44100
+        assert (packed >> 41) & 0x7 == 1
+        assert (packed >> 36) & 0x1F == 15
+        assert packed & ((1 << 36) - 1) == 16000
+        assert info[18:34] == hashlib.md5(samples.astype("<i2").tobytes()).digest()
+        # 第一帧紧跟在 STREAMINFO 之后
+        assert flac[42:44] == b"\xff\xf8"
+
+    def test_speech_is_compressed(self):
+        """测试语音压缩到原始大小的 70% 以下，静音只占几十字节"""
+        wav = _wav_bytes(_speech(5.0))
+        assert len(_encode(wav)) < 0.7 * len(wav)
+        assert len(_encode(_wav_bytes(np.zeros(16000, dtype=np.int16)))) < 100
+
+    def test_noise_falls_back_to_verbatim(self):
+        """测试无法压缩的白噪声以原样子帧编码，大小只比 PCM 多出帧头"""
+        noise = np.random.default_rng(1).integers(-32768, 32768, 10000).astype(np.int16)
+        assert len(_encode(_wav_bytes(noise))) < 20000 + 100
+
+    def test_unsupported_sample_width(self):
+        """测试 32 位 PCM 不受支持"""
+        source = io.BytesIO(_wav_bytes(np.zeros(100, dtype=np.int32), sample_width=4))
+        with pytest.raises(ValueError):
+            encode_flac(source, read_wav_info(source), io.BytesIO())
+
+    @pytest.mark.parametrize("samples, sample_width", [
+        (_speech(2.0), 2),
+        (np.stack([_speech(1.0), -_speech(1.0)], axis=1), 2),
+        (np.random.default_rng(2).integers(0, 256, 5000).astype(np.uint8), 1),
+        (np.array([7], dtype=np.int16), 2),
+    ])
+    def test_lossless_roundtrip(self, samples, sample_width):
+        """测试标准解码器（libsndfile）解码结果与原始 PCM 完全一致"""
+        soundfile = pytest.importorskip("soundfile")
+        wav = _wav_bytes(samples, sample_width=sample_width)
+
+        decoded, sample_rate = soundfile.read(io.BytesIO(_encode(wav)), dtype="int16", always_2d=True)
+        expected, _ = soundfile.read(io.BytesIO(wav), dtype="int16", always_2d=True)
+
+        assert sample_rate == 16000
+        assert np.array_equal(decoded, expected)
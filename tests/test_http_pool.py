@@ -0,0 +1,97 @@
+"""
+HTTP 连接池测试
+
+使用本地 HTTP/1.1 服务验证连接复用、空闲淘汰和多线程共享。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.http_pool import HTTPPool
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """支持 keep-alive 的最小 JSON 服务"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b'{"result": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    """启动本地 HTTP 服务"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/v1/asr"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHTTPPool:
+    """测试连接池复用统计"""
+
+    def test_sequential_requests_reuse_connection(self, server_url):
+        """测试顺序请求复用同一条连接"""
+        pool = HTTPPool(pool_size=2, idle_timeout=30)
+        try:
+            for _ in range(5):
+                response = pool.post(server_url, data={"lang": "zh"}, timeout=5)
+                assert response.status_code == 200
+        finally:
+            pool.close()
+
+        stats = pool.stats()
+        assert stats["requests"] == 5
+        assert stats["new_connections"] == 1
+        assert stats["reused_connections"] == 4
+        assert stats["reuse_ratio"] == 0.8
+
+    def test_idle_connections_are_evicted(self, server_url):
+        """测试空闲超时的连接被淘汰并重新建连"""
+        pool = HTTPPool(pool_size=1, idle_timeout=0.05)
+        try:
+            pool.post(server_url, data={}, timeout=5)
+            time.sleep(0.1)
+            pool.post(server_url, data={}, timeout=5)
+        finally:
+            pool.close()
+
+        stats = pool.stats()
+        assert stats["idle_evictions"] == 1
+        assert stats["new_connections"] == 2
+        assert stats["reused_connections"] == 0
+
+    def test_pool_is_shared_across_threads(self, server_url):
+        """测试多个线程共享连接池，连接数不超过池大小"""
+        pool = HTTPPool(pool_size=4, idle_timeout=30)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                codes = list(executor.map(
+                    lambda _: pool.post(server_url, data={}, timeout=5).status_code,
+                    range(40),
+                ))
+        finally:
+            pool.close()
+
+        assert codes == [200] * 40
+        stats = pool.stats()
+        assert stats["requests"] == 40
+        assert stats["new_connections"] <= 4
+        assert stats["reused_connections"] >= 36
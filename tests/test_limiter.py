@@ -0,0 +1,120 @@
+"""
+自适应并发限制测试
+
+验证 AIMD 的加性增加（只在并发用满时）、过载和耗时超过同组基线时的乘性减小、每轮只减一次、
+上下界，以及同步和异步等待者在名额空出时被唤醒。
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.limiter import AdaptiveLimiter
+
+
+def _round_trip(limiter, count, latency=0.1, overload=None):
+    """同时取得 count 个名额，再以相同的结果全部归还"""
+    tokens = [limiter.acquire(0) for _ in range(count)]
+    for token in tokens:
+        limiter.release(token, latency, overload)
+
+
+def test_increase_only_when_saturated():
+    """测试并发用满时每 limit 个成功请求加 1，用不满时不增加"""
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=5)
+    _round_trip(limiter, 2)
+    _round_trip(limiter, 2)
+    assert limiter.limit == 4
+
+    _round_trip(limiter, 4)
+    assert limiter.limit == 5
+    _round_trip(limiter, 5)
+    assert limiter.limit == 5
+    assert [change["reason"] for change in limiter.changes()] == ["increase"]
+
+
+def test_overload_decreases_once_per_round():
+    """测试过载时上限减半，减小之前已在途的请求不再触发减小"""
+    changes = []
+    limiter = AdaptiveLimiter(initial_limit=8, on_change=changes.append)
+    _round_trip(limiter, 8, overload="HTTP 503")
+    assert limiter.limit == 4
+
+    _round_trip(limiter, 4, overload="HTTP 429")
+    assert limiter.limit == 2
+    assert [(c["previous"], c["limit"], c["reason"]) for c in changes] == [(8, 4, "HTTP 503"), (4, 2, "HTTP 429")]
+    assert limiter.changes(since=1) == changes[1:]
+    assert limiter.report(since=2) == {"limit": 2, "in_flight": 0, "min_limit": 1, "max_limit": 64, "changes": []}
+
+
+def test_latency_above_baseline_decreases():
+    """测试耗时超过最近样本中位数的 tolerance 倍视为过载，个别特别快的样本不会拉低基线"""
+    limiter = AdaptiveLimiter(initial_limit=4, tolerance=2.0)
+    for latency in (0.1, 0.15, 0.001, 0.1, 0.15):
+        _round_trip(limiter, 1, latency=latency)
+    _round_trip(limiter, 1, latency=0.15)
+    assert limiter.limit == 4
+
+    _round_trip(limiter, 1, latency=0.5)
+    assert limiter.limit == 2
+    assert limiter.changes()[-1]["reason"] == "latency"
+
+
+def test_groups_have_separate_baselines():
+    """测试小请求和大请求交替时各自与同组的基线比较，不作为样本的耗时不影响基线，上限不减小"""
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=4, tolerance=2.0)
+    for _ in range(20):
+        for latency, group in ((0.01, "small"), (0.001, None), (0.1, "large"), (0.12, "large"), (0.012, "small")):
+            token = limiter.acquire(0)
+            limiter.release(token, latency, group=group)
+    assert limiter.limit == 4
+    assert limiter.changes() == []
+
+
+def test_limits_are_clamped():
+    """测试上限不低于 min_limit，初始值超出范围时被截断"""
+    limiter = AdaptiveLimiter(initial_limit=100, min_limit=2, max_limit=3)
+    assert limiter.limit == 3
+    for _ in range(3):
+        _round_trip(limiter, limiter.limit, overload="timeout")
+    assert limiter.limit == 2
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(min_limit=0)
+
+
+def test_acquire_waits_for_free_slot():
+    """测试没有名额时同步等待者超时，名额空出后被唤醒"""
+    limiter = AdaptiveLimiter(initial_limit=1)
+    token = limiter.acquire()
+    with pytest.raises(TimeoutError):
+        limiter.acquire(0.05)
+
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(limiter.acquire(5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert acquired == []
+    limiter.release(token, 0.1)
+    waiter.join(5)
+    assert acquired == [0]
+    assert limiter.in_flight == 1
+
+
+def test_async_waiters_are_woken():
+    """测试异步等待者在名额空出时被唤醒，取消的等待者不占用名额"""
+    limiter = AdaptiveLimiter(initial_limit=1)
+
+    async def run():
+        token = await limiter.acquire_async()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire_async(), 0.05)
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        limiter.release(token, 0.1)
+        await asyncio.wait_for(waiter, 5)
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
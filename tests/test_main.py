@@ -4,13 +4,52 @@ ASR 预制件核心函数测试
 测试语音识别功能，确保函数按预期工作。
 """
 
+import asyncio
+import json
+import numpy as np
 import pytest
 from pathlib import Path
 import tempfile
+import threading
+import time
 import shutil
 import os
-from unittest.mock import Mock, patch
-from src.main import audio_to_text
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, Mock, patch
+from src.main import (
+    _ASYNC_HTTP_POOL, _RetryPolicy, audio_to_text, audio_to_text_async, audio_to_text_batch, audio_to_text_stream
+)
+from src.utils.async_http import HTTPConnectionError, HTTPTimeout
+from src.utils.balancer import EndpointBalancer
+
+
+def _fake_wav(payload: bytes) -> bytes:
+    """带 RIFF/WAVE 文件头、内容无法解析的 WAV（按格式识别为音频，整体上传）"""
+    return b"RIFF\x00\x00\x00\x00WAVE" + payload
+
+
+def _fake_mp3(payload: bytes) -> bytes:
+    """带 ID3 标签头的 MP3"""
+    return b"ID3\x04\x00\x00\x00\x00\x00\x00" + payload
+
+
+def _write_speech_wav(path, bursts, tone_seconds=0.6, gap_seconds=0.4, sample_rate=16000):
+    """写入由正弦波"语音"和静音停顿交替组成的 16 位单声道 WAV"""
+    t = np.arange(int(tone_seconds * sample_rate)) / sample_rate
+    tone = (0.5 * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.int16)
+    parts = []
+    for i in range(bursts):
+        parts.append(tone)
+        if i < bursts - 1:
+            parts.append(gap)
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(np.concatenate(parts).tobytes())
 
 
 class TestASRFunction:
@@ -43,7 +82,7 @@ class TestASRFunction:
 
         # 创建模拟音频文件（空文件，仅用于测试文件扫描）
         audio_file = inputs_dir / "test.wav"
-        audio_file.write_bytes(b"fake audio data")
+        audio_file.write_bytes(_fake_wav(b"fake audio data"))
 
         return workspace
 
@@ -77,7 +116,24 @@ class TestASRFunction:
         assert result["error"]["code"] == "NO_AUDIO_FILES"
         assert "未找到音频文件" in result["error"]["message"]
 
-    @patch('src.main.requests.post')
+    def test_audio_to_text_detects_format_by_content(self, workspace):
+        """测试按文件头识别格式：扩展名为 .wav 的文本文件被跳过，无扩展名的 WAV 被转录"""
+        inputs_dir = workspace / "data" / "inputs" / "input"
+        (inputs_dir / "notes.wav").write_text("not audio")
+        assert audio_to_text()["error"]["code"] == "NO_AUDIO_FILES"
+
+        (inputs_dir / "recording").write_bytes(_fake_wav(b"audio"))
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"result": [{"text": "hi", "clean_text": "hi"}]}
+            mock_post.return_value = mock_response
+
+            result = audio_to_text()
+
+        assert result["filename"] == "recording"
+
+    @patch('src.main._HTTP_POOL.post')
     def test_audio_to_text_success(self, mock_post, workspace_with_audio):
         """测试成功转录（模拟 API 响应）"""
         # 模拟 ASR API 响应
@@ -103,7 +159,44 @@ class TestASRFunction:
         assert result["filename"] == "test.wav"
         assert result["language"] == "zh"
 
-    @patch('src.main.requests.post')
+    @patch('src.main._HTTP_POOL.post')
+    def test_audio_to_text_backend_timestamps(self, mock_post, workspace_with_audio):
+        """测试后端返回词级时间戳时结果带列式 timestamps，文本下标指向 text"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "result": [{"text": "测试", "clean_text": "测试", "timestamp": [[30, 250], [250, 610]]}]
+        }
+        mock_post.return_value = mock_response
+
+        result = audio_to_text(lang="zh")
+
+        assert result["timestamps"] == {
+            "unit": "ms",
+            "source": "backend",
+            "segments": {"start": [30], "end": [610], "text_offset": [0]},
+            "words": {"start": [30, 250], "end": [250, 610], "text_offset": [0, 1], "length": [1, 1]},
+        }
+
+    @patch('src.main._HTTP_POOL.post')
+    def test_audio_to_text_parses_raw_text_tags(self, mock_post, workspace_with_audio):
+        """测试 raw_text 的标记解析为按段的语言、情感和事件，缺少 clean_text 时在本地得出"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "result": [{"raw_text": "<|zh|><|NEUTRAL|><|Speech|><|woitn|>你好<|en|><|HAPPY|><|Laughter|><|woitn|>ha ha"}]
+        }
+        mock_post.return_value = mock_response
+
+        result = audio_to_text()
+
+        assert result["clean_text"] == result["text"] == "你好ha ha"
+        assert result["tags"] == [
+            {"language": "zh", "emotion": "NEUTRAL", "event": "Speech", "text": "你好"},
+            {"language": "en", "emotion": "HAPPY", "event": "Laughter", "text": "ha ha"},
+        ]
+
+    @patch('src.main._HTTP_POOL.post')
     def test_audio_to_text_api_error(self, mock_post, workspace_with_audio):
         """测试 API 返回错误状态码"""
         mock_response = Mock()
@@ -114,10 +207,10 @@ class TestASRFunction:
         result = audio_to_text()
 
         assert "error" in result
-        assert result["error"]["code"] == "ASR_API_ERROR"
+        assert result["error"]["code"] == "ASR_API_ERROR", result
         assert "HTTP 500" in result["error"]["message"]
 
-    @patch('src.main.requests.post')
+    @patch('src.main._HTTP_POOL.post')
     def test_audio_to_text_timeout(self, mock_post, workspace_with_audio):
         """测试请求超时"""
         import requests
@@ -129,7 +222,7 @@ class TestASRFunction:
         assert result["error"]["code"] == "TIMEOUT"
         assert "超时" in result["error"]["message"]
 
-    @patch('src.main.requests.post')
+    @patch('src.main._HTTP_POOL.post')
     def test_audio_to_text_connection_error(self, mock_post, workspace_with_audio):
         """测试连接错误"""
         import requests
@@ -141,7 +234,7 @@ class TestASRFunction:
         assert result["error"]["code"] == "CONNECTION_ERROR"
         assert "无法连接" in result["error"]["message"]
 
-    @patch('src.main.requests.post')
+    @patch('src.main._HTTP_POOL.post')
     def test_audio_to_text_parse_error(self, mock_post, workspace_with_audio):
         """测试响应解析错误"""
         mock_response = Mock()
@@ -160,11 +253,11 @@ class TestASRFunction:
         inputs_dir = workspace / "data" / "inputs" / "input"
 
         # 创建多个模拟音频文件
-        (inputs_dir / "audio1.wav").write_bytes(b"fake audio 1")
-        (inputs_dir / "audio2.mp3").write_bytes(b"fake audio 2")
-        (inputs_dir / "audio3.WAV").write_bytes(b"fake audio 3")
+        (inputs_dir / "audio1.wav").write_bytes(_fake_wav(b"fake audio 1"))
+        (inputs_dir / "audio2.mp3").write_bytes(_fake_mp3(b"fake audio 2"))
+        (inputs_dir / "audio3.WAV").write_bytes(_fake_wav(b"fake audio 3"))
 
-        with patch('src.main.requests.post') as mock_post:
+        with patch('src.main._HTTP_POOL.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {
@@ -189,7 +282,7 @@ class TestASRFunction:
         """测试所有支持的语言参数"""
         valid_languages = ["auto", "zh", "en", "yue", "ja", "ko", "nospeech"]
 
-        with patch('src.main.requests.post') as mock_post:
+        with patch('src.main._HTTP_POOL.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {
@@ -201,3 +294,1234 @@ class TestASRFunction:
                 result = audio_to_text(lang=lang)
                 assert "error" not in result
                 assert result["language"] == lang
+
+    def test_audio_to_text_long_wav_is_chunked(self, workspace):
+        """测试长 WAV 在静音处切片并发转录，结果按顺序拼接且格式不变"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "long.wav", bursts=3)
+
+        def fake_post(url, data, headers, timeout):
+            index = int(data.filename.rsplit("_", 1)[1].split(".")[0])
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {
+                "result": [{"text": f"part{index}", "clean_text": f"part{index}", "raw_text": f"<|en|>part{index}"}]
+            }
+            return response
+
+        with patch('src.main.ASR_CHUNK_MIN_DURATION', 1.0), \
+                patch('src.main.ASR_CHUNK_SECONDS', 1.2), \
+                patch('src.main._HTTP_POOL.post', side_effect=fake_post) as mock_post:
+            result = audio_to_text(lang="en")
+
+        assert mock_post.call_count == 3
+        segments = result.pop("metadata")["segments"]
+        assert [(seg["index"], seg["text"]) for seg in segments] == [(0, "part0"), (1, "part1"), (2, "part2")]
+        assert segments[0]["start"] == 0.0
+        assert all(seg["start"] < seg["end"] for seg in segments)
+        assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
+        timestamps = result.pop("timestamps")
+        assert timestamps["source"] == "chunks"
+        assert timestamps["segments"] == {
+            "start": [round(seg["start"] * 1000) for seg in segments],
+            "end": [round(seg["end"] * 1000) for seg in segments],
+            "text_offset": [0, 6, 12],
+        }
+        assert "words" not in timestamps
+        tags = result.pop("tags")
+        assert [(tag["language"], tag["text"]) for tag in tags] == [("en", "part0"), ("en", "part1"), ("en", "part2")]
+        assert result == {
+            "text": "part0 part1 part2",
+            "filename": "long.wav",
+            "language": "en",
+            "raw_text": "<|en|>part0<|en|>part1<|en|>part2",
+            "clean_text": "part0 part1 part2"
+        }
+
+    def test_audio_to_text_cache_hit_skips_backend(self, workspace_with_audio):
+        """测试相同内容和语言的第二次调用命中缓存，不再请求 ASR 服务"""
+        inputs_dir = workspace_with_audio / "data" / "inputs" / "input"
+
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {
+                "result": [{"text": "缓存测试", "clean_text": "缓存测试", "raw_text": "<|zh|>缓存测试"}]
+            }
+            mock_post.return_value = mock_response
+
+            first = audio_to_text(lang="zh")
+            # 同一内容换个文件名重新上传
+            (inputs_dir / "test.wav").rename(inputs_dir / "retry.wav")
+            second = audio_to_text(lang="zh")
+            third = audio_to_text(lang="en")
+
+        assert mock_post.call_count == 2
+        assert first["metadata"]["cache"] == {"hit": False, "hits": 0, "misses": 1}
+        assert second["metadata"]["cache"] == {"hit": True, "hits": 1, "misses": 1}
+        assert second["text"] == "缓存测试"
+        assert second["filename"] == "retry.wav"
+        assert third["metadata"]["cache"]["hit"] is False
+
+    def test_audio_to_text_errors_are_not_cached(self, workspace_with_audio):
+        """测试失败的结果不会写入缓存"""
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 503
+            mock_response.text = "Service Unavailable"
+            mock_post.return_value = mock_response
+
+            audio_to_text()
+            audio_to_text()
+
+        assert mock_post.call_count == 2
+
+    def test_audio_to_text_normalize_audio(self, workspace):
+        """测试开启 normalize_audio 后，48kHz 立体声 WAV 以 16kHz 单声道上传"""
+        path = workspace / "data" / "inputs" / "input" / "stereo.wav"
+        t = np.arange(48000) / 48000
+        tone = (0.5 * 32767 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+        with wave.open(str(path), "wb") as writer:
+            writer.setnchannels(2)
+            writer.setsampwidth(2)
+            writer.setframerate(48000)
+            writer.writeframes(np.stack([tone, tone], axis=1).tobytes())
+
+        uploads = []
+
+        def fake_post(url, data, headers, timeout):
+            uploads.append((data.filename, data.file_size))
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"result": [{"text": "ok", "clean_text": "ok", "raw_text": "ok"}]}
+            return response
+
+        with patch('src.main._HTTP_POOL.post', side_effect=fake_post):
+            plain = audio_to_text()
+            normalized = audio_to_text(normalize_audio=True)
+
+        original_size = path.stat().st_size
+        assert uploads[0] == ("stereo.wav", original_size)
+        assert uploads[1][0] == "stereo.wav"
+        assert uploads[1][1] == 44 + 16000 * 2
+        assert "normalization" not in plain["metadata"]
+        assert normalized["metadata"]["cache"]["hit"] is False
+        report = normalized["metadata"]["normalization"]
+        assert report["applied"] is True
+        assert report["original_format"] == "48000Hz/2ch/16bit"
+        assert report["bytes_saved"] == original_size - uploads[1][1]
+
+    def test_audio_to_text_compress_upload(self, workspace):
+        """测试开启 compress_upload 后以 FLAC 上传，并记录压缩前后的字节数"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "speech.wav", bursts=3)
+        uploads = []
+
+        def fake_post(url, data, headers, timeout):
+            uploads.append((data.filename, data.file_size, data.read()))
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"result": [{"text": "ok", "clean_text": "ok", "raw_text": "ok"}]}
+            return response
+
+        with patch('src.main._HTTP_POOL.post', side_effect=fake_post):
+            result = audio_to_text(compress_upload=True)
+
+        assert len(uploads) == 1
+        filename, size, body = uploads[0]
+        assert filename == "speech.flac"
+        assert b"Content-Type: audio/flac" in body and b"fLaC" in body
+        assert result["filename"] == "speech.wav"
+        upload = result["metadata"]["upload"]
+        assert upload["codec"] == "flac"
+        assert upload["wire_bytes"] == size
+        assert size < upload["original_bytes"] / 2
+
+    def test_audio_to_text_compress_upload_fallback(self, workspace):
+        """测试 ASR 服务拒绝 FLAC 时以原始 WAV 重传，之后的调用不再尝试 FLAC"""
+        path = workspace / "data" / "inputs" / "input" / "speech.wav"
+        _write_speech_wav(path, bursts=2)
+        uploads = []
+
+        def fake_post(url, data, headers, timeout):
+            uploads.append(data.filename)
+            response = Mock()
+            if data.filename.endswith(".flac"):
+                response.status_code = 415
+                response.text = "Unsupported Media Type"
+            else:
+                response.status_code = 200
+                response.json.return_value = {"result": [{"text": "ok", "clean_text": "ok", "raw_text": "ok"}]}
+            return response
+
+        with patch('src.main._HTTP_POOL.post', side_effect=fake_post), \
+                patch('src.main._CACHE', None):
+            first = audio_to_text(compress_upload=True)
+            second = audio_to_text(compress_upload=True)
+
+        assert uploads == ["speech.flac", "speech.wav", "speech.wav"]
+        assert first["text"] == "ok"
+        assert first["metadata"]["upload"]["codec"] == "wav"
+        assert first["metadata"]["upload"]["wire_bytes"] == path.stat().st_size
+        assert "415" in first["metadata"]["upload"]["reason"]
+        assert second["metadata"]["upload"]["codec"] == "wav"
+
+    def test_audio_to_text_fails_over_to_healthy_endpoint(self, workspace_with_audio):
+        """测试多个后端时，连接失败的后端被跳过，结果记录实际使用的后端"""
+        import requests
+        urls = ["http://asr-a/api/v1/asr", "http://asr-b/api/v1/asr"]
+        calls = []
+
+        def fake_post(url, data, headers, timeout):
+            calls.append(url)
+            if url == urls[0]:
+                raise requests.exceptions.ConnectionError()
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"result": [{"text": "ok", "clean_text": "ok", "raw_text": "ok"}]}
+            return response
+
+        with patch('src.main._BALANCER', EndpointBalancer(urls)), \
+                patch('src.main._HTTP_POOL.post', side_effect=fake_post):
+            result = audio_to_text()
+
+        assert result["text"] == "ok"
+        assert calls == urls
+        assert result["metadata"]["backend"] == {"endpoint": urls[1], "attempts": 2, "retries": 0}
+
+    @staticmethod
+    def _status_response(status_code, headers=None):
+        response = Mock()
+        response.status_code = status_code
+        response.headers = headers or {}
+        response.text = "error"
+        response.json.return_value = {"result": [{"text": "ok", "clean_text": "ok", "raw_text": "ok"}]}
+        return response
+
+    def test_audio_to_text_retries_transient_errors(self, workspace_with_audio):
+        """测试 503 和连接重置按退避策略重试，结果记录请求数和重试次数"""
+        import requests
+        outcomes = [
+            self._status_response(503), requests.exceptions.ConnectionError(), self._status_response(200)
+        ]
+
+        with patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=3, backoff_base=0)), \
+                patch('src.main._HTTP_POOL.post', side_effect=outcomes) as mock_post:
+            result = audio_to_text()
+
+        assert result["text"] == "ok"
+        assert mock_post.call_count == 3
+        assert result["metadata"]["backend"]["attempts"] == 3
+        assert result["metadata"]["backend"]["retries"] == 2
+
+    def test_audio_to_text_fatal_status_is_not_retried(self, workspace_with_audio):
+        """测试确定性错误（如 400）直接返回，不重试"""
+        with patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=3, backoff_base=0)), \
+                patch('src.main._HTTP_POOL.post', return_value=self._status_response(400)) as mock_post:
+            result = audio_to_text()
+
+        assert mock_post.call_count == 1
+        assert result["error"]["code"] == "ASR_API_ERROR"
+        assert result["error"]["attempts"] == 1
+        assert result["error"]["retries"] == 0
+
+    def test_audio_to_text_retries_exhausted(self, workspace_with_audio):
+        """测试重试次数用尽后返回最后一次的错误"""
+        import requests
+        with patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=3, backoff_base=0)), \
+                patch('src.main._HTTP_POOL.post', side_effect=requests.exceptions.ConnectionError()):
+            result = audio_to_text()
+
+        assert result["error"]["code"] == "CONNECTION_ERROR"
+        assert result["error"]["attempts"] == 3
+        assert result["error"]["retries"] == 2
+
+    def test_audio_to_text_retry_respects_deadline(self, workspace_with_audio):
+        """测试 Retry-After 超过剩余截止时间时不再重试，每次请求的超时取剩余时间"""
+        response = self._status_response(503, headers={"retry-after": "30"})
+        with patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=5, backoff_base=0, deadline=10)), \
+                patch('src.main._HTTP_POOL.post', return_value=response) as mock_post:
+            result = audio_to_text()
+
+        assert mock_post.call_count == 1
+        assert 0 < mock_post.call_args.kwargs["timeout"] <= 10
+        assert result["error"]["code"] == "ASR_API_ERROR"
+
+
+class TestASRBatchFunction:
+    """测试批量音频转文字功能"""
+
+    @pytest.fixture
+    def workspace(self):
+        """创建包含多个音频文件的临时工作空间"""
+        temp_dir = tempfile.mkdtemp()
+        workspace_path = Path(temp_dir)
+
+        inputs_dir = workspace_path / "data" / "inputs" / "input"
+        inputs_dir.mkdir(parents=True)
+        (inputs_dir / "a.wav").write_bytes(_fake_wav(b"fake audio a"))
+        (inputs_dir / "b.mp3").write_bytes(_fake_mp3(b"fake audio b"))
+        (inputs_dir / "c.WAV").write_bytes(_fake_wav(b"fake audio c"))
+        (inputs_dir / "notes.txt").write_text("not audio")
+
+        original_cwd = os.getcwd()
+        os.chdir(workspace_path)
+
+        yield workspace_path
+
+        os.chdir(original_cwd)
+        shutil.rmtree(temp_dir)
+
+    @staticmethod
+    def _fake_post(url, data, headers, timeout):
+        """根据上传的文件名模拟 ASR 响应，b.mp3 返回服务错误"""
+        filename = data.filename
+        response = Mock()
+        if filename == "b.mp3":
+            response.status_code = 503
+            response.text = "Service Unavailable"
+            return response
+        response.status_code = 200
+        response.json.return_value = {
+            "result": [{"key": filename, "text": filename, "clean_text": filename}]
+        }
+        return response
+
+    def test_batch_transcribes_all_files(self, workspace):
+        """测试批量处理所有音频文件，并按文件名返回结果"""
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post) as mock_post:
+            result = audio_to_text_batch(lang="zh", max_workers=2)
+
+        assert "error" not in result
+        assert mock_post.call_count == 3
+        assert list(result["results"]) == ["a.wav", "b.mp3", "c.WAV"]
+        assert result["total_files"] == 3
+        assert result["succeeded"] == 2
+        assert result["failed"] == 1
+        assert result["language"] == "zh"
+        assert result["results"]["a.wav"]["text"] == "a.wav"
+        assert result["results"]["c.WAV"]["language"] == "zh"
+        assert result["results"]["b.mp3"]["error"]["code"] == "ASR_API_ERROR"
+
+    def test_batch_coalesces_identical_files(self, workspace):
+        """测试内容相同的文件只向 ASR 服务请求一次，结果使用各自的文件名"""
+        inputs_dir = workspace / "data" / "inputs" / "input"
+        (inputs_dir / "copy.wav").write_bytes((inputs_dir / "a.wav").read_bytes())
+        release = threading.Event()
+
+        def slow_post(url, data, headers, timeout):
+            release.wait(5)
+            return self._fake_post(url, data, headers, timeout)
+
+        with patch('src.main._HTTP_POOL.post', side_effect=slow_post) as mock_post:
+            timer = threading.Timer(0.3, release.set)
+            timer.start()
+            result = audio_to_text_batch(lang="zh", max_workers=4)
+            timer.cancel()
+
+        assert mock_post.call_count == 3
+        uploaded = sorted(call.kwargs["data"].filename for call in mock_post.call_args_list)
+        assert uploaded.count("a.wav") + uploaded.count("copy.wav") == 1
+        assert result["results"]["a.wav"]["text"] == result["results"]["copy.wav"]["text"]
+        shared = [name for name in ("a.wav", "copy.wav") if "coalesced" in result["results"][name].get("metadata", {})]
+        assert len(shared) == 1
+        assert result["results"][shared[0]]["filename"] == shared[0]
+        assert result["results"][shared[0]]["metadata"]["coalesced"] == {"shared_with": "thread"}
+
+    def test_batch_invalid_max_workers(self, workspace):
+        """测试无效的并发数"""
+        result = audio_to_text_batch(max_workers=0)
+
+        assert "error" in result
+        assert result["error"]["code"] == "INVALID_PARAMETER"
+
+    def test_batch_invalid_language(self, workspace):
+        """测试无效的语言参数"""
+        result = audio_to_text_batch(lang="invalid_lang")
+
+        assert result["error"]["code"] == "INVALID_LANGUAGE"
+
+    def test_batch_no_audio_files(self, workspace):
+        """测试目录中没有音频文件"""
+        for f in (workspace / "data" / "inputs" / "input").glob("*.*"):
+            if f.suffix != ".txt":
+                f.unlink()
+
+        result = audio_to_text_batch()
+
+        assert result["error"]["code"] == "NO_AUDIO_FILES"
+
+
+class TestASRStreamFunction:
+    """测试流式音频转文字功能"""
+
+    @pytest.fixture
+    def workspace(self):
+        """创建包含 3.6 秒 16kHz 单声道 WAV 的临时工作空间（4 段语音，中间 0.4 秒停顿）"""
+        temp_dir = tempfile.mkdtemp()
+        workspace_path = Path(temp_dir)
+
+        inputs_dir = workspace_path / "data" / "inputs" / "input"
+        inputs_dir.mkdir(parents=True)
+        _write_speech_wav(inputs_dir / "call.wav", bursts=4)
+
+        original_cwd = os.getcwd()
+        os.chdir(workspace_path)
+
+        yield workspace_path
+
+        os.chdir(original_cwd)
+        shutil.rmtree(temp_dir)
+
+    @staticmethod
+    def _fake_post(url, data, headers, timeout):
+        """按片段文件名返回文本，例如 call_0002.wav -> "第2段" """
+        filename = data.filename
+        index = int(filename.rsplit("_", 1)[1].split(".")[0])
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {
+            "result": [{
+                "key": filename,
+                "text": f"第{index}段",
+                "clean_text": f"第{index}段",
+                "raw_text": f"<|zh|>第{index}段"
+            }]
+        }
+        return response
+
+    def test_stream_emits_segments_in_order(self, workspace):
+        """测试按顺序输出 start/content/progress/done 事件"""
+        with patch('src.main.ASR_STREAM_SEGMENT_SECONDS', 1.2), \
+                patch('src.main._HTTP_POOL.post', side_effect=self._fake_post) as mock_post:
+            events = list(audio_to_text_stream(lang="zh"))
+
+        assert mock_post.call_count == 4
+        assert events[0]["type"] == "start"
+        assert events[0]["data"]["total_segments"] == 4
+        assert events[0]["data"]["duration"] == 3.6
+
+        contents = [e["data"] for e in events if e["type"] == "content"]
+        assert contents == ["第0段", "第1段", "第2段", "第3段"]
+
+        progress = [e["data"] for e in events if e["type"] == "progress"]
+        assert [p["current"] for p in progress] == [1, 2, 3, 4]
+        assert progress[-1]["percentage"] == 100
+        # 切分点落在语音之间的停顿里
+        for k, p in enumerate(progress[1:]):
+            assert k + 0.6 < p["segment"]["start"] < k + 1.0
+        assert progress[3]["segment"]["end"] == 3.6
+
+        done = events[-1]
+        assert done["type"] == "done"
+        assert done["data"]["text"] == "第0段第1段第2段第3段"
+        assert done["data"]["raw_text"] == "<|zh|>第0段<|zh|>第1段<|zh|>第2段<|zh|>第3段"
+        assert done["data"]["filename"] == "call.wav"
+        assert done["data"]["segments"] == 4
+
+    def test_stream_non_wav_is_single_segment(self, workspace):
+        """测试无法本地切分的格式作为一个整体转录"""
+        inputs_dir = workspace / "data" / "inputs" / "input"
+        (inputs_dir / "call.wav").unlink()
+        (inputs_dir / "call.mp3").write_bytes(_fake_mp3(b"fake mp3 data"))
+
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"result": [{"text": "hello", "clean_text": "hello"}]}
+            mock_post.return_value = mock_response
+
+            events = list(audio_to_text_stream())
+
+        assert [e["type"] for e in events] == ["start", "content", "progress", "done"]
+        assert events[0]["data"]["total_segments"] == 1
+        assert events[-1]["data"]["text"] == "hello"
+
+    def test_stream_api_error(self, workspace):
+        """测试片段转录失败时输出 error 事件"""
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 500
+            mock_response.text = "Internal Server Error"
+            mock_post.return_value = mock_response
+
+            events = list(audio_to_text_stream())
+
+        assert events[-1]["type"] == "error"
+        assert events[-1]["error_code"] == "ASR_API_ERROR"
+
+    def test_stream_invalid_language(self, workspace):
+        """测试无效语言参数"""
+        events = list(audio_to_text_stream(lang="invalid_lang"))
+
+        assert len(events) == 1
+        assert events[0]["type"] == "error"
+        assert events[0]["error_code"] == "INVALID_LANGUAGE"
+
+
+class _FakeASRHandler(BaseHTTPRequestHandler):
+    """
+    模拟 ASR 服务：返回上传文件名和请求体大小；文件名含 fail 时返回 503
+
+    子类可以设置 statuses（先依次返回的错误状态码）和 reject_flac（以 415 拒绝 FLAC），
+    每个请求的 (文件名, 音频字节数) 记录在 received 中。
+    """
+
+    protocol_version = "HTTP/1.1"
+    statuses: list = []
+    reject_flac = False
+    received: list = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        filename = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode()
+        audio = body.split(b'filename="', 1)[1].split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n--", 1)[0]
+        self.received.append((filename, len(audio)))
+        if self.statuses:
+            self.send_response(self.statuses.pop(0))
+            payload = b"Service Unavailable"
+        elif "fail" in filename:
+            self.send_response(503)
+            payload = b"Service Unavailable"
+        elif self.reject_flac and filename.endswith(".flac"):
+            self.send_response(415)
+            payload = b"Unsupported Media Type"
+        else:
+            self.send_response(200)
+            text = filename.rsplit(".", 1)[0]
+            payload = json.dumps({"result": [{"text": text, "clean_text": text, "raw_text": f"<|zh|>{text}"}]}).encode()
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_asr_servers():
+    """
+    按需启动本地模拟 ASR 服务的工厂
+
+    start(**behaviour) 返回 (地址, received 列表)，测试结束后关闭所有服务。
+    """
+    servers = []
+
+    def start(**behaviour):
+        handler = type("Handler", (_FakeASRHandler,), {"received": [], **behaviour})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/api/v1/asr", handler.received
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestASRAsyncFunction:
+    """测试 asyncio 版本的音频转文字功能"""
+
+    @pytest.fixture
+    def workspace(self):
+        """创建临时工作空间，并启动本地模拟 ASR 服务"""
+        temp_dir = tempfile.mkdtemp()
+        workspace_path = Path(temp_dir)
+        (workspace_path / "data" / "inputs" / "input").mkdir(parents=True)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeASRHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        original_cwd = os.getcwd()
+        os.chdir(workspace_path)
+
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/asr"
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            yield workspace_path
+
+        os.chdir(original_cwd)
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(temp_dir)
+
+    def test_async_success(self, workspace):
+        """测试异步版本的返回格式与同步版本相同，并可以同时发起大量调用"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "meeting.wav", bursts=2)
+
+        async def run():
+            return await asyncio.gather(*(audio_to_text_async(lang="zh") for _ in range(20)))
+
+        results = asyncio.run(run())
+
+        for result in results:
+            assert result["text"] == "meeting"
+            assert result["filename"] == "meeting.wav"
+            assert result["language"] == "zh"
+            assert result["raw_text"] == "<|zh|>meeting"
+
+    def test_async_long_wav_is_chunked_and_compressed(self, workspace):
+        """测试长 WAV 切片并发上传、FLAC 压缩，结果按顺序拼接"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "long.wav", bursts=3)
+
+        with patch('src.main.ASR_CHUNK_MIN_DURATION', 1.0), patch('src.main.ASR_CHUNK_SECONDS', 1.2):
+            result = asyncio.run(audio_to_text_async(lang="zh", compress_upload=True))
+
+        assert result["text"] == "long_0000 long_0001 long_0002"
+        assert [seg["index"] for seg in result["metadata"]["segments"]] == [0, 1, 2]
+        assert result["metadata"]["upload"]["codec"] == "flac"
+        assert result["metadata"]["upload"]["segments"] == 3
+
+    def test_async_api_error(self, workspace):
+        """测试服务返回非 200 时的错误代码与同步版本相同"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "fail.wav", bursts=1)
+
+        result = asyncio.run(audio_to_text_async())
+
+        assert result["error"]["code"] == "ASR_API_ERROR", result
+        assert "503" in result["error"]["message"]
+
+    def test_async_timeout(self, workspace):
+        """测试请求超时返回 TIMEOUT"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "a.wav", bursts=1)
+
+        with patch('src.main._ASYNC_HTTP_POOL.post', new=AsyncMock(side_effect=HTTPTimeout("timeout"))):
+            result = asyncio.run(audio_to_text_async())
+
+        assert result["error"]["code"] == "TIMEOUT"
+
+    def test_async_connection_error(self, workspace):
+        """测试无法连接时返回 CONNECTION_ERROR"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "a.wav", bursts=1)
+        probe = ThreadingHTTPServer(("127.0.0.1", 0), _FakeASRHandler)
+        port = probe.server_address[1]
+        probe.server_close()
+
+        with patch('src.main._BALANCER', EndpointBalancer([f"http://127.0.0.1:{port}/api/v1/asr"])):
+            result = asyncio.run(audio_to_text_async())
+
+        assert result["error"]["code"] == "CONNECTION_ERROR"
+
+    def test_async_retries_transient_errors(self, workspace):
+        """测试异步版本的重试：连接失败后退避重发"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "meeting.wav", bursts=1)
+        real_post = _ASYNC_HTTP_POOL.post
+        calls = []
+
+        async def flaky_post(*args, **kwargs):
+            calls.append(kwargs["timeout"])
+            if len(calls) == 1:
+                raise HTTPConnectionError("reset")
+            return await real_post(*args, **kwargs)
+
+        with patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=2, backoff_base=0)), \
+                patch('src.main._ASYNC_HTTP_POOL.post', side_effect=flaky_post):
+            result = asyncio.run(audio_to_text_async())
+
+        assert result["text"] == "meeting"
+        assert len(calls) == 2
+        assert result["metadata"]["backend"]["retries"] == 1
+
+    def test_async_codec_fallback_resends_full_body(self, workspace, fake_asr_servers):
+        """测试 FLAC 被拒后以原始 WAV 重传时，服务收到的是完整的音频数据"""
+        path = workspace / "data" / "inputs" / "input" / "speech.wav"
+        _write_speech_wav(path, bursts=2)
+        url, received = fake_asr_servers(reject_flac=True)
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            result = asyncio.run(audio_to_text_async(compress_upload=True))
+
+        assert result["text"] == "speech"
+        assert [name for name, _ in received] == ["speech.flac", "speech.wav"]
+        assert 0 < received[0][1] < path.stat().st_size
+        assert received[1][1] == path.stat().st_size
+        assert result["metadata"]["upload"]["wire_bytes"] == path.stat().st_size
+
+    def test_async_failover_resends_full_body(self, workspace, fake_asr_servers):
+        """测试异步故障转移：第一个后端返回 503 后，另一个后端收到完整的音频数据"""
+        path = workspace / "data" / "inputs" / "input" / "speech.wav"
+        _write_speech_wav(path, bursts=1)
+        bad_url, bad_received = fake_asr_servers(statuses=[503])
+        good_url, good_received = fake_asr_servers()
+        balancer = EndpointBalancer([bad_url, good_url])
+
+        with patch('src.main._BALANCER', balancer), \
+                patch.object(balancer, '_score', side_effect=lambda endpoint: endpoint.url != bad_url):
+            result = asyncio.run(audio_to_text_async())
+
+        assert result["text"] == "speech"
+        assert bad_received == [("speech.wav", path.stat().st_size)]
+        assert good_received == [("speech.wav", path.stat().st_size)]
+        assert result["metadata"]["backend"] == {"endpoint": good_url, "attempts": 2, "retries": 0}
+
+    def test_async_retry_resends_full_body(self, workspace, fake_asr_servers):
+        """测试异步退避重试：服务先返回 503，重试时收到完整的音频数据"""
+        path = workspace / "data" / "inputs" / "input" / "speech.wav"
+        _write_speech_wav(path, bursts=1)
+        url, received = fake_asr_servers(statuses=[503])
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])), \
+                patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=2, backoff_base=0)):
+            result = asyncio.run(audio_to_text_async())
+
+        assert result["text"] == "speech"
+        assert received == [("speech.wav", path.stat().st_size)] * 2
+        assert result["metadata"]["backend"]["attempts"] == 2
+        assert result["metadata"]["backend"]["retries"] == 1
+
+    def test_async_concurrent_calls_are_coalesced(self, workspace, fake_asr_servers):
+        """测试同一文件的大量并发异步调用只发送一次请求，且等待者不占用线程池"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "meeting.wav", bursts=1)
+        url, received = fake_asr_servers()
+
+        async def run():
+            # 线程池很小时，如果等待者占用线程等待，执行者将拿不到线程而死锁
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2))
+            calls = (audio_to_text_async(lang="zh") for _ in range(20))
+            return await asyncio.wait_for(asyncio.gather(*calls), timeout=20)
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            results = asyncio.run(run())
+
+        assert len(received) == 1
+        assert all(result["text"] == "meeting" for result in results)
+        shared = [result for result in results if "coalesced" in result.get("metadata", {})]
+        # 执行者自己和晚到（命中缓存）的调用不带 coalesced
+        assert shared and all(r["metadata"]["coalesced"]["shared_with"] == "thread" for r in shared)
+
+    def test_async_invalid_language(self, workspace):
+        """测试无效语言参数"""
+        result = asyncio.run(audio_to_text_async(lang="invalid_lang"))
+
+        assert result["error"]["code"] == "INVALID_LANGUAGE"
+
+
+class TestASRMetrics:
+    """测试 audio_to_text 返回和记录的分阶段耗时"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        (tmp_path / "data" / "inputs" / "input").mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    def test_metrics_cover_each_stage(self, workspace, fake_asr_servers, capsys):
+        """测试成功结果带各阶段 span、字节数和实时率，并输出一行 JSON 日志"""
+        path = workspace / "data" / "inputs" / "input" / "meeting.wav"
+        _write_speech_wav(path, bursts=2)
+        url, received = fake_asr_servers()
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            result = audio_to_text(lang="zh", compress_upload=True)
+
+        metrics = result["metadata"]["metrics"]
+        assert set(metrics["stages_ms"]) == {
+            "scan", "hash", "cache", "prepare", "vad", "encode", "upload", "inference", "parse"
+        }
+        assert [span["stage"] for span in metrics["spans"]][:3] == ["scan", "hash", "cache"]
+        assert metrics["bytes_sent"] > received[0][1]  # 音频加 multipart 头尾
+        assert metrics["response_bytes"] > 0
+        assert metrics["audio_seconds"] == 1.6
+        assert metrics["real_time_factor"] > 0
+
+        lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        logged = json.loads(lines[-1])
+        assert logged["event"] == "asr_metrics"
+        assert logged["status"] == "ok"
+        assert logged["filename"] == "meeting.wav"
+        assert logged["bytes_sent"] == metrics["bytes_sent"]
+
+    def test_cache_hit_has_no_upload(self, workspace, fake_asr_servers):
+        """测试命中缓存时没有上传和推理阶段"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "meeting.wav", bursts=1)
+        url, _ = fake_asr_servers()
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            audio_to_text()
+            result = audio_to_text()
+
+        assert result["metadata"]["cache"]["hit"]
+        assert set(result["metadata"]["metrics"]["stages_ms"]) == {"scan", "hash", "cache"}
+        assert result["metadata"]["metrics"]["bytes_sent"] == 0
+
+    def test_errors_are_logged_with_code(self, workspace, fake_asr_servers, capsys):
+        """测试失败的调用不在结果中附带指标，但 JSON 日志记录错误代码"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "fail.wav", bursts=1)
+        url, _ = fake_asr_servers()
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            result = audio_to_text()
+
+        assert result["error"]["code"] == "ASR_API_ERROR"
+        logged = json.loads([line for line in capsys.readouterr().out.splitlines() if line.startswith("{")][-1])
+        assert logged["status"] == "ASR_API_ERROR"
+        assert logged["stages_ms"]["inference"] >= 0
+
+    def test_async_metrics(self, workspace, fake_asr_servers):
+        """测试异步版本返回相同结构的指标"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "meeting.wav", bursts=1)
+        url, _ = fake_asr_servers()
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            result = asyncio.run(audio_to_text_async())
+
+        stages = result["metadata"]["metrics"]["stages_ms"]
+        assert {"scan", "prepare", "upload", "inference", "parse"} <= set(stages)
+        assert result["metadata"]["metrics"]["bytes_sent"] > 0
+
+
+class TestASRPrometheus:
+    """测试公开函数和 ASR 请求的 Prometheus 指标"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        (tmp_path / "data" / "inputs" / "input").mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    def test_calls_backend_requests_and_cache_are_counted(self, workspace, fake_asr_servers):
+        """测试调用次数按语言和状态、请求按后端、缓存按命中与否计数，在途数归零"""
+        from src import main
+
+        path = workspace / "data" / "inputs" / "input" / "meeting.wav"
+        _write_speech_wav(path, bursts=1)
+        url, _ = fake_asr_servers()
+        before = {
+            "ok": main._PROM_REQUESTS.value(function="audio_to_text", lang="zh", status="ok"),
+            "invalid": main._PROM_REQUESTS.value(function="audio_to_text", lang="invalid", status="INVALID_LANGUAGE"),
+            "latency": main._PROM_LATENCY.count(function="audio_to_text", lang="zh"),
+            "backend": main._PROM_BACKEND_REQUESTS.value(endpoint=url, status="200"),
+            "hit": main._PROM_CACHE_LOOKUPS.value(result="hit"),
+            "miss": main._PROM_CACHE_LOOKUPS.value(result="miss"),
+        }
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            audio_to_text(lang="zh")
+            audio_to_text(lang="zh")
+            audio_to_text(lang="klingon")
+
+        assert main._PROM_REQUESTS.value(function="audio_to_text", lang="zh", status="ok") - before["ok"] == 2
+        assert main._PROM_REQUESTS.value(
+            function="audio_to_text", lang="invalid", status="INVALID_LANGUAGE"
+        ) - before["invalid"] == 1
+        assert main._PROM_LATENCY.count(function="audio_to_text", lang="zh") - before["latency"] == 2
+        assert main._PROM_BACKEND_REQUESTS.value(endpoint=url, status="200") - before["backend"] == 1
+        assert main._PROM_UPLOAD_BYTES.value(endpoint=url) > path.stat().st_size
+        assert main._PROM_CACHE_LOOKUPS.value(result="miss") - before["miss"] == 1
+        assert main._PROM_CACHE_LOOKUPS.value(result="hit") - before["hit"] == 1
+        assert main._PROM_INFLIGHT.value(function="audio_to_text") == 0
+
+    def test_stream_status_comes_from_error_event(self, workspace):
+        """测试流式调用的状态取自 error 事件的错误代码"""
+        from src import main
+
+        before = main._PROM_REQUESTS.value(function="audio_to_text_stream", lang="auto", status="NO_AUDIO_FILES")
+        list(audio_to_text_stream())
+
+        after = main._PROM_REQUESTS.value(function="audio_to_text_stream", lang="auto", status="NO_AUDIO_FILES")
+        assert after - before == 1
+
+    def test_textfile_is_written_after_each_call(self, workspace):
+        """测试配置 ASR_METRICS_FILE 后，一次性运行结束时指标已写入文件"""
+        path = workspace / "metrics" / "asr-{pid}.prom"
+
+        with patch('src.main.ASR_METRICS_FILE', str(path)):
+            audio_to_text()
+
+        written = workspace / "metrics" / f"asr-{os.getpid()}.prom"
+        assert 'asr_requests_total{function="audio_to_text",lang="auto",status="NO_AUDIO_FILES"}' in written.read_text()
+
+
+class TestASROutputFiles:
+    """测试把转录结果写入 data/outputs 的输出文件模式"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        (tmp_path / "data" / "inputs" / "input").mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    @staticmethod
+    def _response(text):
+        response = Mock()
+        response.status_code = 200
+        response.json.return_value = {"result": [{"text": text, "clean_text": text, "raw_text": f"<|en|>{text}"}]}
+        return response
+
+    def test_writes_files_and_returns_summary(self, workspace):
+        """测试写入 SRT 和 JSONL 文件，返回值只有摘要，不含转录文本"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "memo.wav", bursts=1)
+
+        with patch('src.main._HTTP_POOL.post', return_value=self._response("hello there")):
+            result = audio_to_text(lang="en", output_formats="srt, JSONL,srt")
+
+        assert [output["format"] for output in result["outputs"]] == ["srt", "jsonl"]
+        assert result["outputs"][0]["path"] == "data/outputs/memo.srt"
+        assert result["segments"] == 1
+        assert result["characters"] == len("hello there")
+        assert "text" not in result and "raw_text" not in result and "timestamps" not in result
+        assert "metrics" in result["metadata"]
+        assert (workspace / "data" / "outputs" / "memo.srt").read_text(encoding="utf-8") == (
+            "1\n00:00:00,000 --> 00:00:00,600\nhello there\n\n"
+        )
+
+    def test_long_audio_segments_are_written_as_they_arrive(self, workspace):
+        """测试长音频的片段按顺序转录完成后立即写入：转录后面的片段时前面的片段已在文件中"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "long.wav", bursts=3)
+        partial = workspace / "data" / "outputs" / ".long.jsonl.part"
+        seen = []
+
+        def fake_post(url, data, headers, timeout):
+            seen.append(partial.read_text(encoding="utf-8").count("\n"))
+            index = int(data.filename.rsplit("_", 1)[1].split(".")[0])
+            return self._response(f"part{index}")
+
+        with patch('src.main.ASR_CHUNK_MIN_DURATION', 1.0), \
+                patch('src.main.ASR_CHUNK_SECONDS', 1.2), \
+                patch('src.main.ASR_SEGMENT_WORKERS', 1), \
+                patch('src.main._HTTP_POOL.post', side_effect=fake_post):
+            result = audio_to_text(lang="en", output_formats="jsonl")
+
+        assert seen == [0, 1, 2]
+        lines = (workspace / "data" / "outputs" / "long.jsonl").read_text(encoding="utf-8").splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [record["text"] for record in records] == ["part0", "part1", "part2"]
+        assert records[1]["start_ms"] == records[0]["end_ms"]
+        assert result["segments"] == 3
+        assert "segments" not in result["metadata"]
+        assert not partial.exists()
+
+    def test_cache_hit_still_writes_files(self, workspace):
+        """测试缓存命中（没有经过分段转录）时同样写入输出文件"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "memo.wav", bursts=1)
+
+        with patch('src.main._HTTP_POOL.post', return_value=self._response("again")) as mock_post:
+            audio_to_text(lang="en")
+            result = audio_to_text(lang="en", output_formats="vtt")
+
+        assert mock_post.call_count == 1
+        assert result["metadata"]["cache"]["hit"] is True
+        assert "again" in (workspace / "data" / "outputs" / "memo.vtt").read_text(encoding="utf-8")
+
+    def test_failure_leaves_no_files(self, workspace):
+        """测试转录失败时返回错误，输出目录中不留下文件"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "memo.wav", bursts=1)
+        failed = Mock(status_code=500, text="boom")
+
+        with patch('src.main._HTTP_POOL.post', return_value=failed):
+            result = audio_to_text(output_formats="srt")
+
+        assert result["error"]["code"] == "ASR_API_ERROR"
+        assert list((workspace / "data" / "outputs").iterdir()) == []
+
+    def test_invalid_format(self, workspace):
+        """测试不支持的输出格式返回 INVALID_PARAMETER"""
+        result = audio_to_text(output_formats="srt,docx")
+
+        assert result["error"]["code"] == "INVALID_PARAMETER"
+        assert "docx" in result["error"]["message"]
+
+    def test_async_writes_files(self, workspace):
+        """测试异步版本同样写入输出文件，不支持的格式同样返回 INVALID_PARAMETER"""
+        _write_speech_wav(workspace / "data" / "inputs" / "input" / "memo.wav", bursts=1)
+        response = AsyncMock(return_value=self._response("hello there"))
+
+        with patch.object(_ASYNC_HTTP_POOL, 'post', response):
+            result = asyncio.run(audio_to_text_async(lang="en", output_formats="vtt,jsonl"))
+            invalid = asyncio.run(audio_to_text_async(output_formats="docx"))
+
+        assert [output["format"] for output in result["outputs"]] == ["vtt", "jsonl"]
+        assert result["segments"] == 1
+        assert "text" not in result
+        assert "hello there" in (workspace / "data" / "outputs" / "memo.vtt").read_text(encoding="utf-8")
+        assert invalid["error"]["code"] == "INVALID_PARAMETER"
+
+
+class TestASRLanguageProbe:
+    """测试 lang="auto" 时用开头的短片段预检测语言"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        (tmp_path / "data" / "inputs" / "input").mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr("src.main.ASR_LANG_PROBE_SECONDS", 1.0)
+        _write_speech_wav(tmp_path / "data" / "inputs" / "input" / "call.wav", bursts=3)
+        return tmp_path
+
+    @staticmethod
+    def _fake_post(calls, detected="yue"):
+        def post(url, data, headers, timeout):
+            calls.append((data.filename, data.fields["lang"]))
+            lang = detected if data.fields["lang"] == "auto" else data.fields["lang"]
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"result": [{"raw_text": f"<|{lang}|><|NEUTRAL|><|Speech|>唔該"}]}
+            return response
+        return post
+
+    def test_probe_then_fixed_language(self, workspace):
+        """测试先以 auto 上传开头 1 秒，其余音频再以识别出的语言上传，两段结果拼接"""
+        calls = []
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post(calls)):
+            result = audio_to_text()
+
+        assert calls == [("call_probe.wav", "auto"), ("call_0001.wav", "yue")]
+        assert result["language"] == "yue"
+        assert result["text"] == "唔該唔該"
+        assert [(s["index"], s["start"], s["end"]) for s in result["metadata"]["segments"]] == [
+            (0, 0.0, 1.0), (1, 1.0, 2.6)
+        ]
+        assert result["timestamps"]["segments"]["start"] == [0, 1000]
+        assert result["metadata"]["language_probe"] == {"detected": "yue", "cached": False, "probe_seconds": 1.0}
+        assert "probe" in result["metadata"]["metrics"]["stages_ms"]
+
+    def test_long_audio_reuses_probe(self, workspace, monkeypatch):
+        """测试需要切片的长音频同样只转录预检测片段之后的部分"""
+        monkeypatch.setattr("src.main.ASR_CHUNK_MIN_DURATION", 1.0)
+        monkeypatch.setattr("src.main.ASR_CHUNK_SECONDS", 1.2)
+        calls = []
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post(calls)):
+            result = audio_to_text()
+
+        assert calls[0] == ("call_probe.wav", "auto")
+        assert all(lang == "yue" for _, lang in calls[1:])
+        spans = [(s["start"], s["end"]) for s in result["metadata"]["segments"]]
+        assert spans[0] == (0.0, 1.0)
+        assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
+        assert spans[-1][1] == 2.6
+
+    def test_failed_probe_uses_short_budget(self, workspace, monkeypatch):
+        """测试预检测只发送一轮请求、使用自己的截止时间，失败后整段按 auto 转录"""
+        monkeypatch.setattr("src.main._RETRY_POLICY", _RetryPolicy(max_attempts=3, backoff_base=0))
+        monkeypatch.setattr("src.main.ASR_LANG_PROBE_DEADLINE", 5.0)
+        calls = []
+        post = self._fake_post(calls)
+
+        def failing_probe(url, data, headers, timeout):
+            if data.filename == "call_probe.wav":
+                calls.append((data.filename, timeout))
+                return Mock(status_code=503, text="busy", headers={})
+            return post(url, data, headers, timeout)
+
+        with patch('src.main._HTTP_POOL.post', side_effect=failing_probe):
+            result = audio_to_text()
+
+        assert [name for name, _ in calls] == ["call_probe.wav", "call.wav"]
+        assert calls[0][1] <= 5.0
+        assert result["language"] == "auto"
+        assert result["metadata"]["language_probe"]["detected"] is None
+
+    def test_detected_language_is_cached_by_content(self, workspace):
+        """测试相同内容再次转录时直接使用缓存的语言，不再上传预检测片段"""
+        calls = []
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post(calls)):
+            audio_to_text()
+            calls.clear()
+            # 换一种预处理方式：转录结果的缓存键不同，语言预检测的缓存键相同
+            result = audio_to_text(normalize_audio=True)
+
+        assert calls == [("call.wav", "yue")]
+        assert result["metadata"]["language_probe"] == {"detected": "yue", "cached": True}
+
+    def test_no_language_falls_back_to_auto(self, workspace):
+        """测试预检测片段没有识别出语言（nospeech）时整段仍按 auto 转录"""
+        calls = []
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post(calls, detected="nospeech")):
+            result = audio_to_text()
+
+        assert calls == [("call_probe.wav", "auto"), ("call.wav", "auto")]
+        assert result["metadata"]["language_probe"]["detected"] is None
+
+    def test_short_audio_and_fixed_language_skip_probe(self, workspace, monkeypatch):
+        """测试指定了语言，或音频不长于预检测片段时不做预检测"""
+        calls = []
+        with patch('src.main._HTTP_POOL.post', side_effect=self._fake_post(calls)):
+            audio_to_text(lang="zh")
+            monkeypatch.setattr("src.main.ASR_LANG_PROBE_SECONDS", 10.0)
+            result = audio_to_text(lang="auto")
+
+        assert calls == [("call.wav", "zh"), ("call.wav", "auto")]
+        assert "language_probe" not in result["metadata"]
+
+    def test_async_probe(self, workspace):
+        """测试异步版本同样先预检测语言"""
+        calls = []
+
+        async def post(url, data, headers, timeout):
+            return self._fake_post(calls)(url, data, headers, timeout)
+
+        with patch.object(_ASYNC_HTTP_POOL, 'post', side_effect=post):
+            result = asyncio.run(audio_to_text_async())
+
+        assert calls == [("call_probe.wav", "auto"), ("call_0001.wav", "yue")]
+        assert result["metadata"]["language_probe"]["detected"] == "yue"
+        assert result["text"] == "唔該唔該"
+
+
+class TestASRNoSpeech:
+    """测试静音或只有底噪的 WAV 在本地判定为无语音，不请求 ASR 服务"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        inputs = tmp_path / "data" / "inputs" / "input"
+        inputs.mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        # 2 秒的低电平底噪（约 -60 dBFS）
+        hiss = (np.random.default_rng(0).standard_normal(32000) * 30).astype(np.int16)
+        with wave.open(str(inputs / "silence.wav"), "wb") as writer:
+            writer.setnchannels(1)
+            writer.setsampwidth(2)
+            writer.setframerate(16000)
+            writer.writeframes(hiss.tobytes())
+        return tmp_path
+
+    def test_silent_wav_skips_backend(self, workspace):
+        """测试无语音时直接返回 nospeech 结果，并记录跳过的音频时长"""
+        from src import main
+        before = main._PROM_NOSPEECH_SECONDS.value()
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            result = audio_to_text()
+
+        mock_post.assert_not_called()
+        assert result["text"] == ""
+        assert result["language"] == "nospeech"
+        assert result["metadata"]["speech"] == {"detected": False, "speech_seconds": 0.0, "skipped_seconds": 2.0}
+        assert "vad" in result["metadata"]["metrics"]["stages_ms"]
+        assert main._PROM_NOSPEECH_SECONDS.value() - before == 2.0
+
+    def test_thresholds_are_configurable(self, workspace, monkeypatch):
+        """测试降低能量阈值后底噪被当作语音，关闭检测后同样上传"""
+        with patch('src.main._HTTP_POOL.post') as mock_post:
+            mock_post.return_value = Mock(status_code=200, json=Mock(return_value={"result": [{"text": "嗯"}]}))
+            monkeypatch.setattr("src.main.ASR_NOSPEECH_ENERGY_DB", -80.0)
+            monkeypatch.setattr("src.main.ASR_NOSPEECH_MAX_ZCR", 1.0)
+            assert audio_to_text(lang="zh")["text"] == "嗯"
+            monkeypatch.setattr("src.main.ASR_NOSPEECH_ENABLED", False)
+            assert audio_to_text(lang="en")["text"] == "嗯"
+
+        assert mock_post.call_count == 2
+
+    def test_stream_and_async(self, workspace):
+        """测试流式和异步版本同样不上传无语音的 WAV"""
+        with patch('src.main._HTTP_POOL.post') as mock_post, \
+                patch.object(_ASYNC_HTTP_POOL, 'post', new_callable=AsyncMock) as mock_async_post:
+            events = list(audio_to_text_stream(lang="zh"))
+            result = asyncio.run(audio_to_text_async(lang="en"))
+
+        mock_post.assert_not_called()
+        mock_async_post.assert_not_called()
+        assert [event["type"] for event in events] == ["start", "done"]
+        assert events[0]["data"]["total_segments"] == 0
+        assert events[-1]["data"]["language"] == "nospeech"
+        assert events[-1]["data"]["segments"] == 0
+        assert result["language"] == "nospeech"
+
+
+class TestASRConcurrencyLimit:
+    """测试发往 ASR 服务的请求受自适应并发限制，调整记录在 metadata.concurrency 中"""
+
+    @pytest.fixture
+    def workspace(self, tmp_path, monkeypatch):
+        inputs = tmp_path / "data" / "inputs" / "input"
+        inputs.mkdir(parents=True)
+        monkeypatch.chdir(tmp_path)
+        return inputs
+
+    def test_overload_halves_limit(self, workspace, fake_asr_servers, isolated_limiter, capsys):
+        """测试 503 后重试成功时，结果中记录上限减半，并输出日志和指标"""
+        from src import main
+        _write_speech_wav(workspace / "speech.wav", bursts=1)
+        url, _ = fake_asr_servers(statuses=[503])
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])), \
+                patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=2, backoff_base=0)):
+            result = audio_to_text()
+
+        concurrency = result["metadata"]["concurrency"]
+        assert concurrency["limit"] == isolated_limiter.limit == 8
+        assert concurrency["in_flight"] == 0
+        assert [(c["previous"], c["limit"], c["reason"]) for c in concurrency["changes"]] == [(16, 8, "HTTP 503")]
+        assert "[ASR] Concurrency limit 16 -> 8 (HTTP 503)" in capsys.readouterr().out
+        assert main._PROM_CONCURRENCY_LIMIT.value() == 8
+        assert main._PROM_CONCURRENCY_CHANGES.value(reason="HTTP 503") >= 1
+
+    def test_limit_caps_in_flight_requests(self, workspace, monkeypatch):
+        """测试批量调用时同时发往 ASR 服务的请求数不超过上限"""
+        from src import main
+        from src.utils.limiter import AdaptiveLimiter
+        for name in "abcd":
+            (workspace / f"{name}.mp3").write_bytes(_fake_mp3(name.encode()))
+        monkeypatch.setattr("src.main._LIMITER", AdaptiveLimiter(initial_limit=2, max_limit=2))
+        lock, active, peak = threading.Lock(), [0], [0]
+
+        def slow_post(url, data, headers, timeout):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return Mock(status_code=200, json=Mock(return_value={"result": [{"text": data.filename}]}))
+
+        with patch('src.main._HTTP_POOL.post', side_effect=slow_post):
+            result = audio_to_text_batch(max_workers=4)
+
+        assert result["succeeded"] == 4
+        assert peak[0] == 2
+        assert main._LIMITER.in_flight == 0
+
+    def test_queued_request_does_not_touch_backend(self, workspace, monkeypatch):
+        """测试等待名额时还没有选择后端：等到截止时间仍没有名额时，后端的请求数和在途数不变"""
+        from src.utils.limiter import AdaptiveLimiter
+        (workspace / "call.mp3").write_bytes(_fake_mp3(b"call"))
+        limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+        token = limiter.acquire()
+        monkeypatch.setattr("src.main._LIMITER", limiter)
+        balancer = EndpointBalancer(["http://asr"])
+
+        with patch('src.main._BALANCER', balancer), patch('src.main._HTTP_POOL.post') as mock_post, \
+                patch('src.main._RETRY_POLICY', _RetryPolicy(max_attempts=1, deadline=0.1)):
+            result = audio_to_text()
+            async_result = asyncio.run(audio_to_text_async(lang="en"))
+
+        assert result["error"]["code"] == async_result["error"]["code"] == "TIMEOUT"
+        mock_post.assert_not_called()
+        assert balancer.stats()["http://asr"]["requests"] == 0
+        assert balancer.stats()["http://asr"]["outstanding"] == 0
+        assert balancer.stats()["http://asr"]["state"] == "closed"
+        limiter.release(token)
+        assert limiter.in_flight == 0
+
+    def test_mixed_request_sizes_keep_limit(self, monkeypatch):
+        """测试小请求、4xx 响应和大请求混合时，正常耗时的大请求不会被判定为过载"""
+        from src import main
+        from src.utils.limiter import AdaptiveLimiter
+        limiter = AdaptiveLimiter(initial_limit=8)
+        monkeypatch.setattr("src.main._LIMITER", limiter)
+        requests = [
+            (200, 20_000, 0.05),      # 短片段
+            (400, 30_000_000, 0.002),  # 立即被拒绝的大请求
+            (200, 30_000_000, 1.5),   # 长音频
+            (200, 40_000_000, 2.2),
+        ]
+
+        for _ in range(10):
+            for status, size, elapsed in requests:
+                token = limiter.acquire(0)
+                started = time.monotonic() - elapsed
+                main._release_slot(token, {"response": Mock(status_code=status), "bytes": size, "started": started})
+
+        assert limiter.limit == 8
+        assert limiter.changes() == []
+
+    def test_async_and_disabled(self, workspace, fake_asr_servers, monkeypatch):
+        """测试异步版本同样报告并发上限，关闭后结果中没有 concurrency"""
+        _write_speech_wav(workspace / "speech.wav", bursts=1)
+        url, _ = fake_asr_servers()
+
+        with patch('src.main._BALANCER', EndpointBalancer([url])):
+            result = asyncio.run(audio_to_text_async())
+            assert result["metadata"]["concurrency"]["limit"] == 16
+            monkeypatch.setattr("src.main._LIMITER", None)
+            result = asyncio.run(audio_to_text_async(lang="en"))
+
+        assert result["text"] == "speech"
+        assert "concurrency" not in result["metadata"]
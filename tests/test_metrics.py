@@ -0,0 +1,75 @@
+"""
+分阶段耗时测试
+
+验证 span 记录、上传与后端推理的拆分、字节数和实时率的汇总。
+"""
+
+import time
+from unittest.mock import Mock, patch
+
+from src.utils.metrics import CallMetrics
+
+
+def test_span_records_duration_even_on_error():
+    """测试 with 块抛出异常时同样记录 span"""
+    metrics = CallMetrics()
+    try:
+        with metrics.span("prepare"):
+            raise ValueError("broken wav")
+    except ValueError:
+        pass
+
+    report = metrics.report()
+    assert [span["stage"] for span in report["spans"]] == ["prepare"]
+    assert "prepare" in report["stages_ms"]
+
+
+def test_request_is_split_into_upload_and_inference():
+    """测试请求体读完之前算上传，之后到收到响应算后端推理"""
+    with patch("src.utils.metrics.time.monotonic", return_value=100.0):
+        metrics = CallMetrics()
+    response = Mock(content=b'{"result": []}')
+    with patch("src.utils.metrics.time.monotonic", return_value=100.5):
+        metrics.record_request(sent_at=100.1, body_done_at=100.2, bytes_sent=4096, response=response)
+
+    with patch("src.utils.metrics.time.monotonic", return_value=101.0):
+        report = metrics.report()
+
+    assert report["stages_ms"] == {"upload": 100.0, "inference": 300.0}
+    assert report["spans"][0] == {"stage": "upload", "start_ms": 100.0, "duration_ms": 100.0}
+    assert report["bytes_sent"] == 4096
+    assert report["response_bytes"] == len(b'{"result": []}')
+    assert report["total_ms"] == 1000.0
+
+
+def test_failed_request_counts_only_upload():
+    """测试连接失败（没有响应）时只记录上传阶段"""
+    metrics = CallMetrics()
+    metrics.record_request(sent_at=time.monotonic(), body_done_at=None, bytes_sent=0)
+
+    assert list(metrics.report()["stages_ms"]) == ["upload"]
+
+
+def test_parallel_spans_are_summed():
+    """测试并发片段的同一阶段 span 分别记录，stages_ms 为耗时之和"""
+    metrics = CallMetrics()
+    start = metrics.started
+    metrics.record("upload", start, start + 0.2)
+    metrics.record("upload", start + 0.05, start + 0.25)
+
+    report = metrics.report()
+    assert len(report["spans"]) == 2
+    assert report["stages_ms"]["upload"] == 400.0
+
+
+def test_real_time_factor():
+    """测试实时率为音频秒数除以墙钟秒数，时长未知时为 None"""
+    with patch("src.utils.metrics.time.monotonic", return_value=10.0):
+        metrics = CallMetrics()
+    with patch("src.utils.metrics.time.monotonic", return_value=12.0):
+        assert metrics.report()["real_time_factor"] is None
+        metrics.audio_seconds = 30.0
+        report = metrics.report()
+
+    assert report["audio_seconds"] == 30.0
+    assert report["real_time_factor"] == 15.0
@@ -0,0 +1,131 @@
+"""
+模拟 ASR 服务测试
+
+benchmarks/mock_asr_server.py 供负载基准测试使用，这里验证 audio_to_text
+能通过真实的 HTTP 路径与它交互，延迟、错误率和响应大小的配置生效，
+以及大文件的分片续传和服务不支持时的整体上传回退。
+"""
+
+import asyncio
+import os
+import time
+import wave
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.mock_asr_server import MockASRServer
+from src.main import audio_to_text, audio_to_text_async
+from src.utils.balancer import EndpointBalancer
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """在临时目录中准备一个 1 秒的 WAV 输入文件"""
+    inputs = tmp_path / "data" / "inputs" / "input"
+    inputs.mkdir(parents=True)
+    with wave.open(str(inputs / "greeting.wav"), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(b"\x10\x01" * 16000)
+    original_cwd = os.getcwd()
+    os.chdir(tmp_path)
+    yield tmp_path
+    os.chdir(original_cwd)
+
+
+def _call(server: MockASRServer) -> dict:
+    with patch("src.main._BALANCER", EndpointBalancer([server.url])):
+        return audio_to_text(lang="zh")
+
+
+def test_transcribes_through_http(workspace):
+    """测试调用经 HTTP 完成，响应文本长度按 text_chars 生成"""
+    with MockASRServer(text_chars=10) as server:
+        result = _call(server)
+
+    assert "error" not in result
+    assert result["filename"] == "greeting.wav"
+    assert len(result["text"]) == 10
+    assert server.requests == 1
+    assert server.bytes_received > 0
+
+
+def test_latency_is_applied(workspace):
+    """测试每个请求在响应前等待配置的延迟"""
+    with MockASRServer(latency=0.3) as server:
+        start = time.monotonic()
+        result = _call(server)
+
+    assert "error" not in result
+    assert time.monotonic() - start >= 0.3
+
+
+def test_error_rate(workspace):
+    """测试错误率为 1 时每个请求都返回错误状态码，调用返回错误结果"""
+    with MockASRServer(error_rate=1.0) as server:
+        result = _call(server)
+
+    assert "error" in result
+    assert server.errors == server.requests == 1
+
+
+@pytest.fixture
+def large_mp3(workspace, monkeypatch):
+    """把输入换成 10 KB 的 MP3（不切片、不做无语音检测），分片续传阈值和分片大小调小"""
+    inputs = workspace / "data" / "inputs" / "input"
+    (inputs / "greeting.wav").unlink()
+    (inputs / "call.mp3").write_bytes(b"ID3\x04\x00\x00\x00\x00\x00\x00" + bytes(range(256)) * 40)
+    monkeypatch.setattr("src.main.ASR_RESUMABLE_MIN_BYTES", 4096)
+    monkeypatch.setattr("src.main.ASR_RESUMABLE_PART_BYTES", 1024)
+    return inputs / "call.mp3"
+
+
+def test_resumable_upload_resumes_in_next_call(large_mp3):
+    """测试上传途中断线的调用失败后，下一次调用只上传剩余的分片"""
+    with MockASRServer(resumable=True, drop_after=9) as server:
+        failed = _call(server)
+        result = _call(server)
+
+    assert failed["error"]["code"] == "CONNECTION_ERROR"
+    assert "error" not in result
+    resumable = result["metadata"]["backend"]["resumable"]
+    assert resumable["parts"] == 11
+    assert resumable["parts_resumed"] == 9
+    assert resumable["bytes_sent"] == large_mp3.stat().st_size - 9 * 1024
+    assert server.parts_received == 11
+
+
+def test_resumable_upload_reuses_content_hash(large_mp3):
+    """测试未经规范化和压缩的输入文件直接使用缓存键的内容哈希，不再读取整个文件计算"""
+    with MockASRServer(resumable=True) as server:
+        with patch("src.main.hash_stream", side_effect=AssertionError("re-hashed")):
+            result = _call(server)
+
+    assert "error" not in result
+    assert result["metadata"]["backend"]["resumable"]["parts"] == 11
+
+
+def test_resumable_upload_async(large_mp3):
+    """测试异步版本同样使用分片续传"""
+    with MockASRServer(resumable=True) as server:
+        with patch("src.main._BALANCER", EndpointBalancer([server.url])):
+            result = asyncio.run(audio_to_text_async(lang="zh"))
+
+    assert result["metadata"]["backend"]["resumable"]["parts"] == 11
+    assert server.parts_received == 11
+
+
+def test_falls_back_to_single_post(large_mp3):
+    """测试服务不支持分片续传时回退到整体 multipart 上传，并记住该后端不支持"""
+    from src import main
+    with MockASRServer() as server:
+        result = _call(server)
+        url = server.url
+
+    assert "error" not in result
+    assert "resumable" not in result["metadata"]["backend"]
+    assert result["metadata"]["backend"]["attempts"] == 1
+    assert server.requests == 1
+    assert url in main._RESUMABLE_UNSUPPORTED
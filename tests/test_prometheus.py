@@ -0,0 +1,97 @@
+"""
+Prometheus 指标测试
+
+验证文本格式的输出、直方图的累积分桶、标签转义、文本文件导出和 /metrics 服务。
+"""
+
+import urllib.request
+
+import pytest
+
+from src.utils.prometheus import CONTENT_TYPE, Registry, serve, write_textfile
+
+
+def test_counter_and_gauge_render():
+    """测试计数器和仪表按标签分别累计，并输出 HELP/TYPE 行"""
+    registry = Registry()
+    requests = registry.counter("asr_requests_total", "调用次数", ("lang", "status"))
+    inflight = registry.gauge("asr_inflight_requests", "在途调用数")
+    requests.inc(lang="zh", status="ok")
+    requests.inc(2, lang="zh", status="ok")
+    requests.inc(lang="en", status="TIMEOUT")
+    inflight.inc()
+    inflight.inc()
+    inflight.dec()
+
+    assert registry.render() == (
+        "# HELP asr_requests_total 调用次数\n"
+        "# TYPE asr_requests_total counter\n"
+        'asr_requests_total{lang="en",status="TIMEOUT"} 1\n'
+        'asr_requests_total{lang="zh",status="ok"} 3\n'
+        "# HELP asr_inflight_requests 在途调用数\n"
+        "# TYPE asr_inflight_requests gauge\n"
+        "asr_inflight_requests 1\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    """测试直方图分桶是累积的，+Inf 桶等于 _count"""
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "耗时", ("lang",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, lang="zh")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{lang="zh",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{lang="zh",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{lang="zh",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{lang="zh"} 4.25' in lines
+    assert 'latency_seconds_count{lang="zh"} 4' in lines
+    assert latency.count(lang="zh") == 4
+
+
+def test_label_values_are_escaped():
+    """测试标签值中的反斜杠、引号和换行被转义"""
+    registry = Registry()
+    registry.counter("errors_total", "错误", ("endpoint",)).inc(endpoint='a"b\\c\nd')
+
+    assert 'errors_total{endpoint="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_wrong_labels_and_negative_counter_are_rejected():
+    """测试标签不匹配和计数器减少时报错"""
+    counter = Registry().counter("x_total", "x", ("lang",))
+    with pytest.raises(ValueError):
+        counter.inc(status="ok")
+    with pytest.raises(ValueError):
+        counter.inc(-1, lang="zh")
+
+
+def test_write_textfile_replaces_atomically(tmp_path):
+    """测试写入文本文件后目录中不留下临时文件"""
+    registry = Registry()
+    registry.counter("runs_total", "运行次数").inc()
+    path = tmp_path / "textfile" / "asr.prom"
+
+    write_textfile(registry, path)
+    write_textfile(registry, path)
+
+    assert path.read_text(encoding="utf-8").endswith("runs_total 1\n")
+    assert [p.name for p in path.parent.iterdir()] == ["asr.prom"]
+
+
+def test_serve_metrics_endpoint():
+    """测试本地 /metrics 服务返回文本格式，其他路径返回 404"""
+    registry = Registry()
+    registry.counter("runs_total", "运行次数").inc(3)
+    server = serve(registry)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            assert "runs_total 3" in response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,83 @@
+"""
+分片续传上传测试
+
+以 benchmarks/mock_asr_server.py 的分片续传实现作为服务端，验证分片上传、
+断线后从已确认的分片继续、分片校验不符时重传，以及服务不支持时的报错。
+"""
+
+import io
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from benchmarks.mock_asr_server import MockASRServer
+from src.utils.http_pool import HTTPPool
+from src.utils.resumable import ResumableNotSupported, ResumableUploader, hash_stream
+
+PART = 1000
+
+
+@pytest.fixture
+def payload():
+    return io.BytesIO(bytes(range(256)) * 40)  # 10240 字节，11 个分片
+
+
+def _upload(server, state_dir, payload):
+    uploader = ResumableUploader(HTTPPool().request, state_dir, PART)
+    sha256, size = hash_stream(payload)
+    return uploader.upload(server.url, "call.mp3", payload, sha256, size, {"lang": "zh"}, lambda: 5.0)
+
+
+def test_upload_in_parts(tmp_path, payload):
+    """测试逐片上传后提交，返回转录响应并删除状态文件"""
+    with MockASRServer(resumable=True) as server:
+        response, report = _upload(server, tmp_path, payload)
+
+    assert response.status_code == 200
+    assert response.json()["result"][0]["key"] == "call"
+    assert report == {"upload_id": report["upload_id"], "parts": 11, "parts_resumed": 0, "bytes_sent": 10240}
+    assert server.parts_received == 11
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_resume_after_dropped_connection(tmp_path, payload):
+    """测试上传途中断线后，下一次上传只发送服务还没有确认的分片"""
+    with MockASRServer(resumable=True, drop_after=8) as server:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            _upload(server, tmp_path, payload)
+        assert len(list(tmp_path.iterdir())) == 1
+
+        response, report = _upload(server, tmp_path, payload)
+
+    assert response.status_code == 200
+    assert report["parts_resumed"] == 8
+    assert report["bytes_sent"] == 10240 - 8 * PART
+    assert server.parts_received == 11
+
+
+def test_corrupted_part_is_resent(tmp_path, payload):
+    """测试分片校验不符（422）时重传该分片一次"""
+    with MockASRServer(resumable=True, corrupt_parts=1) as server:
+        response, report = _upload(server, tmp_path, payload)
+
+    assert response.status_code == 200
+    assert report["bytes_sent"] == 10240 + PART
+
+
+def test_unsupported_backend(tmp_path, payload):
+    """测试服务没有 /uploads 接口时抛出 ResumableNotSupported"""
+    with MockASRServer() as server:
+        with pytest.raises(ResumableNotSupported):
+            _upload(server, tmp_path, payload)
+
+
+def test_create_without_upload_id(tmp_path, payload):
+    """测试 /uploads 由其他接口处理、响应中没有 upload_id 时同样视为不支持，不写状态文件"""
+    response = Mock(status_code=200)
+    response.json.return_value = {"result": []}
+    uploader = ResumableUploader(Mock(return_value=response), tmp_path, PART)
+
+    with pytest.raises(ResumableNotSupported):
+        uploader.upload("http://asr", "call.mp3", payload, *hash_stream(payload), {"lang": "zh"}, lambda: 5.0)
+    assert list(tmp_path.iterdir()) == []
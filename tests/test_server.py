@@ -0,0 +1,204 @@
+"""
+常驻服务模式测试
+
+启动真实的服务（工作进程池 + HTTP 前端）和本地模拟 ASR 服务，验证调用分派、
+工作进程之间保持预热（复用 keep-alive 连接）、流式输出、参数校验和优雅排空。
+"""
+
+import http.client
+import json
+import socket
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+from src.server import FUNCTIONS, PrefabServer
+
+
+class _SlowASRHandler(BaseHTTPRequestHandler):
+    """模拟 ASR 服务：等待 delay 秒后返回固定文本，记录每个请求的客户端端口"""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    client_ports: list = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.client_ports.append(self.client_address[1])
+        time.sleep(self.delay)
+        payload = json.dumps({"result": [{"text": "你好", "clean_text": "你好", "raw_text": "<|zh|>你好"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    """本地模拟 ASR 服务，返回 handler 类（可修改 delay，读取 client_ports）"""
+    handler = type("Handler", (_SlowASRHandler,), {"client_ports": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    handler.url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/asr"
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """按 manifest 约定准备输入文件的工作目录"""
+    inputs = tmp_path / "job" / "data" / "inputs" / "input"
+    inputs.mkdir(parents=True)
+    with wave.open(str(inputs / "hello.wav"), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes(b"\x00\x01" * 16000)
+    return tmp_path / "job"
+
+
+@pytest.fixture
+def prefab(backend, monkeypatch, tmp_path):
+    """启动单工作进程的服务；工作进程在启动时继承这里设置的环境变量"""
+    monkeypatch.setenv("ASR_API_URL", backend.url)
+    monkeypatch.setenv("ASR_CACHE_ENABLED", "0")
+    monkeypatch.setenv("ASR_RETRY_MAX_ATTEMPTS", "1")
+    server = PrefabServer(workers=1, port=0).start()
+    yield server
+    server.drain(timeout=5)
+
+
+def _request(server: PrefabServer, method: str, path: str, body: dict | None = None):
+    """发送请求，返回 (状态码, 响应体)"""
+    parts = urlsplit(server.address)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None)
+        response = conn.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        conn.close()
+
+
+def _invoke(server: PrefabServer, function: str, workdir, **parameters):
+    status, body = _request(
+        server, "POST", "/invoke", {"function": function, "parameters": parameters, "workdir": str(workdir)}
+    )
+    return status, json.loads(body)
+
+
+def test_functions_match_manifest():
+    """测试可调用的函数与 manifest 声明的函数一致"""
+    with open("prefab-manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    declared = {function["name"]: bool(function.get("streaming")) for function in manifest["functions"]}
+    assert FUNCTIONS == declared
+
+
+def test_invoke_keeps_worker_warm(prefab, backend, workdir):
+    """测试连续调用由同一个预热的工作进程处理，复用到 ASR 服务的 keep-alive 连接"""
+    first = _invoke(prefab, "audio_to_text", workdir, lang="zh")
+    second = _invoke(prefab, "audio_to_text", workdir, lang="zh")
+
+    assert first[0] == second[0] == 200
+    assert first[1]["text"] == "你好"
+    assert first[1]["filename"] == "hello.wav"
+    assert len(backend.client_ports) == 2
+    assert len(set(backend.client_ports)) == 1
+
+
+def test_stream_returns_sse_events(prefab, workdir):
+    """测试流式函数以 SSE 逐个返回事件"""
+    status, body = _request(
+        prefab, "POST", "/invoke", {"function": "audio_to_text_stream", "workdir": str(workdir)}
+    )
+
+    events = [json.loads(line[len("data: "):]) for line in body.split("\n\n") if line]
+    assert status == 200
+    assert [event["type"] for event in events] == ["start", "content", "progress", "done"]
+    assert events[-1]["data"]["text"] == "你好"
+
+
+@pytest.mark.parametrize(
+    "body, code",
+    [
+        ({"function": "rm_rf"}, "UNKNOWN_FUNCTION"),
+        ({"function": "audio_to_text", "parameters": {"language": "zh"}}, "INVALID_PARAMETERS"),
+        ({"function": "audio_to_text", "workdir": "/nonexistent/job"}, "INVALID_WORKDIR"),
+    ],
+)
+def test_invalid_requests(prefab, body, code):
+    """测试未知函数、未知参数和不存在的工作目录返回 400"""
+    status, response = _request(prefab, "POST", "/invoke", body)
+
+    assert status == 400
+    assert json.loads(response)["error"]["code"] == code
+
+
+def test_function_errors_are_returned_as_results(prefab, tmp_path):
+    """测试函数自身返回的错误字典原样返回（与直接调用的约定一致）"""
+    status, result = _invoke(prefab, "audio_to_text", tmp_path)
+
+    assert status == 200
+    assert result["error"]["code"] == "NO_INPUT_DIR"
+
+
+def test_drain_finishes_inflight_and_rejects_new(prefab, backend, workdir):
+    """测试排空时正在处理的请求照常完成，新请求和健康检查返回 503"""
+    backend.delay = 0.5
+    outcome = {}
+    inflight = threading.Thread(target=lambda: outcome.update(result=_invoke(prefab, "audio_to_text", workdir)))
+    inflight.start()
+    while not backend.client_ports:
+        time.sleep(0.01)
+
+    drained = {}
+    drainer = threading.Thread(target=lambda: drained.update(ok=prefab.drain(timeout=10)))
+    drainer.start()
+    while prefab.health()["status"] != "draining":
+        time.sleep(0.01)
+
+    assert _request(prefab, "GET", "/healthz")[0] == 503
+    status, body = _invoke(prefab, "audio_to_text", workdir)
+    assert status == 503
+    assert body["error"]["code"] == "SERVER_DRAINING"
+
+    inflight.join(10)
+    drainer.join(10)
+    assert outcome["result"][0] == 200
+    assert outcome["result"][1]["text"] == "你好"
+    assert drained["ok"]
+
+
+def test_unix_socket(backend, monkeypatch, tmp_path, workdir):
+    """测试通过 Unix 套接字提供服务"""
+    monkeypatch.setenv("ASR_API_URL", backend.url)
+    monkeypatch.setenv("ASR_CACHE_ENABLED", "0")
+    path = str(tmp_path / "asr.sock")
+    server = PrefabServer(workers=1, unix_path=path).start()
+    try:
+        body = json.dumps({"function": "audio_to_text", "workdir": str(workdir)}).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(
+                b"POST /invoke HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            response = b""
+            while chunk := sock.recv(65536):
+                response += chunk
+    finally:
+        assert server.drain(timeout=5)
+
+    head, payload = response.split(b"\r\n\r\n", 1)
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(payload)["text"] == "你好"
@@ -0,0 +1,237 @@
+"""
+请求合并测试
+
+验证线程之间、协程之间和进程之间（通过文件锁）的合并，以及等锁超时和异常传播。
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.singleflight import SHARED_PROCESS, SHARED_THREAD, SingleFlight
+
+# 跨进程合并依赖 fcntl 文件锁
+fcntl = pytest.importorskip("fcntl")
+
+
+def _hold_lock(lock_dir, key):
+    """模拟另一个进程持有 key 的文件锁（flock 对不同的打开文件描述互斥，同一进程内也生效）"""
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_dir / f"{key}.lock", os.O_RDWR | os.O_CREAT)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+class TestThreads:
+    """测试同一进程内线程之间的合并"""
+
+    def test_concurrent_calls_share_one_execution(self, tmp_path):
+        """测试相同键的并发调用只执行一次，其余调用得到独立的结果副本"""
+        flight = SingleFlight(tmp_path)
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return {"text": "ok"}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(flight.do, "k", fn) for _ in range(8)]
+            while flight.stats()["shared_thread"] < 7:
+                time.sleep(0.01)
+            release.set()
+            outcomes = [future.result(timeout=5) for future in futures]
+
+        assert len(calls) == 1
+        assert sorted(source or "" for _, source in outcomes) == [""] + [SHARED_THREAD] * 7
+        results = [result for result, _ in outcomes]
+        assert all(result == {"text": "ok"} for result in results)
+        assert len({id(result) for result in results}) == 8
+        assert flight.stats() == {"executed": 1, "shared_thread": 7, "shared_process": 0}
+
+    def test_different_keys_do_not_wait(self, tmp_path):
+        """测试不同键互不影响"""
+        flight = SingleFlight(tmp_path)
+
+        assert flight.do("a", lambda: 1) == (1, None)
+        assert flight.do("b", lambda: 2) == (2, None)
+        assert flight.stats()["executed"] == 2
+
+    def test_exception_is_shared_and_next_call_retries(self, tmp_path):
+        """测试执行者的异常传给所有等待者，之后的调用重新执行"""
+        flight = SingleFlight(tmp_path)
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError("backend down")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(flight.do, "k", fail) for _ in range(2)]
+            while flight.stats()["shared_thread"] < 1:
+                time.sleep(0.01)
+            release.set()
+            for future in futures:
+                with pytest.raises(RuntimeError):
+                    future.result(timeout=5)
+
+        assert flight.do("k", lambda: "ok") == ("ok", None)
+
+
+class TestAsync:
+    """测试协程之间的合并"""
+
+    def test_waiters_do_not_occupy_threads(self, tmp_path):
+        """测试大量等待者在事件循环中等待：默认线程池只有一个线程时也不会死锁"""
+        flight = SingleFlight(tmp_path)
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"text": "ok"}
+
+        async def run():
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+            # 提供 lookup 时执行者需要在线程中处理文件锁
+            waiters = [flight.do_async("k", fn, lookup=lambda: None) for _ in range(50)]
+            return await asyncio.wait_for(asyncio.gather(*waiters), timeout=10)
+
+        outcomes = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert sum(source == SHARED_THREAD for _, source in outcomes) == 49
+        assert all(result == {"text": "ok"} for result, _ in outcomes)
+
+    def test_cancelled_waiter_does_not_cancel_leader(self, tmp_path):
+        """测试单个等待者被取消时，执行者和其他等待者照常完成"""
+        flight = SingleFlight(tmp_path)
+
+        async def fn():
+            await asyncio.sleep(0.1)
+            return "ok"
+
+        async def run():
+            leader = asyncio.create_task(flight.do_async("k", fn))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(flight.do_async("k", fn))
+            other = asyncio.create_task(flight.do_async("k", fn))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            return await leader, await other, waiter.cancelled()
+
+        leader, other, cancelled = asyncio.run(run())
+
+        assert leader == ("ok", None)
+        assert other == ("ok", SHARED_THREAD)
+        assert cancelled
+
+    def test_threads_and_coroutines_share(self, tmp_path):
+        """测试线程中的调用可以等待协程执行者的结果"""
+        flight = SingleFlight(tmp_path)
+        started = threading.Event()
+
+        async def fn():
+            started.set()
+            await asyncio.sleep(0.1)
+            return "ok"
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            def follower():
+                started.wait(5)
+                return flight.do("k", lambda: "not shared")
+
+            future = executor.submit(follower)
+            leader = asyncio.run(flight.do_async("k", fn))
+            assert future.result(timeout=5) == ("ok", SHARED_THREAD)
+        assert leader == ("ok", None)
+
+
+class TestProcesses:
+    """测试通过文件锁在进程之间合并"""
+
+    def test_waits_for_other_process_then_uses_lookup(self, tmp_path):
+        """测试其他进程持锁时等待，锁释放后从 lookup 读取对方的结果而不重复执行"""
+        flight = SingleFlight(tmp_path)
+        shared_store = {}
+        fd = _hold_lock(tmp_path, "k")
+
+        def other_process_finishes():
+            time.sleep(0.1)
+            shared_store["k"] = "from other process"
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+        threading.Thread(target=other_process_finishes).start()
+        result = flight.do("k", lambda: pytest.fail("不应重复执行"), lookup=lambda: shared_store.get("k"))
+
+        assert result == ("from other process", SHARED_PROCESS)
+        assert flight.stats()["shared_process"] == 1
+        assert not (tmp_path / "k.lock").exists()
+
+    def test_executes_when_other_process_left_no_result(self, tmp_path):
+        """测试对方没有留下结果（例如失败）时自己执行"""
+        flight = SingleFlight(tmp_path)
+        fd = _hold_lock(tmp_path, "k")
+        threading.Timer(0.05, lambda: (fcntl.flock(fd, fcntl.LOCK_UN), os.close(fd))).start()
+
+        assert flight.do("k", lambda: "mine", lookup=lambda: None) == ("mine", None)
+
+    def test_lock_wait_is_bounded_by_timeout(self, tmp_path):
+        """测试等锁超过 timeout 后不再等待，自己执行"""
+        flight = SingleFlight(tmp_path)
+        fd = _hold_lock(tmp_path, "k")
+        try:
+            started = time.monotonic()
+            result = flight.do("k", lambda: "mine", lookup=lambda: None, timeout=0.2)
+            elapsed = time.monotonic() - started
+        finally:
+            os.close(fd)
+
+        assert result == ("mine", None)
+        assert 0.2 <= elapsed < 2
+
+    def test_no_lookup_skips_file_lock(self, tmp_path):
+        """测试没有 lookup（结果无法跨进程共享）时不使用文件锁，不会被其他进程串行化"""
+        flight = SingleFlight(tmp_path)
+        fd = _hold_lock(tmp_path, "k")
+        try:
+            started = time.monotonic()
+            assert flight.do("k", lambda: "mine") == ("mine", None)
+            assert time.monotonic() - started < 0.5
+        finally:
+            os.close(fd)
+
+    def test_real_processes_share_through_lookup(self, tmp_path):
+        """测试两个真实进程：后到的进程等待先到的进程，并读取它写入的结果"""
+        marker = tmp_path / "result.txt"
+        calls = tmp_path / "calls.txt"
+        script = (
+            "import sys, time\n"
+            "from pathlib import Path\n"
+            "from src.utils.singleflight import SingleFlight\n"
+            f"marker, calls = Path({str(marker)!r}), Path({str(calls)!r})\n"
+            "def fn():\n"
+            "    with open(calls, 'a') as f: f.write('x')\n"
+            "    time.sleep(0.5)\n"
+            "    marker.write_text('done')\n"
+            "    return 'done'\n"
+            "lookup = lambda: marker.read_text() if marker.exists() else None\n"
+            f"print(SingleFlight(Path({str(tmp_path / 'locks')!r})).do('k', fn, lookup=lookup))\n"
+        )
+        cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        procs = []
+        for _ in range(2):
+            procs.append(subprocess.Popen([sys.executable, "-c", script], cwd=cwd, stdout=subprocess.PIPE, text=True))
+            time.sleep(0.2)
+        outputs = sorted(proc.communicate(timeout=20)[0].strip() for proc in procs)
+
+        assert calls.read_text() == "x"
+        assert outputs == ["('done', 'process')", "('done', None)"]
@@ -0,0 +1,71 @@
+"""
+冷启动测试
+
+在独立的解释器中导入 src.main，用 -X importtime 确认 HTTP 栈没有在启动时导入，
+并检查启动耗时没有明显退化（完整的对比见 benchmarks/bench_startup.py）。
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 只有发请求时才需要的顶层包
+LAZY_PACKAGES = {"requests", "urllib3", "charset_normalizer", "chardet", "idna", "certifi"}
+
+# 导入 src.main 比启动空解释器多出的耗时上限（毫秒），只用于发现数量级的退化
+STARTUP_BUDGET_MS = float(os.getenv("ASR_STARTUP_BUDGET_MS", "1500"))
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, check=True, capture_output=True, text=True)
+
+
+def _imported_modules(code: str) -> set[str]:
+    """解析 -X importtime 的输出，返回执行 code 时导入的模块"""
+    modules = set()
+    for line in _run("-X", "importtime", "-c", code).stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def _median_startup_ms(code: str, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run("-c", code)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def test_http_stack_is_not_imported_at_startup():
+    """测试导入 src.main 不会导入 requests 及其依赖链"""
+    # 排除解释器启动时（例如 site-packages 中的 .pth 文件）就已导入的模块
+    modules = _imported_modules("import src.main") - _imported_modules("pass")
+
+    assert "src.main" in modules
+    assert {name.split(".")[0] for name in modules} & LAZY_PACKAGES == set()
+
+
+def test_http_stack_is_imported_on_first_use():
+    """测试第一次需要 requests 时才导入"""
+    code = (
+        "import sys, src.main\n"
+        "assert 'requests' not in sys.modules\n"
+        "src.main._failover_errors()\n"
+        "assert 'requests' in sys.modules\n"
+    )
+    _run("-c", code)
+
+
+def test_startup_time_within_budget():
+    """测试导入 src.main 的耗时在预算内"""
+    baseline = _median_startup_ms("pass")
+    startup = _median_startup_ms("import src.main")
+
+    assert startup - baseline < STARTUP_BUDGET_MS, f"启动耗时 {startup - baseline:.0f} ms"
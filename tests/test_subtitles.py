@@ -0,0 +1,81 @@
+"""
+转录结果文件输出测试
+
+验证时间格式、SRT/WebVTT/JSONL 的内容、没有时间戳时的处理，以及临时文件的替换和清理。
+"""
+
+import json
+
+import pytest
+
+from src.utils.subtitles import TranscriptWriter, format_timestamp, iter_cues
+
+
+def _timestamps(starts, ends, offsets):
+    return {"unit": "ms", "source": "chunks", "segments": {"start": starts, "end": ends, "text_offset": offsets}}
+
+
+@pytest.mark.parametrize("ms, separator, expected", [
+    (0, ",", "00:00:00,000"),
+    (61_005, ",", "00:01:01,005"),
+    (3_723_456, ".", "01:02:03.456"),
+])
+def test_format_timestamp(ms, separator, expected):
+    """测试毫秒数格式化为 HH:MM:SS,mmm / HH:MM:SS.mmm"""
+    assert format_timestamp(ms, separator) == expected
+
+
+def test_iter_cues_splits_text_by_offsets():
+    """测试按 text_offset 拆分文本，空白片段被跳过，没有时间戳时整段作为一条"""
+    text = "你好。 再见"
+    assert list(iter_cues(text, _timestamps([0, 900, 1500], [900, 1500, 2000], [0, 3, 4]))) == [
+        (0, 900, "你好。"), (1500, 2000, "再见")
+    ]
+    assert list(iter_cues(" hi ", None)) == [(None, None, "hi")]
+    assert list(iter_cues("", None)) == []
+
+
+def test_writer_outputs_all_formats(tmp_path):
+    """测试多次写入的片段连续编号，close() 后才出现正式文件"""
+    writer = TranscriptWriter(tmp_path / "outputs", "call", ["srt", "vtt", "jsonl"])
+    writer.write("第一段", _timestamps([0], [1500], [0]))
+    assert not (tmp_path / "outputs" / "call.srt").exists()
+    writer.write("second", _timestamps([30000], [31250], [0]))
+    outputs = writer.close()
+
+    directory = tmp_path / "outputs"
+    assert [output["format"] for output in outputs] == ["srt", "vtt", "jsonl"]
+    assert sorted(p.name for p in directory.iterdir()) == ["call.jsonl", "call.srt", "call.vtt"]
+    assert (directory / "call.srt").read_text(encoding="utf-8") == (
+        "1\n00:00:00,000 --> 00:00:01,500\n第一段\n\n"
+        "2\n00:00:30,000 --> 00:00:31,250\nsecond\n\n"
+    )
+    assert (directory / "call.vtt").read_text(encoding="utf-8").startswith(
+        "WEBVTT\n\n00:00:00.000 --> 00:00:01.500\n第一段\n\n"
+    )
+    records = [json.loads(line) for line in (directory / "call.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert records == [
+        {"index": 0, "start_ms": 0, "end_ms": 1500, "text": "第一段"},
+        {"index": 1, "start_ms": 30000, "end_ms": 31250, "text": "second"},
+    ]
+    assert outputs[0]["bytes"] == (directory / "call.srt").stat().st_size
+
+
+def test_untimed_text_only_goes_to_jsonl(tmp_path):
+    """测试没有时间戳的文本只写入 JSONL，字幕文件为空（WebVTT 只有文件头）"""
+    writer = TranscriptWriter(tmp_path, "song", ["srt", "vtt", "jsonl"])
+    writer.write("la la", None)
+    writer.close()
+
+    assert (tmp_path / "song.srt").read_text() == ""
+    assert (tmp_path / "song.vtt").read_text() == "WEBVTT\n\n"
+    assert json.loads((tmp_path / "song.jsonl").read_text())["start_ms"] is None
+
+
+def test_abort_removes_partial_files(tmp_path):
+    """测试 abort() 删除临时文件，不留下任何输出"""
+    writer = TranscriptWriter(tmp_path, "call", ["srt", "jsonl"])
+    writer.write("partial", _timestamps([0], [1000], [0]))
+    writer.abort()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,40 @@
+"""
+raw_text 标记解析测试
+
+验证按段拆分语言、情感和事件标记，以及没有标记、未知标记和空白的处理。
+"""
+
+from src.utils.tags import parse_tags
+
+
+def test_segments_with_all_tags():
+    """测试每组标记开启一段，文本去掉首尾空白"""
+    raw = "<|yue|><|SAD|><|BGM|><|withitn|> 唔該。 <|ja|><|EMO_UNKNOWN|><|Applause|><|woitn|>ありがとう"
+
+    assert parse_tags(raw) == [
+        {"language": "yue", "emotion": "SAD", "event": "BGM", "text": "唔該。"},
+        {"language": "ja", "emotion": "EMO_UNKNOWN", "event": "Applause", "text": "ありがとう"},
+    ]
+
+
+def test_text_without_tags():
+    """测试没有标记的文本单独成段，空文本返回空列表"""
+    assert parse_tags("hello world") == [{"language": None, "emotion": None, "event": None, "text": "hello world"}]
+    assert parse_tags("") == []
+    assert parse_tags("   ") == []
+
+
+def test_unknown_tags_are_dropped_from_text():
+    """测试未知标记不出现在文本中，也不改变已识别的字段"""
+    assert parse_tags("<|ko|><|SPEAKER_1|>안녕") == [
+        {"language": "ko", "emotion": None, "event": None, "text": "안녕"}
+    ]
+
+
+def test_partial_tags_and_text_before_first_tag():
+    """测试第一组标记之前的文本、只有部分标记的段和结尾只有标记的段"""
+    assert parse_tags("前言<|en|>body<|nospeech|>") == [
+        {"language": None, "emotion": None, "event": None, "text": "前言"},
+        {"language": "en", "emotion": None, "event": None, "text": "body"},
+        {"language": "nospeech", "emotion": None, "event": None, "text": ""},
+    ]
@@ -0,0 +1,67 @@
+"""
+列式时间戳测试
+
+验证从后端响应提取词级和句级时间戳、文本下标定位，以及各片段时间戳的平移拼接。
+"""
+
+from src.utils.timestamps import from_backend, from_span, merge
+
+
+def test_word_timestamps_tokenized_from_text():
+    """测试后端只返回 timestamp 时按文本分词（中文按字、英文按词）对齐"""
+    text = "你好 world"
+    item = {"text": text, "timestamp": [[0, 200], [200, 400], [500, 900]]}
+
+    timestamps = from_backend(item, text)
+
+    assert timestamps["source"] == "backend"
+    assert timestamps["words"] == {
+        "start": [0, 200, 500], "end": [200, 400, 900], "text_offset": [0, 1, 3], "length": [1, 1, 5]
+    }
+    assert timestamps["segments"] == {"start": [0], "end": [900], "text_offset": [0]}
+
+
+def test_sentence_info():
+    """测试 sentence_info 作为片段，words 字段优先于分词"""
+    text = "开始了。好的"
+    item = {
+        "timestamp": [[0, 300], [300, 900], [1200, 1600]],
+        "words": ["开始", "了", "好的"],
+        "sentence_info": [{"text": "开始了。", "start": 0, "end": 900}, {"text": "好的", "start": 1200, "end": 1600}],
+    }
+
+    timestamps = from_backend(item, text)
+
+    assert timestamps["segments"] == {"start": [0, 1200], "end": [900, 1600], "text_offset": [0, 4]}
+    assert timestamps["words"]["text_offset"] == [0, 2, 4]
+    assert timestamps["words"]["length"] == [2, 1, 2]
+
+
+def test_mismatched_backend_data_is_ignored():
+    """测试时间戳数量与词数不一致或缺失时不返回时间戳"""
+    assert from_backend({"timestamp": [[0, 100]]}, "你好") is None
+    assert from_backend({"text": "你好"}, "你好") is None
+    assert from_backend({"sentence_info": [{"text": "再见", "start": 0, "end": 1}]}, "你好") is None
+
+
+def test_merge_shifts_segments_and_words():
+    """测试拼接时片段时间平移到整段时间轴，文本下标平移到拼接后的文本"""
+    backend = from_backend({"timestamp": [[100, 400], [400, 800]]}, "ok go")
+    parts = [
+        (0.0, 30.0, 0, None),
+        (30.0, 55.5, 6, backend),
+    ]
+
+    merged = merge(parts)
+
+    assert merged["source"] == "backend"
+    assert merged["segments"] == {"start": [0, 30100], "end": [30000, 30800], "text_offset": [0, 6]}
+    assert merged["words"] == {
+        "start": [30100, 30400], "end": [30400, 30800], "text_offset": [6, 9], "length": [2, 2]
+    }
+
+
+def test_merge_without_any_span():
+    """测试没有时间信息（如 MP3 整体上传且后端未返回）时结果为 None"""
+    assert merge([(0.0, 0.0, 0, None)]) is None
+    assert merge([(0.0, 1.5, 0, None)]) == from_span(0.0, 1.5)
@@ -0,0 +1,125 @@
+"""
+流式 multipart 上传测试
+
+验证请求体与 urllib3 的编码逐字节一致，并且能通过真实 HTTP 连接
+带 Content-Length 分块发送。
+"""
+
+import hashlib
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from urllib3.filepost import encode_multipart_formdata
+
+from src.utils.http_pool import HTTPPool
+from src.utils.upload import MultipartStream
+
+
+class TestMultipartStream:
+    """测试请求体编码"""
+
+    def test_matches_urllib3_encoding(self, tmp_path):
+        """测试与 requests/urllib3 生成的 multipart 请求体完全一致"""
+        content = bytes(range(256)) * 1000
+        path = tmp_path / "录音 \"1\".wav"
+        path.write_bytes(content)
+
+        with open(path, "rb") as f:
+            body = MultipartStream({"lang": "zh"}, "files", path.name, f, "audio/wav", boundary="b0undary")
+            encoded = body.read()
+
+        expected, content_type = encode_multipart_formdata(
+            [("lang", "zh"), ("files", (path.name, content, "audio/wav"))],
+            boundary="b0undary",
+        )
+        assert encoded == expected
+        assert body.content_type == content_type
+        assert len(body) == len(expected)
+
+    def test_small_reads_cover_all_sections(self):
+        """测试小块读取跨越头部、文件和尾部时内容不变"""
+        body = MultipartStream({"lang": "en"}, "files", "a.wav", io.BytesIO(b"0123456789"), boundary="x")
+        whole = MultipartStream({"lang": "en"}, "files", "a.wav", io.BytesIO(b"0123456789"), boundary="x").read()
+
+        chunks = []
+        while True:
+            chunk = body.read(7)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        assert b"".join(chunks) == whole
+        assert body.tell() == len(body)
+
+    def test_seek_rewinds_body(self):
+        """测试 seek 后可以重新读取完整请求体"""
+        body = MultipartStream({}, "files", "a.wav", io.BytesIO(b"abc"), boundary="x")
+        first = body.read()
+        body.seek(0)
+
+        assert body.read() == first
+
+    def test_truncated_file_raises(self, tmp_path):
+        """测试文件在上传过程中被截断时报错，而不是发送长度不符的请求体"""
+        path = tmp_path / "a.wav"
+        path.write_bytes(b"x" * 100)
+        with open(path, "rb") as f:
+            body = MultipartStream({}, "files", "a.wav", f, boundary="x")
+            path.write_bytes(b"x" * 10)
+            with pytest.raises(OSError):
+                body.read()
+
+
+class _DigestHandler(BaseHTTPRequestHandler):
+    """返回收到的 Content-Length、Transfer-Encoding 和请求体的 SHA-256"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        digest = hashlib.sha256()
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 65536))
+            digest.update(chunk)
+            remaining -= len(chunk)
+        body = (
+            f'{{"length": {length}, "chunked": "{self.headers.get("Transfer-Encoding", "")}", '
+            f'"sha256": "{digest.hexdigest()}"}}'
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_streams_over_http_with_content_length(tmp_path):
+    """测试通过连接池发送时带 Content-Length，且服务端收到的内容完整"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DigestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    path = tmp_path / "big.wav"
+    path.write_bytes(b"\x01\x02" * 3_000_000)
+    pool = HTTPPool(pool_size=1)
+
+    try:
+        with open(path, "rb") as f:
+            body = MultipartStream({"lang": "auto"}, "files", "big.wav", f, boundary="b")
+            expected = hashlib.sha256(body.read()).hexdigest()
+            body.seek(0)
+            response = pool.post(
+                f"http://127.0.0.1:{server.server_address[1]}/",
+                data=body,
+                headers={"Content-Type": body.content_type},
+                timeout=10,
+            )
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+
+    assert response.json() == {"length": len(body), "chunked": "", "sha256": expected}